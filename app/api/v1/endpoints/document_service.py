@@ -1,17 +1,24 @@
-from fastapi import APIRouter, HTTPException, Form, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List
 from pydantic import BaseModel
-import boto3
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
 from app.core.config import Config
+from app.services.catalog_index import catalog_index, clean_catalog_metadata
+from app.services.llm_client import chat_messages, chat_model, token_usage
+from app.services.reason_store import reason_store
+from app.services.recommendation_parser import IncrementalTestParser, parse_recommended_tests
+from app.services.s3_transfer import S3MultipartSink
+from app.services.vector_store import get_local_vector_store, get_vector_store, local_vector_store_is_stale
+from app.utils.cache import AsyncTTLCache
+from app.utils.embedding import VECTOR_DIMENSION, create_custom_embedding
+from app.utils.metrics import register_cache, stage
+from app.utils.streaming_upload import BINARY_FILE, StreamingUploadParser, multipart_openapi
 from dotenv import load_dotenv
 import logging
+import asyncio
+import json
 import re
-from pinecone import Pinecone
-import os
-import numpy as np
-import tiktoken
+import time
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,70 +27,38 @@ router = APIRouter()
 config = Config()
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+NO_REASON_PROVIDED = "No specific reason provided."
 ALLOWED_EXTENSIONS = {'.jpeg', '.jpg', '.png', '.pdf', '.txt'}
-VECTOR_DIMENSION = 1536  # Set this to match your Pinecone index dimension
-MAX_TOKENS = 8191  # Define the maximum number of tokens you want to use
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize ChatOpenAI with AI71 Falcon-180B model
-chat = ChatOpenAI(
-    model="tiiuae/falcon-180B-chat",
-    api_key=config.AI71_API_KEY,
-    base_url="https://api.ai71.ai/v1/",
-    streaming=False,
-)
+# ChatOpenAI with the AI71 Falcon-180B model, built on first use or by the startup warm-up
+chat = chat_model
+
+# Shared across requests; identical concurrent requests coalesce into a single computation
+recommendation_cache = AsyncTTLCache(maxsize=config.RECOMMEND_CACHE_SIZE, ttl=config.RECOMMEND_CACHE_TTL)
+# Coalesced requests waited for another request's computation, so they count as hits
+register_cache("recommendation", lambda: (recommendation_cache.hits + recommendation_cache.coalesced, recommendation_cache.misses))
 
 class RecommendTestsRequest(BaseModel):
     healthGoals: List[str]
     currentDiseases: List[str]
     userId: str
 
-def get_s3_client():
-    return boto3.client(
-        's3',
-        aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-        region_name=config.S3_REGION
-    )
+class LabTestForm(BaseModel):
+    hasLabTest: bool
+    hasMedicalReport: bool
+    userId: str
 
-def get_pinecone_index():
-    pc = Pinecone(api_key=config.PINECONE_API_KEY)
-    return pc.Index("personalized-tests")  # Replace with your actual index name
+class PaymentInfoForm(BaseModel):
+    paymentMethod: str
+    insuranceDetails: str
+    userId: str
 
-def create_custom_embedding(text):
-    encoding = tiktoken.get_encoding("cl100k_base")
-    tokens = encoding.encode(text)[:MAX_TOKENS]
-    
-    embedding = np.zeros(VECTOR_DIMENSION)
-    for token in tokens:
-        embedding[token % VECTOR_DIMENSION] += 1
-    
-    norm = np.linalg.norm(embedding)
-    if norm != 0:
-        embedding = embedding / norm
-    
-    return embedding.tolist()
-
-def extract_test_info(ai_response_content):
-    pattern = r'(\d+\.\s)(.*?)(?=:\s*Reason:|\.|\n|$)'
-    test_infos = re.findall(pattern, ai_response_content)
-    
-    tests_with_reasons = []
-    for idx, name in enumerate(test_infos):
-        test_name = name[1].strip()
-        reason_pattern = fr"{re.escape(name[0])}\s*{re.escape(test_name)}\s*:\s*Reason:(.*?)(?=\n\d|$)"
-        reason_match = re.search(reason_pattern, ai_response_content, re.DOTALL)
-        reason = reason_match.group(1).strip() if reason_match else "No reason provided."
-        
-        tests_with_reasons.append({
-            "name": test_name,
-            "reason": reason
-        })
-    
-    return tests_with_reasons
+def extract_test_info(ai_response_content, output_format: str = "auto"):
+    return parse_recommended_tests(ai_response_content, output_format)
 
 async def get_test_reason_from_ai(test_name: str, health_goals: List[str], current_diseases: List[str]) -> str:
     """
@@ -91,164 +66,513 @@ async def get_test_reason_from_ai(test_name: str, health_goals: List[str], curre
     """
     prompt = f"Provide a simple, one-sentence explanation for why a chemical lab test named '{test_name}' would be important for a patient with the health goals: {', '.join(health_goals)} and the current diseases: {', '.join(current_diseases)}. Use everyday language."
     
-    ai_response = chat.invoke(
-        [
-            SystemMessage(content="You are an AI assistant trained to explain chemical lab tests in simple terms."),
-            HumanMessage(content=prompt),
-        ]
-    )
+    async with stage("llm.reason"):
+        ai_response = await chat.ainvoke(chat_messages(
+            "You are an AI assistant trained to explain chemical lab tests in simple terms.",
+            prompt,
+        ))
     
     # Extract and return the reason from the AI response
     reason = ai_response.content.strip()
-    return reason if reason else "No specific reason provided."
+    return reason if reason else NO_REASON_PROVIDED
+
+def parse_batch_reasons(ai_response_content: str, test_names: List[str]) -> dict:
+    """
+    Parse the JSON object returned by the batched reason prompt into a {test name: reason} dict.
+    Names the AI left out or renamed beyond case/whitespace differences are omitted.
+    """
+    json_match = re.search(r'\{.*\}', ai_response_content, re.DOTALL)
+    if not json_match:
+        return {}
 
-@router.post("/recommend-tests")
-async def recommend_tests(request: RecommendTestsRequest):
     try:
-        # Updated prompt to focus on chemical lab tests
-        prompt = f"Based on the health goals: {', '.join(request.healthGoals)} and the current diseases: {', '.join(request.currentDiseases)}, what are the best chemical lab tests to recommend? Please provide a numbered list of 5-7 specific chemical test names."
-
-        ai_response = chat.invoke(
-            [
-                SystemMessage(content="You are an AI assistant trained to recommend chemical lab tests. Provide specific test names that would typically be found in a medical lab's catalog."),
-                HumanMessage(content=prompt),
-            ]
-        )
+        parsed = json.loads(json_match.group(0))
+    except json.JSONDecodeError:
+        return {}
+
+    if not isinstance(parsed, dict):
+        return {}
 
-        recommended_tests_info = extract_test_info(ai_response.content)
-        index = get_pinecone_index()
-        recommended_tests = []
+    answers = {str(name).strip().lower(): reason for name, reason in parsed.items()}
+    reasons = {}
+    for test_name in test_names:
+        reason = answers.get(test_name.strip().lower())
+        if isinstance(reason, str) and reason.strip():
+            reasons[test_name] = reason.strip()
 
-        for test_info in recommended_tests_info:
-            test_name = test_info["name"]
+    return reasons
 
-            # First, try an exact match
-            exact_match = index.query(
+async def get_test_reasons_batch(test_names: List[str], health_goals: List[str], current_diseases: List[str]) -> dict:
+    """
+    Make a single AI call that returns a one-sentence reason for every test in test_names.
+    Any test missing from the answer falls back to its own get_test_reason_from_ai call.
+    """
+    tests_list = "\n".join(f"- {test_name}" for test_name in test_names)
+    prompt = (
+        f"For a patient with the health goals: {', '.join(health_goals)} and the current diseases: {', '.join(current_diseases)}, "
+        f"provide a simple, one-sentence explanation for why each of the following chemical lab tests would be important. Use everyday language.\n"
+        f"{tests_list}\n"
+        f"Respond only with a JSON object that maps each test name, exactly as written above, to its explanation."
+    )
+
+    async with stage("llm.reason_batch"):
+        ai_response = await chat.ainvoke(chat_messages(
+            "You are an AI assistant trained to explain chemical lab tests in simple terms. You always answer with valid JSON.",
+            prompt,
+        ))
+
+    reasons = parse_batch_reasons(ai_response.content, test_names)
+    missing = [test_name for test_name in test_names if test_name not in reasons]
+    if missing:
+        logger.warning(f"Batched reason call did not cover {len(missing)} tests, falling back per test: {missing}")
+        fallback_reasons = await asyncio.gather(*[
+            get_test_reason_from_ai(test_name, health_goals, current_diseases) for test_name in missing
+        ])
+        reasons.update(zip(missing, fallback_reasons))
+
+    return reasons
+
+async def generate_test_reasons(test_names: List[str], health_goals: List[str], current_diseases: List[str], semaphore: asyncio.Semaphore, mode: str = None) -> dict:
+    """
+    Generate reasons for all test names using the given mode, or the one selected by REASON_MODE.
+    Reasons already in the persistent reason store are reused; only the rest go to the AI.
+    Logs the LLM calls, tokens and time spent so the batch and per-test modes can be compared.
+    """
+    if not test_names:
+        return {}
+
+    keys = {test_name: reason_store.key(test_name, health_goals, current_diseases) for test_name in test_names}
+    async with stage("reason_store.get"):
+        stored = await asyncio.to_thread(reason_store.get_many, list(keys.values()))
+    reasons = {test_name: stored[key] for test_name, key in keys.items() if key in stored}
+    missing = [test_name for test_name in dict.fromkeys(test_names) if test_name not in reasons]
+    if not missing:
+        logger.info(f"Served all {len(reasons)} reasons from the reason store")
+        return reasons
+
+    mode = mode or config.REASON_MODE
+    start = time.perf_counter()
+    with token_usage() as usage:
+        if mode == "batch":
+            generated = await get_test_reasons_batch(missing, health_goals, current_diseases)
+        else:
+            async def reason_for(test_name):
+                async with semaphore:
+                    return await get_test_reason_from_ai(test_name, health_goals, current_diseases)
+
+            per_test_reasons = await asyncio.gather(*[reason_for(test_name) for test_name in missing])
+            generated = dict(zip(missing, per_test_reasons))
+
+    logger.info(f"Generated {len(missing)} reasons in {mode} mode "
+                f"({len(reasons)} from the reason store): "
+                f"{usage.successful_requests} LLM calls, {usage.prompt_tokens} prompt tokens, "
+                f"{usage.completion_tokens} completion tokens, {time.perf_counter() - start:.2f}s")
+
+    async with stage("reason_store.put"):
+        await asyncio.to_thread(reason_store.put_many, {
+            keys[test_name]: (test_name, reason) for test_name, reason in generated.items() if reason != NO_REASON_PROVIDED
+        })
+    reasons.update(generated)
+    return reasons
+
+async def find_test_in_index(store, test_name: str):
+    """
+    Look up a recommended test, trying an exact name/CPT match, then an approximate name/tag match,
+    before falling back to vector search. Exact and approximate matches come from the in-memory catalog;
+    the vector store is only queried for exact matches when no catalog is loaded.
+    """
+    if catalog_index.loaded:
+        with stage("catalog.exact_match"):
+            test_metadata = catalog_index.lookup(test_name)
+        if test_metadata is not None:
+            logger.info(f"Found exact match in catalog for: {test_name}")
+            return test_metadata
+
+        with stage("catalog.fuzzy_match"):
+            fuzzy_match = catalog_index.fuzzy_lookup(test_name, config.FUZZY_MATCH_THRESHOLD)
+        if fuzzy_match is not None:
+            test_metadata, score = fuzzy_match
+            logger.info(f"Found approximate match in catalog for: {test_name} ({test_metadata['Test Name']}, score {score:.2f})")
+            return test_metadata
+    else:
+        async with stage("vector_store.query"):
+            exact_match = await store.aquery(
                 vector=[0] * VECTOR_DIMENSION,  # Dummy vector for metadata-only query
                 filter={"Test Name": {"$eq": test_name}},
                 top_k=1,
                 include_metadata=True
             )
 
-            if exact_match['matches']:
-                test_metadata = exact_match['matches'][0]['metadata']
-                reason = await get_test_reason_from_ai(test_name, request.healthGoals, request.currentDiseases)
-                test_metadata['reason'] = reason
-                recommended_tests.append(test_metadata)
-                logger.info(f"Found exact match in Pinecone for: {test_name} with reason: {reason}")
-            else:
-                # If no exact match, use vector search as a fallback
-                query_embedding = create_custom_embedding(test_name)
-                query_response = index.query(
-                    vector=query_embedding,
-                    top_k=1,
-                    include_metadata=True
-                )
-
-                if query_response['matches']:
-                    test_metadata = query_response['matches'][0]['metadata']
-                    reason = await get_test_reason_from_ai(test_name, request.healthGoals, request.currentDiseases)
-                    test_metadata['reason'] = reason
-                    recommended_tests.append(test_metadata)
-                    logger.info(f"Found similar test in Pinecone for: {test_name} with reason: {reason}")
-                else:
-                    logger.warning(f"No matching lab test found in Pinecone for: {test_name}")
-
-        if not recommended_tests:
-            logger.info("No relevant lab tests found based on the AI recommendation")
-            raise HTTPException(status_code=404, detail="No relevant lab tests found")
+        if exact_match['matches']:
+            logger.info(f"Found exact match in vector store for: {test_name}")
+            return clean_catalog_metadata(exact_match['matches'][0]['metadata'])
+
+    # If no exact match, use vector search as a fallback
+    async with stage("embedding"):
+        query_embedding = await asyncio.to_thread(create_custom_embedding, test_name)
+    async with stage("vector_store.query"):
+        query_response = await store.aquery(
+            vector=query_embedding,
+            top_k=1,
+            include_metadata=True
+        )
+
+    if query_response['matches']:
+        logger.info(f"Found similar test in vector store for: {test_name}")
+        return clean_catalog_metadata(query_response['matches'][0]['metadata'])
+
+    logger.warning(f"No matching lab test found in vector store for: {test_name}")
+    return None
+
+async def resolve_test(store, test_name: str, semaphore: asyncio.Semaphore):
+    """
+    Resolve a single recommended test to its catalog metadata, or None when it is not in the catalog.
+    """
+    async with semaphore:
+        return await find_test_in_index(store, test_name)
+
+def recommendation_cache_key(health_goals: List[str], current_diseases: List[str]) -> tuple:
+    """
+    Canonical cache key: order, case and surrounding whitespace of the inputs do not change the recommendation.
+    """
+    def canonical(values):
+        return tuple(sorted({value.strip().casefold() for value in values if value.strip()}))
+
+    return canonical(health_goals), canonical(current_diseases)
+
+def recommendation_messages(health_goals: List[str], current_diseases: List[str]) -> list:
+    # Updated prompt to focus on chemical lab tests
+    prompt = f"Based on the health goals: {', '.join(health_goals)} and the current diseases: {', '.join(current_diseases)}, what are the best chemical lab tests to recommend? "
+    if config.LLM_OUTPUT_FORMAT == "json":
+        prompt += 'Respond only with a JSON array of 5-7 objects, each with a "name" field holding a specific chemical test name.'
+    else:
+        prompt += "Please provide a numbered list of 5-7 specific chemical test names."
+
+    return chat_messages(
+        "You are an AI assistant trained to recommend chemical lab tests. Provide specific test names that would typically be found in a medical lab's catalog.",
+        prompt,
+    )
+
+async def suggest_test_names(health_goals: List[str], current_diseases: List[str]) -> List[str]:
+    async with stage("llm.recommend"):
+        ai_response = await chat.ainvoke(recommendation_messages(health_goals, current_diseases))
+    return [test_info["name"] for test_info in extract_test_info(ai_response.content, config.LLM_OUTPUT_FORMAT)]
+
+async def iter_test_names(health_goals: List[str], current_diseases: List[str]):
+    """
+    Async generator over the AI's suggested test names. With LLM_STREAMING each name is yielded
+    as soon as its list item is complete in the token stream, while the model is still generating.
+    """
+    if not config.LLM_STREAMING:
+        for test_name in await suggest_test_names(health_goals, current_diseases):
+            yield test_name
+        return
+
+    parser = IncrementalTestParser(config.LLM_OUTPUT_FORMAT)
+    # Covers the whole token stream; consumers only start lookup tasks between chunks
+    async with stage("llm.recommend_stream"):
+        async for chunk in chat.astream(recommendation_messages(health_goals, current_diseases)):
+            for test_info in parser.feed(chunk.content):
+                yield test_info["name"]
+    for test_info in parser.close():
+        yield test_info["name"]
+
+async def current_vector_store():
+    # A stale local store is rebuilt on a thread, so embedding the catalog never blocks the event loop
+    if config.VECTOR_STORE_BACKEND == "local" and local_vector_store_is_stale():
+        await asyncio.to_thread(get_local_vector_store)
+    return get_vector_store()
+
+async def compute_recommended_tests(health_goals: List[str], current_diseases: List[str]) -> list:
+    store = await current_vector_store()
+    semaphore = asyncio.Semaphore(config.RECOMMEND_CONCURRENCY)
+
+    # Start each lookup as soon as its name is known; gather keeps the results in the order the AI suggested them
+    test_names = []
+    lookups = []
+    try:
+        async for test_name in iter_test_names(health_goals, current_diseases):
+            test_names.append(test_name)
+            lookups.append(asyncio.create_task(resolve_test(store, test_name, semaphore)))
+        resolved_tests = await asyncio.gather(*lookups)
+    except BaseException:
+        for lookup in lookups:
+            lookup.cancel()
+        raise
+    matched = [(test_name, test_metadata) for test_name, test_metadata in zip(test_names, resolved_tests) if test_metadata is not None]
+
+    reasons = await generate_test_reasons([test_name for test_name, _ in matched], health_goals, current_diseases, semaphore)
+    recommended_tests = []
+    for test_name, test_metadata in matched:
+        test_metadata['reason'] = reasons[test_name]
+        recommended_tests.append(test_metadata)
+
+    if not recommended_tests:
+        # Raised rather than returned so empty results are never cached
+        logger.info("No relevant lab tests found based on the AI recommendation")
+        raise HTTPException(status_code=404, detail="No relevant lab tests found")
+
+    return recommended_tests
+
+@router.post("/recommend-tests")
+async def recommend_tests(request: RecommendTestsRequest):
+    try:
+        cache_key = recommendation_cache_key(request.healthGoals, request.currentDiseases)
+        recommended_tests = await recommendation_cache.get_or_compute(
+            cache_key,
+            lambda: compute_recommended_tests(request.healthGoals, request.currentDiseases)
+        )
 
         return {
             "userId": request.userId,
             "recommendedTests": recommended_tests
         }
 
+    except HTTPException as http_exp:
+        raise http_exp
     except Exception as e:
         logger.error(f"Unexpected error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred")
 
-@router.post("/lab-test")
-async def upload_lab_tests(
-    hasLabTest: bool = Form(...),
-    hasMedicalReport: bool = Form(...),
-    userId: str = Form(...),
-    labTestFiles: List[UploadFile] = File(None),
-    medicalReportFiles: List[UploadFile] = File(None)
-):
+async def stream_recommended_tests(health_goals: List[str], current_diseases: List[str]):
+    """
+    Async generator yielding (position, test_metadata) for each matched test as soon as its lookup and reason
+    are ready, in completion order. position is the test's place in the AI's suggestion list.
+    Reasons are generated per test here so each one can be sent without waiting for the others.
+    """
+    store = await current_vector_store()
+    semaphore = asyncio.Semaphore(config.RECOMMEND_CONCURRENCY)
+    # Carries (position, test_metadata, error) per test, plus (None, test_count, error) once all names are known
+    results = asyncio.Queue()
+    tasks = []
+
+    async def resolve_with_reason(position: int, test_name: str):
+        try:
+            test_metadata = await resolve_test(store, test_name, semaphore)
+            if test_metadata is not None:
+                reasons = await generate_test_reasons([test_name], health_goals, current_diseases, semaphore, mode="per_test")
+                test_metadata['reason'] = reasons[test_name]
+            results.put_nowait((position, test_metadata, None))
+        except Exception as e:
+            results.put_nowait((position, None, e))
+
+    async def dispatch_lookups():
+        try:
+            async for test_name in iter_test_names(health_goals, current_diseases):
+                tasks.append(asyncio.create_task(resolve_with_reason(len(tasks), test_name)))
+            results.put_nowait((None, len(tasks), None))
+        except Exception as e:
+            results.put_nowait((None, None, e))
+
+    dispatcher = asyncio.create_task(dispatch_lookups())
+    test_count = None
+    received = 0
     try:
-        s3_client = get_s3_client()
-        bucket_name = config.S3_BUCKET
-
-        lab_test_urls = []
-        medical_report_urls = []
-
-        if labTestFiles:
-            for file in labTestFiles:
-                validate_file(file)
-                s3_key = f'lab_tests/{userId}/{file.filename}'
-                s3_client.upload_fileobj(file.file, bucket_name, s3_key)
-                lab_test_urls.append(f"https://{bucket_name}.s3.amazonaws.com/{s3_key}")
-
-        if medicalReportFiles:
-            for file in medicalReportFiles:
-                validate_file(file)
-                s3_key = f'medical_reports/{userId}/{file.filename}'
-                s3_client.upload_fileobj(file.file, bucket_name, s3_key)
-                medical_report_urls.append(f"https://{bucket_name}.s3.amazonaws.com/{s3_key}")
+        while test_count is None or received < test_count:
+            position, value, error = await results.get()
+            if error is not None:
+                raise error
+            if position is None:
+                test_count = value
+                continue
+            received += 1
+            if value is not None:
+                yield position, value
+    finally:
+        # The client may disconnect mid-stream; do not leave lookups running for nobody
+        dispatcher.cancel()
+        for task in tasks:
+            task.cancel()
+
+def format_stream_frame(event: str, payload: dict, sse: bool) -> str:
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"type": event, **payload}) + "\n"
+
+@router.post("/recommend-tests/stream")
+async def recommend_tests_stream(request: RecommendTestsRequest, http_request: Request):
+    """
+    Streaming variant of /recommend-tests. Sends a "test" frame per matched test as soon as it is resolved,
+    then a "summary" frame with all tests in recommendation order. Responds with Server-Sent Events when the
+    client accepts text/event-stream and with NDJSON otherwise.
+    """
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    cache_key = recommendation_cache_key(request.healthGoals, request.currentDiseases)
+
+    async def frames():
+        try:
+            # An invalidate() while streaming means the results may predate the current catalog
+            generation = recommendation_cache.generation
+            found, cached_tests = recommendation_cache.get(cache_key)
+            if found:
+                resolved = dict(enumerate(cached_tests))
+                for position, test_metadata in resolved.items():
+                    yield format_stream_frame("test", {"position": position, "test": test_metadata}, sse)
+            else:
+                resolved = {}
+                async for position, test_metadata in stream_recommended_tests(request.healthGoals, request.currentDiseases):
+                    resolved[position] = test_metadata
+                    yield format_stream_frame("test", {"position": position, "test": test_metadata}, sse)
+
+            recommended_tests = [resolved[position] for position in sorted(resolved)]
+            summary = {
+                "userId": request.userId,
+                "count": len(recommended_tests),
+                "recommendedTests": recommended_tests
+            }
+            if recommended_tests and not found and generation == recommendation_cache.generation:
+                recommendation_cache.set(cache_key, recommended_tests)
+            elif not recommended_tests:
+                logger.info("No relevant lab tests found based on the AI recommendation")
+                summary["detail"] = "No relevant lab tests found"
+            yield format_stream_frame("summary", summary, sse)
+
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-band
+            logger.error(f"Unexpected error occurred while streaming recommendations: {str(e)}")
+            yield format_stream_frame("error", {"detail": "An unexpected error occurred"}, sse)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        # X-Accel-Buffering tells nginx to pass every frame through as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
+@router.get("/admin/recommend-cache")
+async def recommend_cache_stats():
+    return recommendation_cache.stats()
+
+@router.post("/admin/recommend-cache/invalidate")
+async def invalidate_recommend_cache():
+    invalidated = recommendation_cache.invalidate()
+    logger.info(f"Invalidated {invalidated} cached recommendations")
+    return {
+        "message": "Recommendation cache invalidated",
+        "invalidated": invalidated
+    }
+
+@router.post("/catalog/refresh")
+async def refresh_catalog():
+    try:
+        test_count = await asyncio.to_thread(catalog_index.refresh)
+        if config.VECTOR_STORE_BACKEND == "local":
+            # Rebuild the embeddings now rather than on the next request
+            await asyncio.to_thread(get_local_vector_store)
+        # Cached recommendations may point at tests that changed or no longer exist
+        recommendation_cache.invalidate()
         return {
-            "message": "Lab test information received and files uploaded successfully",
-            "labTestUrls": lab_test_urls,
-            "medicalReportUrls": medical_report_urls
+            "message": "Lab test catalog reloaded successfully",
+            "testCount": test_count
         }
 
+    except FileNotFoundError:
+        logger.error(f"Lab test catalog not found at {catalog_index.csv_path}")
+        raise HTTPException(status_code=404, detail="Lab test catalog file not found")
+    except Exception as e:
+        logger.error(f"Error reloading lab test catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred while reloading the lab test catalog")
+
+def lab_test_sink_factory(field_name: str, filename: str, content_type: str, fields: dict):
+    prefixes = {"labTestFiles": "lab_tests", "medicalReportFiles": "medical_reports"}
+    if field_name not in prefixes:
+        raise HTTPException(status_code=400, detail=f"Unexpected file field: {field_name}")
+    # The key needs userId; form fields normally precede the files, otherwise the sink buffers until it arrives
+    return S3MultipartSink(lambda: f'{prefixes[field_name]}/{fields["userId"]}/{filename}' if "userId" in fields else None)
+
+@router.post("/lab-test", openapi_extra=multipart_openapi(LabTestForm, files={
+    "labTestFiles": {"type": "array", "items": BINARY_FILE},
+    "medicalReportFiles": {"type": "array", "items": BINARY_FILE},
+}))
+async def upload_lab_tests(request: Request):
+    """
+    Multipart form: hasLabTest, hasMedicalReport, userId, labTestFiles[], medicalReportFiles[].
+    Files are validated and streamed to S3 while they arrive instead of being spooled first.
+    """
+    upload = None
+    try:
+        async with stage("upload.receive"):
+            upload = await StreamingUploadParser(request, lab_test_sink_factory, max_size=MAX_FILE_SIZE,
+                                                 allowed_extensions=ALLOWED_EXTENSIONS).parse()
+        upload.validate_fields(LabTestForm)
+
+        # The last (or only) part of every file is sent concurrently, so the request takes about as long as the largest file
+        async with stage("upload.finish"):
+            files = await upload.close()
+        results = [{"filename": file.filename, "size": file.size, "sha256": file.digest, **file.result} for file in files]
+
+        failed = [result for result in results if "error" in result]
+        if results and len(failed) == len(results):
+            raise HTTPException(status_code=500, detail="An error occurred while uploading files")
+
+        return JSONResponse(status_code=207 if failed else 200, content={
+            "message": "Some files could not be uploaded" if failed else "Lab test information received and files uploaded successfully",
+            "labTestUrls": [file.result["url"] for file in upload.files_for("labTestFiles") if "url" in file.result],
+            "medicalReportUrls": [file.result["url"] for file in upload.files_for("medicalReportFiles") if "url" in file.result],
+            "files": results
+        })
+
     except HTTPException as http_exp:
+        if upload is not None:
+            await upload.abort()
         raise http_exp
     except Exception as e:
         logger.error(f"Error uploading files: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while uploading files")
 
-@router.post("/save-id")
-async def save_payment_info(
-    paymentMethod: str = Form(...),
-    insuranceDetails: str = Form(...),
-    userId: str = Form(...),
-    emiratesIdFile: UploadFile = File(...),
-    insuranceCardFile: UploadFile = File(None)
-):
+def payment_sink_factory(field_name: str, filename: str, content_type: str, fields: dict):
+    prefixes = {"emiratesIdFile": "emirates_id", "insuranceCardFile": "insurance_card"}
+    if field_name not in prefixes:
+        raise HTTPException(status_code=400, detail=f"Unexpected file field: {field_name}")
+    return S3MultipartSink(lambda: f'payment_docs/{fields["userId"]}/{prefixes[field_name]}_{filename}' if "userId" in fields else None)
+
+@router.post("/save-id", openapi_extra=multipart_openapi(PaymentInfoForm, files={
+    "emiratesIdFile": BINARY_FILE,
+    "insuranceCardFile": BINARY_FILE,
+}, required_files=("emiratesIdFile",)))
+async def save_payment_info(request: Request):
+    """
+    Multipart form: paymentMethod, insuranceDetails, userId, emiratesIdFile, optional insuranceCardFile.
+    """
+    upload = None
     try:
-        s3_client = get_s3_client()
-        bucket_name = config.S3_BUCKET
-
-        emirates_id_url = ""
-        insurance_card_url = ""
-
-        # Validate and upload Emirates ID/Passport file
-        validate_file(emiratesIdFile)
-        emirates_id_key = f'payment_docs/{userId}/emirates_id_{emiratesIdFile.filename}'
-        s3_client.upload_fileobj(emiratesIdFile.file, bucket_name, emirates_id_key)
-        emirates_id_url = f"https://{bucket_name}.s3.amazonaws.com/{emirates_id_key}"
-
-        # Validate and upload Insurance Card file if provided
-        if insuranceCardFile:
-            validate_file(insuranceCardFile)
-            insurance_card_key = f'payment_docs/{userId}/insurance_card_{insuranceCardFile.filename}'
-            s3_client.upload_fileobj(insuranceCardFile.file, bucket_name, insurance_card_key)
-            insurance_card_url = f"https://{bucket_name}.s3.amazonaws.com/{insurance_card_key}"
+        async with stage("upload.receive"):
+            upload = await StreamingUploadParser(request, payment_sink_factory, max_size=MAX_FILE_SIZE,
+                                                 allowed_extensions=ALLOWED_EXTENSIONS, max_files=2).parse()
+        form = upload.validate_fields(PaymentInfoForm)
+        emirates_id_files = upload.files_for("emiratesIdFile")
+        insurance_card_files = upload.files_for("insuranceCardFile")
+        if len(emirates_id_files) != 1 or len(insurance_card_files) > 1:
+            raise HTTPException(status_code=422, detail="Expected one emiratesIdFile and at most one insuranceCardFile")
+
+        # Upload the Emirates ID/Passport file and the optional Insurance Card file together
+        async with stage("upload.finish"):
+            files = await upload.close()
+        results = [{"filename": file.filename, "size": file.size, "sha256": file.digest, **file.result} for file in files]
+        if any("error" in result for result in results):
+            raise HTTPException(status_code=500, detail={
+                "message": "An error occurred while uploading payment documents",
+                "files": results
+            })
+        emirates_id_url = emirates_id_files[0].result["url"]
+        insurance_card_url = insurance_card_files[0].result["url"] if insurance_card_files else ""
 
         # Here you would typically save the payment information to your database
         # For now, we'll just log it
-        logger.info(f"Payment info received for user {userId}: "
-                    f"Payment Method: {paymentMethod}, "
-                    f"Insurance Details: {insuranceDetails}")
+        logger.info(f"Payment info received for user {form.userId}: "
+                    f"Payment Method: {form.paymentMethod}, "
+                    f"Insurance Details: {form.insuranceDetails}")
 
         return {
             "message": "Payment information received and files uploaded successfully",
             "emiratesIdFileUrl": emirates_id_url,
-            "insuranceCardFileUrl": insurance_card_url
+            "insuranceCardFileUrl": insurance_card_url,
+            "files": results
         }
 
     except HTTPException as http_exp:
+        if upload is not None:
+            await upload.abort()
         raise http_exp
     except Exception as e:
         logger.error(f"Error processing payment information: {str(e)}")
@@ -274,11 +598,3 @@ async def print_config():
     except Exception as e:
         logger.error(f"Error retrieving config values: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while retrieving config values")
-
-def validate_file(file: UploadFile):
-    if file.size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="File size exceeds the limit")
-    
-    _, ext = os.path.splitext(file.filename)
-    if ext.lower() not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail="Invalid file type")
\ No newline at end of file
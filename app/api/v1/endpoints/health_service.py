@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.resources import resources
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz():
+    """
+    Liveness: the worker is up and serving requests, whether or not warm-up has finished.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 only once every startup resource has been built and warmed, 503 until then or if one failed.
+    """
+    ready = resources.ready
+    return JSONResponse(status_code=200 if ready else 503, content={
+        "status": "ready" if ready else "starting" if resources.finished_at is None else "failed",
+        "resources": resources.status()
+    })
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException
+from app.services.job_queue import FINISHED, job_queue
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def format_job(job: dict) -> dict:
+    return {
+        "jobId": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "stage": job["stage"],
+        "result": job["result"],
+        "error": job["error"],
+        "createdAt": job["created_at"],
+        "updatedAt": job["updated_at"]
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return format_job(job)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    logger.info(f"Cancelled job {job_id}")
+    return {
+        "jobId": job_id,
+        "status": "cancelled"
+    }
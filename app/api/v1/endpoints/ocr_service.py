@@ -1,21 +1,145 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import pytesseract
-from PIL import Image
-import io
+from fastapi import APIRouter, HTTPException, Request
+from app.core.config import Config
+from app.services.ocr_engine import OCRSaturated, ocr_engine, ocr_image_bytes, split_pdf_pages
+from app.utils.content_cache import result_cache
+from app.utils.metrics import stage
+from app.utils.streaming_upload import (BINARY_FILE, MemorySink, StreamedFile, StreamingUploadParser, multipart_openapi,
+                                        receive_file)
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import os
 
 router = APIRouter()
+config = Config()
+logger = logging.getLogger(__name__)
 
 
-@router.post("/ocr")
-async def ocr(file: UploadFile = File(...)):
+def is_pdf(file: StreamedFile) -> bool:
+    return file.content_type == 'application/pdf' or os.path.splitext(file.filename or '')[1].lower() == '.pdf'
+
+
+def ocr_cache_params() -> dict:
+    # Everything besides the image itself that changes what Tesseract returns
+    return {"dpi": config.OCR_TARGET_DPI, "maxDimension": config.OCR_MAX_DIMENSION}
+
+
+@router.post("/ocr", openapi_extra=multipart_openapi(files={"file": BINARY_FILE}, required_files=("file",)))
+async def ocr(request: Request):
+    """
+    Multipart form with one image in "file". The image is size-checked, sniffed and hashed while it streams in.
+    """
+    try:
+        async with stage("upload.receive"):
+            file = await receive_file(request, "file", MemorySink, max_size=config.OCR_MAX_UPLOAD_SIZE,
+                                      content_type_prefix='image')
+        content, digest = file.result, file.digest
+
+        # Re-uploads of the same image are answered from the result cache without touching Tesseract
+        cache_key = result_cache.key("ocr", digest, **ocr_cache_params())
+        cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+        # Tesseract runs in the OCR worker processes so the event loop stays free for other requests
+        async with stage("ocr.image"):
+            text = await ocr_engine.run(ocr_image_bytes, content, ocr_engine.timeout)
+        result = {"text": text}
+        await asyncio.to_thread(result_cache.put, cache_key, result)
+        return result
+
+    except HTTPException as http_exp:
+        raise http_exp
+    except OCRSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="OCR service is busy, please retry later",
+                            headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="OCR timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def document_cache_key(file: StreamedFile) -> str:
+    # Images share their entries with /ocr; a PDF is cached as a whole, with one text per page
+    return result_cache.key("ocr.pdf" if is_pdf(file) else "ocr", file.digest, **ocr_cache_params())
+
+
+async def load_document(file: StreamedFile, cache_key: str) -> Tuple[Optional[List[str]], List[bytes]]:
+    """
+    Return (texts, []) when the file's page texts are in the result cache, otherwise (None, pages) with the
+    page images still to be OCR'd.
+    """
+    cached = await asyncio.to_thread(result_cache.get, cache_key)
+    if cached is not None:
+        return (cached["pages"] if "pages" in cached else [cached["text"]]), []
+    if is_pdf(file):
+        async with stage("ocr.split_pdf"):
+            return None, await ocr_engine.run(split_pdf_pages, file.result, config.OCR_MAX_PAGES)
+    return None, [file.result]
+
+
+def batch_sink_factory(field_name: str, filename: str, content_type: str, fields: dict):
+    # Files in any other field would otherwise be received and silently left out of the result
+    if field_name != "files":
+        raise HTTPException(status_code=400, detail=f"Unexpected file field: {field_name}")
+    return MemorySink()
+
+
+@router.post("/ocr/batch", openapi_extra=multipart_openapi(files={"files": {"type": "array", "items": BINARY_FILE}},
+                                                           required_files=("files",)))
+async def ocr_batch(request: Request):
+    """
+    OCR several images and/or multi-page PDFs sent as multipart "files". Every file is size-checked, sniffed and
+    hashed while it streams in, and re-uploads are answered from the result cache. Every other page is OCR'd by
+    its own worker process in parallel; the response lists the pages in upload order.
+    """
     try:
-        # Ensure file is an image
-        if not file.content_type.startswith('image'):
-            raise HTTPException(status_code=400, detail="Invalid file type")
+        async with stage("upload.receive"):
+            upload = await StreamingUploadParser(request, batch_sink_factory, max_size=config.OCR_MAX_UPLOAD_SIZE,
+                                                 max_files=config.OCR_MAX_PAGES).parse()
+        files = upload.files_for("files")
+        if not files:
+            await upload.abort()
+            raise HTTPException(status_code=422, detail="Missing file field: files")
+        await upload.close()
+        for file in files:
+            if not is_pdf(file) and not file.content_type.startswith('image'):
+                raise HTTPException(status_code=400, detail=f"Invalid file type for {file.filename}")
+
+        cache_keys = [document_cache_key(file) for file in files]
+        # PDFs are split in the worker processes too, concurrently with each other
+        documents = await asyncio.gather(*[load_document(file, cache_key) for file, cache_key in zip(files, cache_keys)])
+        if sum(len(pages) if texts is None else len(texts) for texts, pages in documents) > config.OCR_MAX_PAGES:
+            raise HTTPException(status_code=413, detail=f"At most {config.OCR_MAX_PAGES} pages can be OCR'd per request")
+
+        pages = [page for texts, document in documents if texts is None for page in document]
+        async with stage("ocr.batch"):
+            ocr_texts = iter(await ocr_engine.run_many(ocr_image_bytes, [(page, ocr_engine.timeout) for page in pages]))
 
-        image = Image.open(io.BytesIO(await file.read()))
-        text = pytesseract.image_to_string(image)
-        return {"text": text}
+        results, cache_writes = [], []
+        for file, cache_key, (texts, document) in zip(files, cache_keys, documents):
+            if texts is None:
+                texts = [next(ocr_texts) for _ in document]
+                value = {"pages": texts} if is_pdf(file) else {"text": texts[0]}
+                cache_writes.append(asyncio.to_thread(result_cache.put, cache_key, value))
+            results.extend({"file": file.filename, "page": number, "text": text}
+                           for number, text in enumerate(texts, start=1))
+        await asyncio.gather(*cache_writes)
+        return {"pages": results, "text": "\n\n".join(result["text"] for result in results)}
 
+    except HTTPException as http_exp:
+        raise http_exp
+    except OCRSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="OCR service is busy, please retry later",
+                            headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="OCR timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/result-cache")
+async def result_cache_stats():
+    return await asyncio.to_thread(result_cache.stats)
@@ -1,34 +1,127 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import moviepy.editor as mp
-import speech_recognition as sr
+from fastapi import APIRouter, HTTPException, Request
+from app.core.config import Config
+from app.services.audio_extraction import AudioExtractionError, extract_audio_data
+from app.services.job_queue import job_queue
+from app.services.transcription import chunk_transcriber
+from app.utils.content_cache import result_cache
+from app.utils.metrics import stage
+from app.utils.streaming_upload import BINARY_FILE, FileSink, multipart_openapi, receive_file
+import asyncio
+import os
+import subprocess
 import tempfile
 
 router = APIRouter()
+config = Config()
 
-@router.post("/video-to-text")
-async def video_to_text(file: UploadFile = File(...)):
-    try:
-        if not file.content_type.startswith('video'):
-            raise HTTPException(status_code=400, detail="Invalid file type")
+# Bump when the extraction or recognition pipeline changes so stale transcripts are not served
+TRANSCRIPTION_CACHE_PARAMS = {
+    "recognizer": config.TRANSCRIPTION_ENGINE,
+    "language": config.TRANSCRIPTION_LANGUAGE,
+    "minChunkSeconds": config.TRANSCRIPTION_MIN_CHUNK_SECONDS,
+    "maxChunkSeconds": config.TRANSCRIPTION_MAX_CHUNK_SECONDS,
+    "minSilenceMs": config.TRANSCRIPTION_MIN_SILENCE_MS,
+    "version": 3
+}
+# The endpoints parse their multipart body themselves; this documents it
+VIDEO_FORM = multipart_openapi(files={"file": BINARY_FILE}, required_files=("file",))
+
+
+def transcribe_video(video_path: str, progress=None) -> dict:
+    # ffmpeg reads the video file itself and decodes straight to 16 kHz mono PCM; every request gets its own buffers
+    if progress:
+        progress(0.05, "extracting audio")
+    with stage("audio.extract"):
+        audio_data = extract_audio_data(video_path)
+    if progress:
+        progress(0.3, "transcribing")
+    # Chunks split at pauses are transcribed in parallel and stitched back in order with timestamps
+    with stage("transcription"):
+        return chunk_transcriber.transcribe(audio_data.frame_data, audio_data.sample_rate, audio_data.sample_width, progress)
+
+
+def transcribe_video_job(video_path: str, params: dict, progress) -> dict:
+    """
+    Job handler for POST /video-to-text/jobs; runs in a background worker thread. ffmpeg reads the spooled
+    video from its path, so the job never loads it into memory.
+    """
+    cache_key = result_cache.key("video", params["digest"], **TRANSCRIPTION_CACHE_PARAMS)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(await file.read())
-            temp_file.seek(0)
+    result = transcribe_video(video_path, progress)
+    result_cache.put(cache_key, result)
+    return result
 
-        video = mp.VideoFileClip(temp_file.name)
-        audio = video.audio
-        audio_file = 'temp.wav'
-        audio.write_audiofile(audio_file)
 
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(audio_file) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
+job_queue.register("video-to-text", transcribe_video_job)
+
+
+@router.post("/video-to-text", openapi_extra=VIDEO_FORM)
+async def video_to_text(request: Request):
+    """
+    Multipart form with one video in "file". The video streams into a temporary file that ffmpeg reads
+    directly, so memory per upload stays bounded by the chunk size; the file is removed once transcribed.
+    """
+    path = None
+    try:
+        async with stage("upload.receive"):
+            file = await receive_file(request, "file", lambda: FileSink(tempfile.gettempdir()),
+                                      max_size=config.VIDEO_MAX_UPLOAD_SIZE, content_type_prefix='video')
+        path, digest = file.result, file.digest
+
+        # Retried uploads of the same video skip decoding and recognition entirely
+        cache_key = result_cache.key("video", digest, **TRANSCRIPTION_CACHE_PARAMS)
+        cached = await asyncio.to_thread(result_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+        result = await asyncio.to_thread(transcribe_video, path)
 
         # Optionally save the result to patient info
-        # patient_info.update({'video_text': text})
+        # patient_info.update({'video_text': result["text"]})
+
+        await asyncio.to_thread(result_cache.put, cache_key, result)
+        return result
+
+    except HTTPException as http_exp:
+        raise http_exp
+    except AudioExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except subprocess.TimeoutExpired:
+        raise HTTPException(status_code=504, detail="Audio extraction timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+@router.post("/video-to-text/jobs", status_code=202, openapi_extra=VIDEO_FORM)
+async def submit_video_to_text_job(request: Request):
+    """
+    Queue a transcription and return immediately; poll GET /jobs/{jobId} for progress and the transcript.
+    The video streams straight into the job spool, so it is never held in memory.
+    """
+    try:
+        file = await receive_file(request, "file", lambda: FileSink(job_queue.store.spool_dir),
+                                  max_size=config.VIDEO_MAX_UPLOAD_SIZE, content_type_prefix='video')
+        try:
+            job_id = await job_queue.submit_file("video-to-text", file.result,
+                                                 {"digest": file.digest, "filename": file.filename})
+        except BaseException:
+            # Once submitted the spool file belongs to the job; until then nothing else would remove it
+            if os.path.exists(file.result):
+                os.remove(file.result)
+            raise
+        return {
+            "jobId": job_id,
+            "status": "queued",
+            "statusUrl": f"/api/v1/jobs/{job_id}"
+        }
 
-        return {"text": text}
-    
+    except HTTPException as http_exp:
+        raise http_exp
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -6,11 +6,86 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     S3_REGION = os.getenv('S3_REGION')
     S3_BUCKET = os.getenv('S3_BUCKET')
+    # One pooled S3 client per process; uploads stream to S3, as multipart once they pass the threshold
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 50))
+    S3_MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))  # bytes
+    S3_MULTIPART_CHUNKSIZE = int(os.getenv('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))  # bytes
     KMS_KEY_ID = os.getenv('KMS_KEY_ID')
     AI71_API_KEY = os.getenv('AI71_API_KEY')
     PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
     PINECONE_REGION = os.getenv('PINECONE_REGION')  # Update with your actual region
     PINECONE_HOST = "https://personalized-tests-9zt3ujr.svc.aped-4627-b74a.pinecone.io"  # Add your Pinecone host here
+    # The catalog is reindexed into a fresh namespace, then served once this file points at it (see data/reindex_pinecone.py)
+    PINECONE_NAMESPACE_FILE = os.getenv('PINECONE_NAMESPACE_FILE', 'data/cache/pinecone-namespace.json')
+    PINECONE_NAMESPACE = os.getenv('PINECONE_NAMESPACE', '')  # served while the file does not exist
+    AI71_MODEL = os.getenv('AI71_MODEL', 'tiiuae/falcon-180B-chat')
+    # Async AI71 calls share one connection pool per worker; idle connections stay open this long
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 20))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', 60))  # seconds
+
+    # Routers mounted by app.main; the dependencies of the others are never imported
+    ENABLED_SERVICES = os.getenv('ENABLED_SERVICES', 'documents,ocr,video')  # comma-separated
+
+    # Lab test catalog loaded into memory at startup for exact-match lookups
+    CATALOG_CSV_PATH = os.getenv('CATALOG_CSV_PATH', 'data/datasets/lab_tests_ingested_with_descriptions_final_with_tags.csv')
+
+    # Minimum trigram similarity (0-1) for an approximate catalog match before falling back to vector search
+    FUZZY_MATCH_THRESHOLD = float(os.getenv('FUZZY_MATCH_THRESHOLD', 0.6))
+
+    # Similarity search backend: "pinecone" or "local" (in-process search over the catalog CSV)
+    VECTOR_STORE_BACKEND = os.getenv('VECTOR_STORE_BACKEND', 'pinecone')
+
+    # Stream the AI's test list and start catalog lookups as each item arrives instead of after the full answer
+    LLM_STREAMING = os.getenv('LLM_STREAMING', 'false').lower() in ('1', 'true', 'yes')
+    # Format requested for the AI's test list: "text" (numbered list) or "json" (JSON array of objects)
+    LLM_OUTPUT_FORMAT = os.getenv('LLM_OUTPUT_FORMAT', 'text')
+
+    # Maximum number of recommended tests resolved (lookup + reason) at the same time
+    RECOMMEND_CONCURRENCY = int(os.getenv('RECOMMEND_CONCURRENCY', 8))
+    # "batch" asks the AI for every test reason in one call, "per_test" makes one call per test
+    REASON_MODE = os.getenv('REASON_MODE', 'batch')
+    # /recommend-tests responses are cached per canonical set of health goals and diseases
+    RECOMMEND_CACHE_TTL = int(os.getenv('RECOMMEND_CACHE_TTL', 3600))  # seconds
+    RECOMMEND_CACHE_SIZE = int(os.getenv('RECOMMEND_CACHE_SIZE', 1024))  # entries, 0 disables caching
+    # Generated test reasons persist in SQLite across restarts; an empty path disables the store
+    REASON_STORE_PATH = os.getenv('REASON_STORE_PATH', 'data/cache/reasons.sqlite3')
+    REASON_STORE_MAX_ENTRIES = int(os.getenv('REASON_STORE_MAX_ENTRIES', 100000))
+    REASON_STORE_MEMORY_ENTRIES = int(os.getenv('REASON_STORE_MEMORY_ENTRIES', 2000))
+
+    # OCR runs in a pool of worker processes; submissions beyond OCR_MAX_PENDING get a 503
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', os.cpu_count() or 1))
+    OCR_MAX_PENDING = int(os.getenv('OCR_MAX_PENDING', OCR_WORKERS * 4))
+    OCR_TIMEOUT = float(os.getenv('OCR_TIMEOUT', 60))  # seconds per job
+    # Pages are rendered/rescaled to OCR_TARGET_DPI and capped at OCR_MAX_DIMENSION pixels on the longest side
+    OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', 300))
+    OCR_MAX_DIMENSION = int(os.getenv('OCR_MAX_DIMENSION', 3500))
+    OCR_MAX_PAGES = int(os.getenv('OCR_MAX_PAGES', 20))  # per /ocr/batch request
+    # Uploads are rejected as soon as they stream past these sizes
+    OCR_MAX_UPLOAD_SIZE = int(os.getenv('OCR_MAX_UPLOAD_SIZE', 20 * 1024 * 1024))  # bytes
+    VIDEO_MAX_UPLOAD_SIZE = int(os.getenv('VIDEO_MAX_UPLOAD_SIZE', 500 * 1024 * 1024))  # bytes
+
+    # OCR and transcription results are cached on disk by upload content hash; an empty dir disables the cache
+    RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', 'data/cache/results')
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    RESULT_CACHE_MAX_AGE = int(os.getenv('RESULT_CACHE_MAX_AGE', 7 * 24 * 3600))  # seconds
+
+    # Upper bound for ffmpeg decoding the audio track of one /video-to-text upload
+    AUDIO_EXTRACTION_TIMEOUT = float(os.getenv('AUDIO_EXTRACTION_TIMEOUT', 120))  # seconds
+    # Audio is split at pauses into chunks transcribed in parallel; engines: google, sphinx (offline)
+    TRANSCRIPTION_ENGINE = os.getenv('TRANSCRIPTION_ENGINE', 'google')
+    TRANSCRIPTION_LANGUAGE = os.getenv('TRANSCRIPTION_LANGUAGE', 'en-US')
+    TRANSCRIPTION_CONCURRENCY = int(os.getenv('TRANSCRIPTION_CONCURRENCY', 4))
+    TRANSCRIPTION_MIN_CHUNK_SECONDS = float(os.getenv('TRANSCRIPTION_MIN_CHUNK_SECONDS', 5))
+    TRANSCRIPTION_MAX_CHUNK_SECONDS = float(os.getenv('TRANSCRIPTION_MAX_CHUNK_SECONDS', 30))
+    TRANSCRIPTION_MIN_SILENCE_MS = float(os.getenv('TRANSCRIPTION_MIN_SILENCE_MS', 300))
+    TRANSCRIPTION_RETRIES = int(os.getenv('TRANSCRIPTION_RETRIES', 2))  # per chunk
+
+    # Background jobs (e.g. long video transcriptions) persist in SQLite and are requeued after a restart
+    JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'data/cache/jobs.sqlite3')
+    JOB_SPOOL_DIR = os.getenv('JOB_SPOOL_DIR', 'data/cache/jobs')
+    JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', 2))  # jobs running at once per worker process
+    JOB_RETENTION = int(os.getenv('JOB_RETENTION', 24 * 3600))  # seconds finished jobs stay queryable
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1.0))  # seconds
 
     def __str__(self):
         return (f"SECRET_KEY: {self.SECRET_KEY}\n"
@@ -1,29 +1,99 @@
-import os
-import sys
+import importlib
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from dotenv import load_dotenv
-from app.api.v1.endpoints import document_service, ocr_service, video_service
+from app.api.v1.endpoints import health_service, job_service, metrics_service
 from app.core.config import Config
+from app.services.job_queue import job_queue
+from app.services.resources import resources
+from app.utils.metrics import MetricsMiddleware
 
-# Debug prints
-print(f"Current working directory: {os.getcwd()}")
-print(f"Python path: {sys.path}")
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
 # Create the Config instance
 config = Config()
-print("Configuration Loaded:")
-print(config)
 
-app = FastAPI()
 
-# Include routers
-app.include_router(document_service.router, prefix="/api/v1", tags=["Document Service"])
-app.include_router(ocr_service.router, prefix="/api/v1", tags=["OCR Service"])
-app.include_router(video_service.router, prefix="/api/v1", tags=["Video Service"])
-app.include_router(video_service.router, prefix="/api/v1", tags=["Test Service"])
+def load_catalog():
+    from app.services.catalog_index import catalog_index
+
+    # Load the lab test catalog once per worker so exact matches never leave the process
+    try:
+        catalog_index.refresh()
+    except FileNotFoundError:
+        logger.warning(f"Lab test catalog not found at {catalog_index.csv_path}, exact matches will use the vector store")
+    return catalog_index
+
+
+def register_document_resources():
+    from app.services.llm_client import close_llm_client, load_chat_model, warm_llm_client
+    from app.services.reason_store import reason_store
+    from app.services.s3_transfer import get_s3_client, warm_s3_client
+    from app.services.vector_store import get_local_vector_store, get_pinecone_index, warm_pinecone_index
+    from app.utils.embedding import get_encoder, warm_encoder
+
+    resources.register("tiktoken", get_encoder, warm=warm_encoder)
+    resources.register("catalog", load_catalog)
+    if config.VECTOR_STORE_BACKEND == "local":
+        resources.register("vector_store", get_local_vector_store, requires=("catalog", "tiktoken"))
+    else:
+        resources.register("pinecone", get_pinecone_index, warm=warm_pinecone_index)
+    resources.register("reason_store", lambda: reason_store, warm=lambda store: store.warm())
+    resources.register("s3", get_s3_client, warm=warm_s3_client)
+    resources.register("llm", load_chat_model, warm=warm_llm_client, close=close_llm_client)
+
+
+def register_ocr_resources():
+    from app.services.ocr_engine import ocr_engine
+
+    def start_ocr_engine():
+        # Spawn and warm the OCR worker processes before the first upload arrives
+        ocr_engine.start()
+        return ocr_engine
+
+    resources.register("ocr_engine", start_ocr_engine, close=lambda engine: engine.shutdown())
+
+
+# Service name in ENABLED_SERVICES -> (router module, OpenAPI tag, startup resources)
+SERVICES = {
+    "documents": ("app.api.v1.endpoints.document_service", "Document Service", register_document_resources),
+    "ocr": ("app.api.v1.endpoints.ocr_service", "OCR Service", register_ocr_resources),
+    "video": ("app.api.v1.endpoints.video_service", "Video Service", None),
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients and pools are built and warmed in the background; /readyz reports when they are done
+    resources.start()
+    # Resume background jobs interrupted by the last shutdown
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await resources.close()
+
+app = FastAPI(lifespan=lifespan)
+# Per-route latency, in-flight and error metrics, exposed with the per-stage ones at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Include routers; disabled services are never imported
+app.include_router(health_service.router, tags=["Health"])
+app.include_router(metrics_service.router, tags=["Metrics"])
+for service in [name.strip() for name in config.ENABLED_SERVICES.split(",") if name.strip()]:
+    if service not in SERVICES:
+        logger.warning(f"Unknown service in ENABLED_SERVICES: {service}")
+        continue
+    module_name, tag, register_resources = SERVICES[service]
+    app.include_router(importlib.import_module(module_name).router, prefix="/api/v1", tags=[tag])
+    if register_resources is not None:
+        register_resources()
+# Job kinds are registered by the enabled services' routers, e.g. video-to-text
+if job_queue.handlers:
+    app.include_router(job_service.router, prefix="/api/v1", tags=["Job Service"])
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,84 @@
+import logging
+import os
+import subprocess
+import tempfile
+from typing import List, Union
+
+from app.core.config import Config
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+# What speech recognizers expect: 16 kHz, mono, signed 16-bit little-endian PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+class AudioExtractionError(Exception):
+    """
+    Raised when ffmpeg cannot decode an audio track from the upload.
+    """
+
+
+def get_ffmpeg_exe() -> str:
+    # imageio-ffmpeg ships a static ffmpeg build, so no system package is needed
+    import imageio_ffmpeg
+
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def ffmpeg_command(source: str) -> List[str]:
+    return [
+        get_ffmpeg_exe(), "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", source,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-acodec", "pcm_s16le",
+        "pipe:1",
+    ]
+
+
+def _run_ffmpeg(command: List[str], stdin: bytes, timeout: float) -> subprocess.CompletedProcess:
+    # communicate() feeds stdin and drains stdout/stderr concurrently, so large uploads cannot deadlock the pipes
+    return subprocess.run(command, input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+
+
+def extract_audio_file(path: str, timeout: float = None) -> bytes:
+    """
+    Decode the audio track of a video file to raw 16 kHz mono PCM; ffmpeg reads the file itself, so the video
+    is never loaded into this process.
+    """
+    result = _run_ffmpeg(ffmpeg_command(path), b"", timeout or config.AUDIO_EXTRACTION_TIMEOUT)
+    if result.returncode != 0 or not result.stdout:
+        error = result.stderr.decode(errors="replace").strip() or "no audio track found"
+        raise AudioExtractionError(f"Could not extract audio: {error}")
+    return result.stdout
+
+
+def extract_audio(video_bytes: bytes, timeout: float = None) -> bytes:
+    """
+    Decode the audio track of an in-memory video to raw 16 kHz mono PCM.
+    The upload is piped through ffmpeg first; containers that need seeking (e.g. MP4 with its index at
+    the end) cannot be read from a pipe, so those fall back to a private temporary directory that is
+    removed as soon as ffmpeg exits.
+    """
+    timeout = timeout or config.AUDIO_EXTRACTION_TIMEOUT
+    result = _run_ffmpeg(ffmpeg_command("pipe:0"), video_bytes, timeout)
+    if result.returncode == 0 and result.stdout:
+        return result.stdout
+
+    logger.debug(f"ffmpeg could not stream the upload, retrying from a seekable file: {result.stderr.decode(errors='replace').strip()}")
+    with tempfile.TemporaryDirectory(prefix="video-to-text-") as directory:
+        path = os.path.join(directory, "upload")
+        with open(path, "wb") as outfile:
+            outfile.write(video_bytes)
+        return extract_audio_file(path, timeout)
+
+
+def extract_audio_data(video: Union[bytes, str], timeout: float = None):
+    """
+    Extract the audio track of an in-memory video, or of the video file at a path, as a speech_recognition
+    AudioData, ready for any recognizer.
+    """
+    import speech_recognition as sr
+
+    pcm = extract_audio_file(video, timeout) if isinstance(video, str) else extract_audio(video, timeout)
+    return sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
@@ -0,0 +1,132 @@
+import csv
+import logging
+import re
+from collections import namedtuple
+from typing import List, Optional
+
+from app.core.config import Config
+from app.services.fuzzy_index import FuzzyIndex
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+# Same metadata fields data/upload_lab_test_to_pinecone.py stores for every vector
+CATALOG_FIELDS = ["Test ID", "CPT Code", "Test Name", "Sample Type", "Container", "TAT", "Price (AED)", "Description", "Tags"]
+# Stored as numbers in Pinecone, and returned as numbers by every lookup path
+NUMERIC_FIELDS = ["Test ID", "CPT Code", "Price (AED)"]
+
+CatalogSnapshot = namedtuple("CatalogSnapshot", ["records", "by_name", "by_cpt", "fuzzy"])
+
+
+def normalize_test_name(name) -> str:
+    return re.sub(r'\s+', ' ', str(name)).strip().casefold()
+
+
+def normalize_cpt_code(code) -> str:
+    code = str(code).strip().casefold()
+    # pandas writes numeric codes back out as floats, e.g. "80061.0"
+    return code[:-2] if code.endswith(".0") else code
+
+
+def coerce_number(value):
+    """
+    Numbers and numeric strings become an int when integral ("80061", "80061.0", 80061.0) and a float otherwise;
+    anything else is returned unchanged.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            value = float(value.strip())
+        except ValueError:
+            return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def clean_catalog_metadata(metadata: dict) -> dict:
+    """
+    Coerce the numeric catalog fields of a record, whichever path it came from: the CSV (strings), pandas in the
+    ingestion script (ints or floats) or Pinecone (which returns every metadata number as a float).
+    """
+    cleaned = dict(metadata)
+    for field in NUMERIC_FIELDS:
+        if field in cleaned:
+            cleaned[field] = coerce_number(cleaned[field])
+    return cleaned
+
+
+def clean_catalog_row(row: dict) -> dict:
+    """
+    Mirror clean_data() in the ingestion script: empty prices become 0, other empty values become "".
+    """
+    cleaned = {}
+    for field in CATALOG_FIELDS:
+        value = (row.get(field) or "").strip()
+        if field == 'Price (AED)':
+            value = coerce_number(value) if value else 0
+            cleaned[field] = value if isinstance(value, (int, float)) else 0
+        else:
+            cleaned[field] = value
+    return clean_catalog_metadata(cleaned)
+
+
+def load_catalog_records(csv_path: str) -> List[dict]:
+    with open(csv_path, mode='r', newline='', encoding='utf-8') as infile:
+        return [clean_catalog_row(row) for row in csv.DictReader(infile)]
+
+
+class CatalogIndex:
+    """
+    In-process index over the lab test catalog CSV: exact matches keyed on normalized test name and CPT code,
+    plus a trigram index over names and tags for approximate matches.
+    """
+
+    def __init__(self, csv_path: str):
+        self.csv_path = csv_path
+        self._snapshot = CatalogSnapshot([], {}, {}, FuzzyIndex([]))
+        self.loaded = False
+
+    @property
+    def records(self) -> List[dict]:
+        return self._snapshot.records
+
+    def refresh(self) -> int:
+        records = load_catalog_records(self.csv_path)
+        by_name = {}
+        by_cpt = {}
+        for record in records:
+            by_name.setdefault(normalize_test_name(record["Test Name"]), record)
+            cpt_code = normalize_cpt_code(record["CPT Code"])
+            if cpt_code:
+                by_cpt.setdefault(cpt_code, record)
+
+        # Swap the whole snapshot at once so concurrent lookups never see a half-built index
+        self._snapshot = CatalogSnapshot(records, by_name, by_cpt, FuzzyIndex(records))
+        self.loaded = True
+        logger.info(f"Loaded {len(records)} lab tests into the catalog index from {self.csv_path}")
+        return len(records)
+
+    def lookup(self, name_or_code: str) -> Optional[dict]:
+        """
+        Return a copy of the catalog metadata for a test name or CPT code, or None when there is no exact match.
+        """
+        snapshot = self._snapshot
+        record = snapshot.by_name.get(normalize_test_name(name_or_code))
+        if record is None:
+            record = snapshot.by_cpt.get(normalize_cpt_code(name_or_code))
+        return dict(record) if record is not None else None
+
+    def fuzzy_lookup(self, name: str, threshold: float) -> Optional[tuple]:
+        """
+        Return (metadata copy, score) for the closest test name or tag scoring at least threshold, else None.
+        """
+        match = self._snapshot.fuzzy.search(name)
+        if match is None or match[1] < threshold:
+            return None
+        record, score = match
+        return dict(record), score
+
+
+catalog_index = CatalogIndex(config.CATALOG_CSV_PATH)
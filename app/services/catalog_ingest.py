@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.utils.embedding import embed_texts
+
+logger = logging.getLogger(__name__)
+
+UPSERT_BATCH_SIZE = 100  # vectors per Pinecone upsert request
+DELETE_BATCH_SIZE = 1000  # ids per Pinecone delete request, the API maximum
+# Bump when the embedding changes, so the next ingestion re-upserts every row
+EMBEDDING_VERSION = "hashed-tokens-v1"
+MANIFEST_DIR = "data/cache"
+
+
+def embedding_text(record: dict) -> str:
+    # Test Name and Tags only; the description would drown out the name
+    return f"{record['Test Name']} {record['Tags']}"
+
+
+def record_fingerprint(record: dict) -> str:
+    """
+    Hash of everything stored for a vector: its metadata and the embedding version.
+    """
+    payload = json.dumps([EMBEDDING_VERSION, record], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def manifest_path(index_name: str, namespace: str) -> str:
+    # One manifest per namespace, since each namespace holds its own copy of the catalog
+    return os.path.join(MANIFEST_DIR, f"pinecone-manifest-{index_name}-{namespace or 'default'}.json")
+
+
+class IngestManifest:
+    """
+    Fingerprint of every vector last upserted to an index, keyed by vector id and kept in a JSON file, so a
+    rerun only sends rows that are new or changed and deletes rows that left the catalog.
+    An empty path keeps the manifest in memory, which makes every run a full upload.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.fingerprints: Dict[str, str] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as infile:
+                self.fingerprints = json.load(infile)
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def is_current(self, vector_id: str, fingerprint: str) -> bool:
+        return self.fingerprints.get(vector_id) == fingerprint
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Write then rename, so an interrupted save leaves the previous manifest intact
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as outfile:
+            json.dump(self.fingerprints, outfile)
+        os.replace(temporary_path, self.path)
+
+
+async def call_with_retry(func: Callable, *args, retries: int = 4, backoff: float = 1.0, description: str = "request", **kwargs):
+    """
+    Run a blocking Pinecone call in a thread, retrying failures with exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+            logger.warning(f"Pinecone {description} failed ({str(e)}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+
+class CatalogIngestion:
+    """
+    Streams catalog chunks into a Pinecone index: each chunk's changed rows are embedded in one vectorized call
+    and upserted in batches, with at most `concurrency` requests in flight. Reading waits while all request slots
+    are taken, so memory stays bounded by the chunk size whatever the catalog size.
+    A row is recorded in the manifest only once its batch is upserted; failed batches are retried on the next run.
+    """
+
+    def __init__(self, index, manifest: IngestManifest, namespace: Optional[str] = None,
+                 batch_size: int = UPSERT_BATCH_SIZE, concurrency: int = 4, retries: int = 4, backoff: float = 1.0,
+                 embed: Callable[[Iterable[str]], object] = embed_texts):
+        self.index = index
+        self.manifest = manifest
+        self.namespace = namespace
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.embed = embed
+        self._slots = asyncio.Semaphore(concurrency)
+        self.stats = {"rows": 0, "unchanged": 0, "upserted": 0, "failed": 0, "deleted": 0}
+
+    def _namespace_kwargs(self) -> dict:
+        return {"namespace": self.namespace} if self.namespace else {}
+
+    async def _upsert(self, batch: List[dict], fingerprints: List[str]):
+        try:
+            await call_with_retry(self.index.upsert, vectors=batch, retries=self.retries, backoff=self.backoff,
+                                  description=f"upsert of {len(batch)} vectors", **self._namespace_kwargs())
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"Giving up on a batch of {len(batch)} vectors ({batch[0]['id']} to {batch[-1]['id']}): {str(e)}")
+        else:
+            self.stats["upserted"] += len(batch)
+            for vector, fingerprint in zip(batch, fingerprints):
+                self.manifest.fingerprints[vector["id"]] = fingerprint
+        finally:
+            self._slots.release()
+
+    async def run(self, chunks: Iterable[List[dict]], prune: bool = True) -> dict:
+        """
+        Ingest every chunk of records, then delete the vectors of rows no longer in the catalog when prune is set.
+        """
+        seen_ids = set()
+        pending = set()
+        try:
+            for records in chunks:
+                self.stats["rows"] += len(records)
+                changed = []
+                for record in records:
+                    vector_id = str(record["Test ID"])
+                    seen_ids.add(vector_id)
+                    fingerprint = record_fingerprint(record)
+                    if self.manifest.is_current(vector_id, fingerprint):
+                        self.stats["unchanged"] += 1
+                    else:
+                        changed.append((vector_id, fingerprint, record))
+                if not changed:
+                    continue
+
+                embeddings = self.embed([embedding_text(record) for _, _, record in changed])
+                for start in range(0, len(changed), self.batch_size):
+                    rows = changed[start:start + self.batch_size]
+                    batch = [{"id": vector_id, "values": embedding.tolist(), "metadata": record}
+                             for (vector_id, _, record), embedding in zip(rows, embeddings[start:start + self.batch_size])]
+                    await self._slots.acquire()
+                    task = asyncio.create_task(self._upsert(batch, [fingerprint for _, fingerprint, _ in rows]))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                # Checkpoint between chunks so an interrupted run keeps what it already upserted
+                self.manifest.save()
+
+            if pending:
+                await asyncio.gather(*pending)
+            if prune:
+                await self.delete_missing(seen_ids)
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            self.manifest.save()
+        return self.stats
+
+    async def delete_missing(self, seen_ids: set):
+        stale_ids = sorted(set(self.manifest.fingerprints) - seen_ids)
+        for start in range(0, len(stale_ids), DELETE_BATCH_SIZE):
+            ids = stale_ids[start:start + DELETE_BATCH_SIZE]
+            await call_with_retry(self.index.delete, ids=ids, retries=self.retries, backoff=self.backoff,
+                                  description=f"delete of {len(ids)} vectors", **self._namespace_kwargs())
+            for vector_id in ids:
+                del self.manifest.fingerprints[vector_id]
+            self.stats["deleted"] += len(ids)
+
+
+def namespace_vector_count(stats, namespace: str) -> int:
+    summary = stats["namespaces"].get(namespace)
+    return summary["vector_count"] if summary else 0
+
+
+def new_namespace_name(prefix: str = "catalog") -> str:
+    return f"{prefix}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}"
+
+
+async def wait_for_vector_count(index, namespace: str, expected: int, timeout: float = 300, interval: float = 5) -> int:
+    """
+    Poll the index stats until the namespace holds expected vectors. Pinecone applies upserts asynchronously,
+    so the count lags behind the last successful upsert for a while. Returns the last count seen.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        count = namespace_vector_count(await asyncio.to_thread(index.describe_index_stats), namespace)
+        if count == expected or time.monotonic() >= deadline:
+            return count
+        logger.info(f"Namespace '{namespace}' holds {count} of {expected} vectors, waiting")
+        await asyncio.sleep(interval)
+
+
+async def delete_namespace(index, namespace: str, retries: int = 4, backoff: float = 1.0):
+    # One request however many vectors the namespace holds
+    await call_with_retry(index.delete, delete_all=True, namespace=namespace, retries=retries, backoff=backoff,
+                          description=f"delete of namespace '{namespace}'")
+
+
+async def reindex_catalog(index, chunks: Iterable[List[dict]], pointer, namespace: Optional[str] = None,
+                          manifest_path: Optional[str] = None, keep: int = 1, validate_timeout: float = 300,
+                          validate_interval: float = 5, **ingestion_options) -> dict:
+    """
+    Build the catalog in a fresh namespace while the current one keeps serving, check that the new namespace holds
+    one vector per catalog row, then switch the pointer to it and drop all but the `keep` most recent previous
+    namespaces. A failed build or validation deletes the new namespace and leaves the pointer untouched.
+    """
+    namespace = namespace or new_namespace_name()
+    serving = pointer.current()
+    if namespace == serving:
+        raise ValueError(f"Namespace '{namespace}' is already serving")
+
+    manifest = IngestManifest(manifest_path)
+    manifest.fingerprints.clear()
+    ingestion = CatalogIngestion(index, manifest, namespace=namespace, **ingestion_options)
+    logger.info(f"Reindexing the catalog into namespace '{namespace}' while '{serving}' keeps serving")
+    try:
+        stats = await ingestion.run(chunks, prune=False)
+        if stats["failed"]:
+            raise RuntimeError(f"{stats['failed']} vectors failed to upsert")
+        expected = len(manifest)
+        count = await wait_for_vector_count(index, namespace, expected, validate_timeout, validate_interval)
+        if count != expected:
+            raise RuntimeError(f"Namespace '{namespace}' holds {count} vectors, expected {expected}")
+    except BaseException:
+        logger.error(f"Reindex into '{namespace}' failed, deleting it; '{serving}' is still serving")
+        await delete_namespace(index, namespace, ingestion.retries, ingestion.backoff)
+        if manifest_path and os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        raise
+
+    pointer.switch(namespace)
+    previous = pointer.previous()
+    retired = previous[keep:]
+    for old_namespace in retired:
+        await delete_namespace(index, old_namespace, ingestion.retries, ingestion.backoff)
+        logger.info(f"Deleted retired namespace '{old_namespace}'")
+    pointer.switch(namespace, previous=previous[:keep])
+    return {**stats, "namespace": namespace, "vectors": count, "retired": retired}
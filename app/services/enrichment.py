@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Async rate limiter: holds up to `capacity` tokens, refilled at `rate` tokens per second. Size it to the
+    provider quota, e.g. TokenBucket.per_minute(500) for 500 requests per minute.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests: float, burst: Optional[float] = None):
+        return cls(requests / 60, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        # The lock queues waiters in arrival order, so no caller starves
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+
+class Checkpoint:
+    """
+    Append-only JSONL file of finished items, one {"key", "value"} line each, flushed as every item finishes.
+    Reloading it tells an interrupted run which items are already done; a line cut short by a crash is ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.values: Dict[str, object] = {}
+        terminated = True
+        if os.path.exists(path):
+            with open(path, "rb") as infile:
+                if infile.seek(0, os.SEEK_END):
+                    infile.seek(-1, os.SEEK_END)
+                    terminated = infile.read(1) == b"\n"
+            with open(path, encoding="utf-8") as infile:
+                for line in infile:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Ignoring an incomplete line in checkpoint {path}")
+                        continue
+                    self.values[entry["key"]] = entry["value"]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if not terminated:
+            # Terminate the incomplete line, or the next entry would be appended to it and lost too
+            self._file.write("\n")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, key: str, value):
+        self.values[key] = value
+        self._file.write(json.dumps({"key": key, "value": value}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class EnrichmentRunner:
+    """
+    Runs an async `process(payload)` call (typically one LLM request) for many keyed items: at most `concurrency`
+    at once, each attempt admitted by the rate limiter, failures retried with exponential backoff. Every result is
+    checkpointed as soon as it arrives, so a rerun after a crash only processes the items still missing; items with
+    the same key are processed once. Wall time is bounded by the rate limit rather than by per-call latency.
+    """
+
+    def __init__(self, process: Callable[[object], Awaitable[object]], checkpoint: Checkpoint,
+                 rate_limiter: Optional[TokenBucket] = None, concurrency: int = 8, retries: int = 4, backoff: float = 2.0):
+        self.process = process
+        self.checkpoint = checkpoint
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.failed: Dict[str, str] = {}
+
+    async def _process_with_retry(self, key: str, payload):
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            try:
+                return await self.process(payload)
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"Enrichment of {key!r} failed ({str(e)}), retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def run(self, items: Iterable[Tuple[str, object]], progress: Callable[[int, int], None] = None) -> List[object]:
+        """
+        Process every (key, payload) item not in the checkpoint yet and return the values in input order,
+        None for items that still failed after all retries (listed in self.failed).
+        """
+        items = list(items)
+        distinct = dict(items)
+        todo = [(key, payload) for key, payload in distinct.items() if key not in self.checkpoint]
+        total = len(todo)
+        done = 0
+        logger.info(f"{len(distinct) - total} of {len(distinct)} distinct items already in checkpoint {self.checkpoint.path}, "
+                    f"processing {total}")
+
+        async def worker(queue: Iterator):
+            nonlocal done
+            for key, payload in queue:
+                try:
+                    self.checkpoint.append(key, await self._process_with_retry(key, payload))
+                except Exception as e:
+                    self.failed[key] = str(e)
+                    logger.error(f"Giving up on {key!r}: {str(e)}")
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+
+        queue = iter(todo)
+        await asyncio.gather(*[worker(queue) for _ in range(min(self.concurrency, total))])
+        return [self.checkpoint.values.get(key) for key, _ in items]
@@ -0,0 +1,75 @@
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TEST_NAME = 0
+TAG = 1
+
+
+def normalize_text(text) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', str(text).casefold()).strip()
+
+
+def trigrams(text: str) -> set:
+    # Pad so short names and abbreviations such as "TSH" still produce word-boundary trigrams
+    padded = f"  {normalize_text(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """
+    Trigram inverted index over catalog test names and their comma-separated Tags.
+    search() scores every entry sharing a trigram with the query by Jaccard similarity in a single
+    np.bincount over the posting lists, so a lookup costs microseconds rather than a network round-trip.
+    """
+
+    def __init__(self, records: List[dict]):
+        entry_records = []
+        entry_kinds = []
+        entry_sizes = []
+        postings = {}
+
+        for record_position, record in enumerate(records):
+            texts = [(TEST_NAME, record.get("Test Name", ""))]
+            texts += [(TAG, tag) for tag in str(record.get("Tags", "")).split(",")]
+            seen = set()
+            for kind, text in texts:
+                normalized = normalize_text(text)
+                if not normalized or normalized in seen:
+                    continue
+                seen.add(normalized)
+                grams = trigrams(normalized)
+                entry_id = len(entry_records)
+                for gram in grams:
+                    postings.setdefault(gram, []).append(entry_id)
+                entry_records.append(record_position)
+                entry_kinds.append(kind)
+                entry_sizes.append(len(grams))
+
+        self.records = records
+        self.entry_records = np.asarray(entry_records, dtype=np.int64)
+        self.entry_kinds = np.asarray(entry_kinds, dtype=np.int8)
+        self.entry_sizes = np.asarray(entry_sizes, dtype=np.float64)
+        self.postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.entry_records)
+
+    def search(self, query: str) -> Optional[Tuple[dict, float]]:
+        """
+        Return (record, score) for the best scoring entry, or None when nothing shares a trigram with the query.
+        Ties prefer a test name over a tag.
+        """
+        query_grams = trigrams(query)
+        hits = [self.postings[gram] for gram in query_grams if gram in self.postings]
+        if not hits:
+            return None
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.entry_records)).astype(np.float64)
+        scores = shared / (len(query_grams) + self.entry_sizes - shared)
+        # Names win ties against tags by a margin far below any real score difference
+        scores -= self.entry_kinds * 1e-9
+
+        best = int(np.argmax(scores))
+        return self.records[self.entry_records[best]], round(float(scores[best]), 6)
@@ -0,0 +1,346 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from app.core.config import Config
+from app.utils.metrics import stage
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    stage TEXT,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at);
+"""
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running job once it has been cancelled, to stop it at the next progress report.
+    """
+
+
+def _owner_alive(owner: Optional[str], updated_at: float, stale_after: float) -> bool:
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        # Processes on another host (or a recreated container) cannot be checked; trust recent progress only
+        return time.time() - updated_at < stale_after
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return int(pid) != os.getpid()
+
+
+class JobStore:
+    """
+    SQLite table of background jobs plus a spool directory holding each job's uploaded payload.
+    Every uvicorn worker can open the same store; claim_next() hands each queued job to exactly one of them.
+    All methods are blocking and should be called from a worker thread.
+    """
+
+    def __init__(self, path: str, spool_dir: str):
+        self.path = path
+        self.spool_dir = spool_dir
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def payload_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.bin")
+
+    def create(self, kind: str, payload: bytes, params: dict) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"upload-{uuid.uuid4().hex}.part")
+        with open(path, "wb") as outfile:
+            outfile.write(payload)
+        return self.create_from_file(kind, path, params)
+
+    def create_from_file(self, kind: str, path: str, params: dict) -> str:
+        """
+        Create a job whose payload was already written to path (on the spool's filesystem); the file is moved in.
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.spool_dir, exist_ok=True)
+        os.replace(path, self.payload_path(job_id))
+
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def claim_next(self, owner: str, kinds: Iterable[str]) -> Optional[dict]:
+        """
+        Atomically move the oldest queued job of one of the given kinds to running for this owner and return it.
+        Jobs of other kinds are left for processes that have a handler for them.
+        """
+        kinds = list(kinds)
+        if not kinds:
+            return None
+        placeholders = ",".join("?" * len(kinds))
+        with self._connection() as conn:
+            row = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ? "
+                f"WHERE id = (SELECT id FROM jobs WHERE status = ? AND kind IN ({placeholders}) ORDER BY created_at LIMIT 1) "
+                "AND status = ? RETURNING id",
+                (RUNNING, owner, time.time(), QUEUED, *kinds, QUEUED)
+            ).fetchone()
+        return self.get(row["id"]) if row else None
+
+    def update_progress(self, job_id: str, progress: float, stage: str) -> bool:
+        """
+        Record progress of a running job. Returns False once the job is no longer running (e.g. cancelled).
+        """
+        with self._connection() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET progress = ?, stage = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (progress, stage, time.time(), job_id, RUNNING)
+            ).rowcount
+        return bool(updated)
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: str = None) -> bool:
+        # Only a running job can finish, so a result arriving after cancellation is dropped
+        with self._connection() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, progress = CASE WHEN ? = ? THEN 1 ELSE progress END, result = ?, error = ?, "
+                "updated_at = ? WHERE id = ? AND status = ?",
+                (status, status, SUCCEEDED, json.dumps(result) if result is not None else None, error, time.time(),
+                 job_id, RUNNING)
+            ).rowcount
+        self.remove_payload(job_id)
+        return bool(updated)
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a queued or running job. Returns the job as it was before cancelling, or None if unknown.
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            )
+        self.remove_payload(job_id)
+        return job
+
+    def remove_payload(self, job_id: str):
+        try:
+            os.remove(self.payload_path(job_id))
+        except FileNotFoundError:
+            pass
+
+    def recover(self, stale_after: float = 600) -> int:
+        """
+        Requeue jobs left running by a worker process that no longer exists, e.g. after a restart.
+        """
+        with self._connection() as conn:
+            rows = conn.execute("SELECT id, owner, updated_at FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            orphaned = [row["id"] for row in rows if not _owner_alive(row["owner"], row["updated_at"], stale_after)]
+            conn.executemany(
+                "UPDATE jobs SET status = ?, owner = NULL, progress = 0, stage = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                [(QUEUED, time.time(), job_id, RUNNING) for job_id in orphaned]
+            )
+        return len(orphaned)
+
+    def purge(self, older_than: float) -> int:
+        """
+        Delete finished jobs last updated more than older_than seconds ago.
+        """
+        with self._connection() as conn:
+            return conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))}) AND updated_at < ?",
+                (*FINISHED, time.time() - older_than)
+            ).rowcount
+
+
+class JobQueue:
+    """
+    Runs jobs from a JobStore on at most `concurrency` background tasks per worker process.
+    Handlers are blocking functions handler(payload_path, params, progress) executed in a thread, reading the
+    payload from the spool file at payload_path; progress(fraction, stage) records how far along the job is and raises JobCancelled once it was cancelled.
+    """
+
+    def __init__(self, store: JobStore, concurrency: int, retention: float, poll_interval: float):
+        self.store = store
+        self.concurrency = concurrency
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, Callable] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._workers = []
+        self._running = {}  # job id -> asyncio.Task
+        self._cancelled = set()
+        self._wake = None
+
+    def register(self, kind: str, handler: Callable):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        if self._workers:
+            return
+        if not self.handlers:
+            # No service registered a job kind (e.g. video is not in ENABLED_SERVICES), so there is nothing to run
+            logger.info("No job handlers registered, not starting the job queue")
+            return
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        requeued = await asyncio.to_thread(self.store.recover)
+        purged = await asyncio.to_thread(self.store.purge, self.retention)
+        if requeued or purged:
+            logger.info(f"Requeued {requeued} interrupted jobs and purged {purged} finished jobs")
+        self._wake = asyncio.Event()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, kind: str, payload: bytes, params: dict = None) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = await asyncio.to_thread(self.store.create, kind, payload, params or {})
+        self._notify()
+        return job_id
+
+    async def submit_file(self, kind: str, path: str, params: dict = None) -> str:
+        """
+        Like submit(), for a payload already streamed to a file in the spool directory.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = await asyncio.to_thread(self.store.create_from_file, kind, path, params or {})
+        self._notify()
+        return job_id
+
+    def _notify(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        job = await asyncio.to_thread(self.store.cancel, job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            # The handler thread stops at its next progress report; stop waiting for it right away
+            self._cancelled.add(job_id)
+            task.cancel()
+        return job
+
+    async def _work(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next, self.owner, tuple(self.handlers))
+            if job is None:
+                # Local submissions wake a worker immediately; jobs submitted to other processes are polled for
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._execute(job))
+            self._running[job["id"]] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                # Either this job was cancelled, or the worker itself is stopping and the job stays
+                # marked running until recover() requeues it on the next start
+                if job["id"] not in self._cancelled:
+                    raise
+                logger.info(f"Job {job['id']} was cancelled")
+            finally:
+                self._running.pop(job["id"], None)
+                self._cancelled.discard(job["id"])
+
+    async def _execute(self, job: dict):
+        job_id = job["id"]
+
+        def progress(fraction: float, stage: str):
+            if not self.store.update_progress(job_id, round(min(max(fraction, 0.0), 1.0), 4), stage):
+                raise JobCancelled(job_id)
+
+        def run():
+            # Handlers get the path, so large payloads such as videos are never read into memory
+            return self.handlers[job["kind"]](self.store.payload_path(job_id), job["params"], progress)
+
+        try:
+            async with stage(f"job.{job['kind']}"):
+                result = await asyncio.to_thread(run)
+        except JobCancelled:
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['kind']}) failed: {str(e)}")
+            await asyncio.to_thread(self.store.finish, job_id, FAILED, None, str(e))
+            return
+        await asyncio.to_thread(self.store.finish, job_id, SUCCEEDED, result)
+
+
+job_queue = JobQueue(
+    JobStore(config.JOB_STORE_PATH, config.JOB_SPOOL_DIR),
+    concurrency=config.JOB_CONCURRENCY,
+    retention=config.JOB_RETENTION,
+    poll_interval=config.JOB_POLL_INTERVAL,
+)
@@ -0,0 +1,95 @@
+import logging
+from functools import lru_cache
+
+from app.core.config import Config
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+AI71_BASE_URL = "https://api.ai71.ai/v1/"
+
+# LangChain and the OpenAI SDK take about a second to import, so they are only loaded once a client is built
+
+
+@lru_cache(maxsize=1)
+def get_llm_http_client():
+    """
+    Connection pool for the async AI71 calls. Idle connections are kept long enough that the TLS session opened
+    by warm_llm_client() is still there for the first request.
+    """
+    import httpx
+    import openai
+
+    return httpx.AsyncClient(
+        timeout=openai.DEFAULT_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=config.LLM_MAX_CONNECTIONS,
+                            max_keepalive_connections=config.LLM_MAX_CONNECTIONS,
+                            keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_chat_model():
+    """
+    Chat model for the AI71 Falcon-180B model, shared by every request in the worker.
+    """
+    import openai
+    from langchain_openai import ChatOpenAI
+
+    async_client = openai.AsyncOpenAI(api_key=config.AI71_API_KEY, base_url=AI71_BASE_URL,
+                                      http_client=get_llm_http_client())
+    return ChatOpenAI(
+        model=config.AI71_MODEL,
+        api_key=config.AI71_API_KEY,
+        base_url=AI71_BASE_URL,
+        streaming=False,
+        async_client=async_client.chat.completions,
+    )
+
+
+def load_chat_model():
+    # Also import what the recommendation calls use, off the event loop and before the first request
+    import langchain_community.callbacks  # noqa: F401
+    import langchain_core.messages  # noqa: F401
+
+    return get_chat_model()
+
+
+class LazyChatModel:
+    """
+    Stands in for the chat model and builds it on first use, so importing the endpoints does not load LangChain.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_chat_model(), name)
+
+
+chat_model = LazyChatModel()
+
+
+def chat_messages(system: str, human: str) -> list:
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    return [SystemMessage(content=system), HumanMessage(content=human)]
+
+
+def token_usage():
+    """
+    Context manager counting the AI71 calls and tokens made inside it.
+    """
+    from langchain_community.callbacks import get_openai_callback
+
+    return get_openai_callback()
+
+
+async def warm_llm_client(chat=None):
+    # Any response will do: the point is the DNS lookup and TLS handshake, not the answer
+    response = await get_llm_http_client().head(AI71_BASE_URL)
+    logger.info(f"Warmed AI71 connection pool (HTTP {response.status_code})")
+
+
+async def close_llm_client(chat=None):
+    await get_llm_http_client().aclose()
+    get_llm_http_client.cache_clear()
+    get_chat_model.cache_clear()
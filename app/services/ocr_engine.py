@@ -0,0 +1,262 @@
+import asyncio
+import io
+import logging
+import math
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+from app.core.config import Config
+from app.utils.metrics import metrics
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+# Tesseract's own timeout ends this much before the job's deadline, so pytesseract kills the tesseract process
+# instead of the job's alarm interrupting it and leaving the process behind
+TESSERACT_DEADLINE_MARGIN = 0.2
+# time.monotonic() deadline of the job running in this worker process, None outside of run_job()
+_job_deadline = None
+
+
+class OCRSaturated(Exception):
+    """
+    Raised when the OCR submission queue is full. retry_after is a hint in seconds for the client.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"OCR engine is saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class OCRJobTimeout(Exception):
+    """
+    Raised inside a worker process when a job runs past its deadline; OCREngine turns it into asyncio.TimeoutError.
+    """
+
+
+def _expire_job(signum, frame):
+    raise OCRJobTimeout("OCR job exceeded its deadline")
+
+
+def run_job(func, args: tuple, timeout: float):
+    """
+    Runs func(*args) in a worker process with a deadline that starts when the job starts running, not when it
+    was queued. A SIGALRM interrupts the job once the deadline passes, so the worker is free for the next one.
+    """
+    global _job_deadline
+    if not timeout or not hasattr(signal, "setitimer"):
+        return func(*args)
+    _job_deadline = time.monotonic() + timeout
+    previous_handler = signal.signal(signal.SIGALRM, _expire_job)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+        _job_deadline = None
+
+
+def warm_worker():
+    # Pay the Tesseract/Pillow import cost once per worker process instead of once per job
+    import pymupdf  # noqa: F401
+    import pytesseract
+    from PIL import Image  # noqa: F401
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        logger.warning(f"Tesseract is not available in OCR worker: {str(e)}")
+
+
+def ping() -> bool:
+    return True
+
+
+def split_pdf_pages(pdf_bytes: bytes, max_pages: int) -> List[bytes]:
+    """
+    Split a PDF into standalone single-page PDFs so each page can be rendered and OCR'd by a different worker.
+    At most max_pages + 1 pages are returned, which is enough for the caller to detect an oversized upload.
+    """
+    import pymupdf
+
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as document:
+        pages = []
+        for page_number in range(min(document.page_count, max_pages + 1)):
+            with pymupdf.open() as page_document:
+                page_document.insert_pdf(document, from_page=page_number, to_page=page_number)
+                pages.append(page_document.tobytes(garbage=3, deflate=True))
+        return pages
+
+
+def load_page_image(page_bytes: bytes):
+    from PIL import Image
+
+    if not page_bytes.startswith(b"%PDF"):
+        return Image.open(io.BytesIO(page_bytes))
+
+    import pymupdf
+
+    # Render straight to 8-bit grayscale at the target DPI instead of rasterizing in colour and converting
+    with pymupdf.open(stream=page_bytes, filetype="pdf") as document:
+        pixmap = document.load_page(0).get_pixmap(dpi=config.OCR_TARGET_DPI, colorspace=pymupdf.csGRAY, alpha=False)
+        image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    image.info["dpi"] = (config.OCR_TARGET_DPI, config.OCR_TARGET_DPI)
+    return image
+
+
+def preprocess_image(image):
+    """
+    Grayscale the page and downscale it to the target DPI, never exceeding OCR_MAX_DIMENSION on the longest side.
+    Tesseract works on a binarized single-channel image anyway, and phone photos are often 3-4x larger than it needs.
+    Images are never upscaled. Returns (image, dpi) with dpi being the resolution of the returned image, 0 if unknown.
+    """
+    from PIL import Image, ImageOps
+
+    dpi = image.info.get("dpi", (0, 0))[0] or 0
+    image = ImageOps.exif_transpose(image).convert("L")
+
+    scale = min(1.0, config.OCR_TARGET_DPI / dpi) if dpi else 1.0
+    scale = min(scale, config.OCR_MAX_DIMENSION / max(image.size))
+    if scale < 0.95:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    else:
+        # Close enough to the target that resampling would only blur the page
+        scale = 1.0
+    return image, round(dpi * scale) if dpi else 0
+
+
+def ocr_image_bytes(image_bytes: bytes, timeout: float = 0) -> str:
+    """
+    OCR a single image, or the first page of a PDF, after preprocessing it.
+    """
+    import pytesseract
+
+    with load_page_image(image_bytes) as image:
+        page, dpi = preprocess_image(image)
+    # Passing the real resolution stops Tesseract from guessing it (and warning) on images without DPI metadata
+    tesseract_config = f"--dpi {dpi}" if dpi else ""
+    if _job_deadline is not None:
+        seconds_left = max(0.01, _job_deadline - time.monotonic() - TESSERACT_DEADLINE_MARGIN)
+        timeout = min(timeout, seconds_left) if timeout else seconds_left
+    # pytesseract kills the tesseract subprocess itself once timeout expires, freeing the worker
+    try:
+        return pytesseract.image_to_string(page, config=tesseract_config, timeout=timeout)
+    except RuntimeError as e:
+        if "timeout" in str(e):
+            raise OCRJobTimeout(str(e)) from e
+        raise
+
+
+class OCREngine:
+    """
+    Runs CPU-bound OCR jobs in a pool of pre-warmed worker processes so they never block the event loop.
+    At most max_pending jobs may be queued or running at once; beyond that submissions fail fast with
+    OCRSaturated so the API can answer 503 instead of piling up work it cannot finish in time.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.average_job_seconds = 1.0
+        self._executor = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._executor is None:
+                self._start_workers()
+
+    def _start_workers(self):
+        # "spawn" rather than fork: forking a process that already runs threads (uvicorn, asyncio's
+        # thread pool) can deadlock the children
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_worker,
+        )
+        # Processes are spawned on demand; submitting one job per worker before any finishes starts them all now
+        for future in [self._executor.submit(ping) for _ in range(self.workers)]:
+            future.result()
+        logger.info(f"Started OCR engine with {self.workers} worker processes")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def retry_after(self) -> int:
+        # Rough time for the current backlog to drain across all workers
+        return max(1, math.ceil(self.pending * self.average_job_seconds / self.workers))
+
+    def _release(self, started_at: float):
+        self.pending -= 1
+        # Exponentially weighted average keeps Retry-After close to recent job durations
+        self.average_job_seconds = 0.8 * self.average_job_seconds + 0.2 * (time.monotonic() - started_at)
+
+    def _job_done(self, loop, started_at: float):
+        try:
+            loop.call_soon_threadsafe(self._release, started_at)
+        except RuntimeError:
+            # The submitting event loop has already closed, so nothing else can be touching the counter
+            self._release(started_at)
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) in a worker process. Raises OCRSaturated when the queue is full and
+        asyncio.TimeoutError when the job runs longer than the configured timeout; time spent queued
+        behind other jobs does not count.
+        """
+        if self.pending >= self.max_pending:
+            raise OCRSaturated(self.retry_after())
+        return await self._run(func, args)
+
+    async def run_many(self, func, arg_lists: List[tuple]) -> list:
+        """
+        Run func over every argument tuple in parallel and return the results in order.
+        The batch is admitted as a whole: an idle engine always accepts it, otherwise it must fit in the
+        remaining queue space, so a multi-page document is never left half-submitted.
+        """
+        if self.pending and self.pending + len(arg_lists) > self.max_pending:
+            raise OCRSaturated(self.retry_after())
+        return await asyncio.gather(*[self._run(func, args) for args in arg_lists])
+
+    async def _run(self, func, args: tuple):
+        if self._executor is None:
+            await asyncio.to_thread(self.start)
+        loop = asyncio.get_running_loop()
+        started_at = time.monotonic()
+        try:
+            job = self._executor.submit(run_job, func, args, self.timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by the OOM killer); replace the pool and try once more
+            logger.error("OCR worker pool is broken, restarting it")
+            self.shutdown()
+            await asyncio.to_thread(self.start)
+            job = self._executor.submit(run_job, func, args, self.timeout)
+
+        self.pending += 1
+        # The slot is held until the worker is actually done, even if the caller stopped waiting
+        job.add_done_callback(lambda _: self._job_done(loop, started_at))
+        try:
+            return await asyncio.wrap_future(job)
+        except OCRJobTimeout as e:
+            raise asyncio.TimeoutError(str(e)) from e
+
+
+ocr_engine = OCREngine(
+    workers=config.OCR_WORKERS,
+    max_pending=config.OCR_MAX_PENDING,
+    timeout=config.OCR_TIMEOUT,
+)
+
+OCR_PENDING = metrics.gauge("razee_ocr_pending_jobs", "OCR jobs queued or running in the worker pool.")
+metrics.register_collector(lambda: [(OCR_PENDING, (), ocr_engine.pending)])
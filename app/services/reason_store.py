@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+from app.core.config import Config
+from app.utils.metrics import register_cache
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reasons (
+    key TEXT PRIMARY KEY,
+    test_name TEXT NOT NULL,
+    model TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reasons_last_used_at ON reasons (last_used_at);
+"""
+
+
+def _canonical(values: Iterable[str]) -> List[str]:
+    return sorted({value.strip().casefold() for value in values if value.strip()})
+
+
+class ReasonStore:
+    """
+    Persistent store of generated test reasons, shared by every uvicorn worker on the host.
+    Entries live in SQLite (WAL mode, so readers never block on a writer) with least-recently-used
+    eviction past max_entries, and the hottest entries are kept in an in-process LRU in front of it.
+    All methods are blocking and should be called from a worker thread.
+    """
+
+    def __init__(self, path: str, model: str, max_entries: int, memory_entries: int):
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_ready = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def key(self, test_name: str, health_goals: List[str], current_diseases: List[str]) -> str:
+        normalized = [self.model, test_name.strip().casefold(), _canonical(health_goals), _canonical(current_diseases)]
+        return hashlib.sha256(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, so each thread keeps its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, entries: Dict[str, str]):
+        with self._memory_lock:
+            for key, reason in entries.items():
+                self._memory[key] = reason
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if not self.enabled or not keys:
+            return {}
+
+        found = {}
+        with self._memory_lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            conn = self._connection()
+            placeholders = ",".join("?" * len(missing))
+            with conn:
+                rows = conn.execute(f"SELECT key, reason FROM reasons WHERE key IN ({placeholders})", missing).fetchall()
+                if rows:
+                    conn.execute(f"UPDATE reasons SET last_used_at = ? WHERE key IN ({placeholders})",
+                                 [time.time(), *[key for key, _ in rows]])
+            stored = dict(rows)
+            self._remember(stored)
+            found.update(stored)
+
+        with self._memory_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, tuple]):
+        """
+        Store {key: (test_name, reason)} and evict the least recently used rows beyond max_entries.
+        """
+        if not self.enabled or not entries:
+            return
+
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reasons (key, test_name, model, reason, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, test_name, self.model, reason, now, now) for key, (test_name, reason) in entries.items()]
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM reasons").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM reasons WHERE key IN (SELECT key FROM reasons ORDER BY last_used_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+        self._remember({key: reason for key, (_, reason) in entries.items()})
+
+    def warm(self) -> int:
+        """
+        Preload the most recently used reasons into memory so the first requests after boot skip SQLite.
+        """
+        if not self.enabled:
+            return 0
+
+        rows = self._connection().execute(
+            "SELECT key, reason FROM reasons WHERE model = ? ORDER BY last_used_at DESC LIMIT ?",
+            (self.model, self.memory_entries)
+        ).fetchall()
+        # Insert oldest first so the most recently used end up at the hot end of the LRU
+        self._remember(dict(reversed(rows)))
+        logger.info(f"Warmed reason store with {len(rows)} cached reasons from {self.path}")
+        return len(rows)
+
+
+reason_store = ReasonStore(
+    config.REASON_STORE_PATH,
+    model=config.AI71_MODEL,
+    max_entries=config.REASON_STORE_MAX_ENTRIES,
+    memory_entries=config.REASON_STORE_MEMORY_ENTRIES,
+)
+register_cache("reason_store", lambda: (reason_store.hits, reason_store.misses))
@@ -0,0 +1,159 @@
+import json
+import re
+from typing import List, Optional
+
+# "3. Lipid Panel: Reason: ..." - the name ends at ": Reason:" or the first period, like the original regex
+ITEM_PATTERN = re.compile(r'^\s*(\d+)\.\s+(.*?)(?:\s*:\s*Reason:\s*(.*)|\..*)?$')
+ITEM_START_PATTERN = re.compile(r'^\s*\d')
+NAME_KEYS = ("name", "test", "testName", "test_name", "Test Name")
+NO_REASON = "No reason provided."
+
+
+def _item_from_json(value) -> Optional[dict]:
+    if isinstance(value, str):
+        name, reason = value, ""
+    elif isinstance(value, dict):
+        name = next((value[key] for key in NAME_KEYS if isinstance(value.get(key), str)), None)
+        reason = value.get("reason", "")
+        if name is None:
+            return None
+    else:
+        return None
+
+    name = name.strip()
+    if not name:
+        return None
+    return {"name": name, "reason": reason.strip() if isinstance(reason, str) and reason.strip() else NO_REASON}
+
+
+class IncrementalTestParser:
+    """
+    Single-pass parser for the AI's list of recommended tests that can be fed the response as it streams in.
+    feed() returns the items completed by that chunk so their catalog lookups can start right away.
+
+    Two output formats are understood:
+      text - a numbered list; an item is complete once its line ends. Reason continuation lines are
+             appended to the previous item's reason afterwards.
+      json - a JSON array of test-name strings or {"name": ..., "reason": ...} objects, optionally wrapped
+             in an object or a ```json fence; each entry is emitted as soon as its closing quote/brace arrives.
+             Only entries of such a top-level array count, so strings and objects nested inside an entry
+             (e.g. a "reasons": [...] list) are never taken for test names.
+    "auto" picks json when the response starts with "[" or "{" (after an optional code fence).
+    """
+
+    def __init__(self, output_format: str = "auto"):
+        self.output_format = output_format if output_format in ("text", "json") else None
+        self.items = []
+        self._text = ""
+        self._position = 0
+        # Text mode state
+        self._reason_open = False
+        # JSON mode state; the stack holds (opener, start index, is the list of tests)
+        self._stack = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+
+    def _detect_format(self, final: bool) -> Optional[str]:
+        stripped = self._text.lstrip()
+        if stripped.startswith("```"):
+            if "\n" not in stripped:
+                return "text" if final else None
+            stripped = stripped.split("\n", 1)[1].lstrip()
+        if not stripped:
+            return "text" if final else None
+        return "json" if stripped[0] in "[{" else "text"
+
+    def feed(self, chunk: str) -> List[dict]:
+        self._text += chunk or ""
+        if self.output_format is None:
+            self.output_format = self._detect_format(final=False)
+            if self.output_format is None:
+                return []
+        return self._scan_json() if self.output_format == "json" else self._scan_lines(final=False)
+
+    def close(self) -> List[dict]:
+        """
+        Flush anything still pending, e.g. a final list item without a trailing newline.
+        """
+        if self.output_format is None:
+            self.output_format = self._detect_format(final=True)
+        return self._scan_json() if self.output_format == "json" else self._scan_lines(final=True)
+
+    def _emit(self, item: dict, completed: List[dict]):
+        self.items.append(item)
+        completed.append(item)
+
+    def _scan_lines(self, final: bool) -> List[dict]:
+        completed = []
+        while True:
+            line_end = self._text.find("\n", self._position)
+            if line_end == -1:
+                if not final or self._position >= len(self._text):
+                    break
+                line_end = len(self._text)
+            line = self._text[self._position:line_end]
+            self._position = line_end + 1
+            self._parse_line(line, completed)
+        return completed
+
+    def _parse_line(self, line: str, completed: List[dict]):
+        match = ITEM_PATTERN.match(line)
+        if match:
+            name, reason = match.group(2).strip(), match.group(3)
+            self._reason_open = reason is not None
+            if name:
+                self._emit({"name": name, "reason": reason.strip() if reason and reason.strip() else NO_REASON}, completed)
+        elif self._reason_open and self.items and not ITEM_START_PATTERN.match(line):
+            # Multi-line reasons run until the next line that starts with a digit
+            item = self.items[-1]
+            item["reason"] = line.strip() if item["reason"] == NO_REASON else f"{item['reason']}\n{line}".strip()
+        else:
+            self._reason_open = False
+
+    def _scan_json(self) -> List[dict]:
+        completed = []
+        text = self._text
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    # Bare strings directly inside the list of tests are test names
+                    if self._in_test_list():
+                        item = _item_from_json(json.loads(text[self._string_start:index + 1]))
+                        if item:
+                            self._emit(item, completed)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "[{":
+                # The list of tests is an array at the top level or directly inside a wrapping object
+                is_test_list = char == "[" and (not self._stack or (len(self._stack) == 1 and self._stack[0][0] == "{"))
+                self._stack.append((char, index, is_test_list))
+            elif char in "]}" and self._stack:
+                opener, start, _ = self._stack.pop()
+                # An entry of the list of tests, or a lone object that is the whole response
+                if opener == "{" and (self._in_test_list() or (not self._stack and not self.items)):
+                    try:
+                        item = _item_from_json(json.loads(text[start:index + 1]))
+                    except json.JSONDecodeError:
+                        item = None
+                    if item:
+                        self._emit(item, completed)
+        self._position = len(text)
+        return completed
+
+    def _in_test_list(self) -> bool:
+        return bool(self._stack) and self._stack[-1][2]
+
+
+def parse_recommended_tests(ai_response_content: str, output_format: str = "auto") -> List[dict]:
+    parser = IncrementalTestParser(output_format)
+    parser.feed(ai_response_content)
+    parser.close()
+    return parser.items
@@ -0,0 +1,135 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+
+async def _call(func: Callable, *args):
+    # Blocking constructors and warm-ups run in a worker thread; coroutine functions run on the loop
+    if inspect.iscoroutinefunction(func):
+        return await func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+class Resource:
+    def __init__(self, name: str, build: Callable, warm: Optional[Callable], close: Optional[Callable],
+                 requires: Sequence[str]):
+        self.name = name
+        self.build = build
+        self.warm = warm
+        self.close = close
+        self.requires = tuple(requires)
+        self.value = None
+        self.status = PENDING
+        self.error = None
+        self.warm_error = None
+        self.seconds = None
+
+
+class ResourceRegistry:
+    """
+    Expensive per-worker resources (API clients, connection pools, encoders, worker processes), built and
+    warmed once at startup instead of inside the first requests that need them.
+    build() constructs the resource; the optional warm(resource) opens connections or loads data so the
+    first real call is as fast as the following ones. A failed build makes the worker unready, a failed
+    warm-up is only logged since the resource can still connect on first use.
+    Resources are started concurrently, each after the resources it requires.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Resource] = {}
+        self._task = None
+        self.started_at = None
+        self.finished_at = None
+
+    def register(self, name: str, build: Callable, warm: Callable = None, close: Callable = None,
+                 requires: Sequence[str] = ()):
+        self._resources[name] = Resource(name, build, warm, close, requires)
+
+    def get(self, name: str):
+        resource = self._resources[name]
+        if resource.status != READY:
+            raise RuntimeError(f"Resource {name} is {resource.status}")
+        return resource.value
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and all(resource.status == READY for resource in self._resources.values())
+
+    async def _start_resource(self, resource: Resource, tasks: Dict[str, asyncio.Task]):
+        for name in resource.requires:
+            await tasks[name]
+            if self._resources[name].status != READY:
+                resource.status = FAILED
+                resource.error = f"requires {name}, which failed"
+                return
+        started = time.perf_counter()
+        try:
+            resource.value = await _call(resource.build)
+        except Exception as e:
+            logger.error(f"Could not build resource {resource.name}: {str(e)}")
+            resource.status = FAILED
+            resource.error = str(e)
+            return
+        if resource.warm is not None:
+            try:
+                await _call(resource.warm, resource.value)
+            except Exception as e:
+                logger.warning(f"Warm-up of resource {resource.name} failed: {str(e)}")
+                resource.warm_error = str(e)
+        resource.seconds = time.perf_counter() - started
+        resource.status = READY
+        logger.info(f"Resource {resource.name} ready in {resource.seconds:.2f}s")
+
+    async def _start(self):
+        self.started_at = time.time()
+        tasks = {}
+        for resource in self._resources.values():
+            tasks[resource.name] = asyncio.ensure_future(self._start_resource(resource, tasks))
+        await asyncio.gather(*tasks.values())
+        self.finished_at = time.time()
+        logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.2f}s, ready: {self.ready}")
+
+    def start(self) -> asyncio.Task:
+        """
+        Start building and warming every resource in the background; await the returned task to wait for it.
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._start())
+        return self._task
+
+    async def close(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        for resource in reversed(list(self._resources.values())):
+            if resource.close is not None and resource.status == READY:
+                try:
+                    await _call(resource.close, resource.value)
+                except Exception as e:
+                    logger.warning(f"Could not close resource {resource.name}: {str(e)}")
+            resource.value = None
+            resource.status = PENDING
+        self._task = None
+        self.finished_at = None
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "status": resource.status,
+                "error": resource.error,
+                "warmUpError": resource.warm_error,
+                "seconds": None if resource.seconds is None else round(resource.seconds, 3)
+            }
+            for name, resource in self._resources.items()
+        }
+
+
+resources = ResourceRegistry()
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from functools import lru_cache
+
+from app.core.config import Config
+from app.utils.metrics import stage
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """
+    One S3 client per process. boto3 clients are thread-safe, and reusing one keeps its HTTPS connection
+    pool warm instead of paying client construction and TLS handshakes on every request.
+    """
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+    return boto3.client(
+        's3',
+        aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+        region_name=config.S3_REGION,
+        config=BotoConfig(
+            max_pool_connections=config.S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 5, "mode": "standard"},
+        )
+    )
+
+
+def warm_s3_client(client):
+    # Opens the first HTTPS connection of the pool and checks the credentials can reach the bucket
+    if config.S3_BUCKET:
+        client.head_bucket(Bucket=config.S3_BUCKET)
+
+
+def object_url(bucket: str, key: str) -> str:
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
+
+
+class S3MultipartSink:
+    """
+    Streaming upload sink for StreamingUploadParser. Files up to S3_MULTIPART_THRESHOLD are buffered and sent
+    with a single PutObject on close(); past it a multipart upload starts and every S3_MULTIPART_CHUNKSIZE part
+    is sent as soon as it is complete, so memory stays bounded by one part however large the file is.
+    key_resolver() returns the object key, or None while form fields it depends on have not arrived yet;
+    data keeps buffering until the key is known.
+    close() returns {"key", "url"} or {"key", "error"} so one failed file does not fail the others.
+    """
+
+    def __init__(self, key_resolver, bucket: str = None, part_size: int = None, threshold: int = None):
+        self.key_resolver = key_resolver
+        self.bucket = bucket or config.S3_BUCKET
+        # S3 rejects multipart parts under 5 MiB (except the last one)
+        self.part_size = max(part_size or config.S3_MULTIPART_CHUNKSIZE, 5 * 1024 * 1024)
+        self.threshold = max(threshold or config.S3_MULTIPART_THRESHOLD, self.part_size)
+        self.key = None
+        self.upload_id = None
+        self.parts = []
+        self._buffer = bytearray()
+
+    async def _upload_part(self, data: bytes):
+        client = get_s3_client()
+        if self.upload_id is None:
+            async with stage("s3.create_multipart_upload"):
+                response = await asyncio.to_thread(client.create_multipart_upload, Bucket=self.bucket, Key=self.key)
+            self.upload_id = response["UploadId"]
+        part_number = len(self.parts) + 1
+        async with stage("s3.upload_part"):
+            response = await asyncio.to_thread(client.upload_part, Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                               PartNumber=part_number, Body=data)
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if self.key is None:
+            self.key = self.key_resolver()
+        if self.key is None or (self.upload_id is None and len(self._buffer) <= self.threshold):
+            return
+        while len(self._buffer) >= self.part_size:
+            part, self._buffer = bytes(self._buffer[:self.part_size]), self._buffer[self.part_size:]
+            await self._upload_part(part)
+
+    async def close(self) -> dict:
+        self.key = self.key or self.key_resolver()
+        try:
+            client = get_s3_client()
+            if self.upload_id is None and len(self._buffer) <= self.threshold:
+                async with stage("s3.put_object"):
+                    await asyncio.to_thread(client.put_object, Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                while self._buffer:
+                    part, self._buffer = bytes(self._buffer[:self.part_size]), self._buffer[self.part_size:]
+                    await self._upload_part(part)
+                async with stage("s3.complete_multipart_upload"):
+                    await asyncio.to_thread(client.complete_multipart_upload, Bucket=self.bucket, Key=self.key,
+                                            UploadId=self.upload_id, MultipartUpload={"Parts": self.parts})
+                self.upload_id = None
+        except Exception as e:
+            logger.error(f"Error uploading {self.key} to S3: {str(e)}")
+            await self.abort()
+            return {"key": self.key, "error": str(e)}
+        finally:
+            self._buffer = bytearray()
+        return {"key": self.key, "url": object_url(self.bucket, self.key)}
+
+    async def abort(self):
+        self._buffer = bytearray()
+        if self.upload_id is not None:
+            upload_id, self.upload_id = self.upload_id, None
+            try:
+                await asyncio.to_thread(get_s3_client().abort_multipart_upload, Bucket=self.bucket, Key=self.key,
+                                        UploadId=upload_id)
+            except Exception as e:
+                logger.warning(f"Could not abort multipart upload of {self.key}: {str(e)}")
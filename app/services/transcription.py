@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import Config
+from app.utils.metrics import stage
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+
+
+def recognize_google(recognizer, audio_data, language: str) -> str:
+    return recognizer.recognize_google(audio_data, language=language)
+
+
+def recognize_sphinx(recognizer, audio_data, language: str) -> str:
+    # PocketSphinx runs fully offline with the English model bundled with SpeechRecognition
+    return recognizer.recognize_sphinx(audio_data, language=language)
+
+
+# Speech-to-text backends by TRANSCRIPTION_ENGINE name: fn(recognizer, AudioData, language) -> text
+RECOGNIZERS: Dict[str, Callable] = {
+    "google": recognize_google,
+    "sphinx": recognize_sphinx,
+}
+
+
+def frame_energies(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    frame_count = len(samples) // frame_length
+    frames = samples[:frame_count * frame_length].astype(np.float32).reshape(frame_count, frame_length)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def segment_audio(pcm: bytes, sample_rate: int, min_chunk_seconds: float, max_chunk_seconds: float,
+                  min_silence_ms: float, energy_threshold: Optional[float] = None) -> List[Tuple[int, int]]:
+    """
+    Split 16-bit mono PCM into (start, end) sample ranges of at most max_chunk_seconds, cutting in the middle of
+    the first silent stretch of at least min_silence_ms once a chunk is min_chunk_seconds long. Frames are silent
+    when their RMS energy stays below energy_threshold, by default derived from the recording's own noise floor.
+    Ranges without any speech are dropped; speech running past the length limit is cut at its quietest frame.
+    """
+    samples = np.frombuffer(pcm, dtype="<i2")
+    frame_length = sample_rate * FRAME_MS // 1000
+    energies = frame_energies(samples, frame_length)
+    if not len(energies):
+        return []
+
+    if energy_threshold is None:
+        # Well above the quietest 10% of the recording, but below the loud part even when there are no pauses,
+        # with an absolute floor for digital silence
+        quiet, loud = np.percentile(energies, [10, 90])
+        energy_threshold = max(100.0, min(3.0 * float(quiet), 0.5 * float(loud)))
+    voiced = energies >= energy_threshold
+    if not voiced.any():
+        return []
+
+    # Candidate cut points: the middle frame of every silent run long enough to be a pause
+    min_silence_frames = max(1, int(min_silence_ms // FRAME_MS))
+    edges = np.flatnonzero(np.diff(np.concatenate(([1], voiced.astype(np.int8), [1]))))
+    run_starts, run_ends = edges[0::2], edges[1::2]
+    long_runs = run_ends - run_starts >= min_silence_frames
+    cuts = ((run_starts[long_runs] + run_ends[long_runs]) // 2).tolist() + [len(energies)]
+
+    min_frames = int(min_chunk_seconds * 1000 // FRAME_MS)
+    max_frames = max(1, int(max_chunk_seconds * 1000 // FRAME_MS))
+    chunks = []
+    start = 0
+    cut_index = 0
+    while start < len(energies):
+        limit = start + max_frames
+        end = None
+        # Shorter chunks transcribe in parallel, but each one costs a recognizer call
+        while cut_index < len(cuts) and cuts[cut_index] <= limit:
+            if cuts[cut_index] > start:
+                end = cuts[cut_index]
+            cut_index += 1
+            if end is not None and end >= start + min_frames:
+                break
+        if end is None:
+            # No pause within the limit: cut at the quietest frame in the last quarter of the window
+            window_start = start + max_frames * 3 // 4
+            end = window_start + int(np.argmin(energies[window_start:limit])) + 1
+        if voiced[start:end].any():
+            # The last chunk also takes the trailing samples that do not fill a whole frame
+            chunks.append((start * frame_length, end * frame_length if end < len(energies) else len(samples)))
+        start = end
+    return chunks
+
+
+class ChunkTranscriber:
+    """
+    Transcribes audio chunks concurrently on a shared thread pool, retrying each failed chunk on its own
+    with exponential backoff so one flaky request does not lose the whole transcript.
+    """
+
+    def __init__(self, engine: str, language: str, concurrency: int, retries: int, backoff: float = 1.0):
+        if engine not in RECOGNIZERS:
+            raise ValueError(f"Unknown transcription engine: {engine}")
+        self.engine = engine
+        self.language = language
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # One pool per process bounds recognizer calls across all concurrent requests and jobs
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="transcribe")
+            return self._executor
+
+    def transcribe_chunk(self, audio_data) -> str:
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        for attempt in range(self.retries + 1):
+            try:
+                with stage(f"transcription.{self.engine}"):
+                    return RECOGNIZERS[self.engine](recognizer, audio_data, self.language)
+            except sr.UnknownValueError:
+                # The recognizer heard nothing it could transcribe; not worth retrying
+                return ""
+            except sr.RequestError as e:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"Transcription request failed ({str(e)}), retrying in {delay}s")
+                time.sleep(delay)
+
+    def transcribe(self, pcm: bytes, sample_rate: int, sample_width: int, progress: Callable = None) -> dict:
+        """
+        Segment the audio at pauses and transcribe the chunks in parallel.
+        Returns {"text": ..., "segments": [{"start", "end", "text"} | {"start", "end", "error"}]} in order;
+        raises the first error only when every chunk failed.
+        """
+        import speech_recognition as sr
+
+        ranges = segment_audio(pcm, sample_rate, config.TRANSCRIPTION_MIN_CHUNK_SECONDS,
+                               config.TRANSCRIPTION_MAX_CHUNK_SECONDS, config.TRANSCRIPTION_MIN_SILENCE_MS)
+        futures = {
+            self._pool().submit(self.transcribe_chunk, sr.AudioData(pcm[start * sample_width:end * sample_width],
+                                                                    sample_rate, sample_width)): index
+            for index, (start, end) in enumerate(ranges)
+        }
+
+        segments = [None] * len(ranges)
+        errors = []
+        try:
+            self._collect(futures, ranges, sample_rate, segments, errors, progress)
+        except BaseException:
+            # e.g. the job was cancelled: do not leave queued chunks occupying the shared pool
+            for future in futures:
+                future.cancel()
+            raise
+
+        if errors and len(errors) == len(segments):
+            raise errors[0]
+        text = " ".join(segment["text"] for segment in segments if segment.get("text"))
+        return {"text": text, "segments": segments}
+
+    def _collect(self, futures: dict, ranges: list, sample_rate: int, segments: list, errors: list, progress):
+        for completed, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            start, end = ranges[index]
+            segment = {"start": round(start / sample_rate, 2), "end": round(end / sample_rate, 2)}
+            try:
+                segment["text"] = future.result()
+            except Exception as e:
+                logger.error(f"Transcription of {segment['start']}-{segment['end']}s failed: {str(e)}")
+                segment["error"] = str(e)
+                errors.append(e)
+            segments[index] = segment
+            if progress:
+                progress(0.3 + 0.7 * completed / len(ranges), "transcribing")
+
+
+chunk_transcriber = ChunkTranscriber(
+    engine=config.TRANSCRIPTION_ENGINE,
+    language=config.TRANSCRIPTION_LANGUAGE,
+    concurrency=config.TRANSCRIPTION_CONCURRENCY,
+    retries=config.TRANSCRIPTION_RETRIES,
+)
@@ -0,0 +1,263 @@
+import abc
+import asyncio
+import json
+import logging
+import operator
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import Config
+from app.services.catalog_index import catalog_index
+from app.services.catalog_ingest import embedding_text
+from app.utils.embedding import VECTOR_DIMENSION, embed_texts
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+COMPARISONS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+
+
+@lru_cache(maxsize=1)
+def get_pinecone_index():
+    """
+    One Pinecone index client per worker, reusing its connection pool across requests. Passing the host
+    skips the control-plane lookup Pinecone otherwise makes to resolve the index name.
+    """
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=config.PINECONE_API_KEY)
+    return pc.Index("personalized-tests", host=config.PINECONE_HOST)  # Replace with your actual index name
+
+
+def warm_pinecone_index(index):
+    # Opens the first HTTPS connection of the pool
+    stats = index.describe_index_stats()
+    logger.info(f"Pinecone index holds {stats.total_vector_count} vectors, serving namespace '{catalog_namespace.current()}'")
+
+
+class NamespacePointer:
+    """
+    Name of the Pinecone namespace serving the catalog, kept in a small JSON file so a reindex can switch every
+    worker on the host to a new catalog version at once: the file is replaced atomically and re-read whenever its
+    modification time changes. Without the file the default namespace is served.
+    """
+
+    def __init__(self, path: str, default: str = ""):
+        self.path = path
+        self.default = default
+        self._mtime = None
+        self._state = {"namespace": default, "previous": []}
+
+    def _load(self) -> dict:
+        if not self.path:
+            return self._state
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            if mtime is None:
+                self._state = {"namespace": self.default, "previous": []}
+            else:
+                with open(self.path, encoding="utf-8") as infile:
+                    self._state = json.load(infile)
+            self._mtime = mtime
+        return self._state
+
+    def current(self) -> str:
+        return self._load()["namespace"]
+
+    def previous(self) -> List[str]:
+        """
+        Namespaces served before the current one, most recent first.
+        """
+        return list(self._load().get("previous", []))
+
+    def switch(self, namespace: str, previous: Optional[List[str]] = None):
+        """
+        Serve namespace from now on. The namespace served until now is pushed onto the previous list,
+        unless previous is given explicitly.
+        """
+        state = self._load()
+        if previous is None:
+            previous = [name for name in dict.fromkeys([state["namespace"]] + state.get("previous", [])) if name != namespace]
+        new_state = {"namespace": namespace, "previous": previous,
+                     "switchedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+        if not self.path:
+            self._state = new_state
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Readers see either the old or the new file, never a partial one
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as outfile:
+            json.dump(new_state, outfile)
+        os.replace(temporary_path, self.path)
+        logger.info(f"Catalog now served from namespace '{namespace}' (was '{state['namespace']}')")
+
+
+catalog_namespace = NamespacePointer(config.PINECONE_NAMESPACE_FILE, default=config.PINECONE_NAMESPACE)
+
+
+class VectorStore(abc.ABC):
+    """
+    Interface shared by the vector search backends. query() takes Pinecone's arguments and returns
+    its {"matches": [{"id", "score", "metadata"}]} shape so callers do not care which backend answered.
+    """
+
+    @abc.abstractmethod
+    def query(self, vector: Sequence[float], top_k: int = 1, filter: Optional[dict] = None, include_metadata: bool = True):
+        pass
+
+    async def aquery(self, **kwargs):
+        return await asyncio.to_thread(self.query, **kwargs)
+
+
+class PineconeVectorStore(VectorStore):
+    def __init__(self, index, namespace: str = ""):
+        self.index = index
+        self.namespace = namespace
+
+    def query(self, vector, top_k=1, filter=None, include_metadata=True):
+        kwargs = {"namespace": self.namespace} if self.namespace else {}
+        if filter is None:
+            return self.index.query(vector=vector, top_k=top_k, include_metadata=include_metadata, **kwargs)
+        return self.index.query(vector=vector, filter=filter, top_k=top_k, include_metadata=include_metadata, **kwargs)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process cosine search over an L2-normalized float32 matrix, with Pinecone-style metadata filters.
+    """
+
+    def __init__(self, ids: List[str], embeddings: np.ndarray, metadata: List[dict]):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), VECTOR_DIMENSION)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self.ids = list(ids)
+        self.matrix = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms != 0)
+        self.metadata = metadata
+        self._columns = {}
+
+    @classmethod
+    def from_catalog(cls, records: List[dict]):
+        # Embed the same text the ingestion script sends to Pinecone
+        embeddings = embed_texts(embedding_text(record) for record in records)
+        return cls([str(record["Test ID"]) for record in records], embeddings, records)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            column = np.empty(len(self.metadata), dtype=object)
+            column[:] = [record.get(field) for record in self.metadata]
+            self._columns[field] = column
+        return column
+
+    def _compare(self, field: str, op: str, value) -> np.ndarray:
+        column = self._column(field)
+        if op == "$in":
+            return np.fromiter((item in value for item in column), dtype=bool, count=len(column))
+        if op == "$nin":
+            return np.fromiter((item not in value for item in column), dtype=bool, count=len(column))
+        if op not in COMPARISONS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        compare = COMPARISONS[op]
+        if op in ("$eq", "$ne"):
+            return np.asarray(compare(column, value), dtype=bool)
+        return np.fromiter((item is not None and compare(item, value) for item in column), dtype=bool, count=len(column))
+
+    def filter_mask(self, filter: Optional[dict]) -> np.ndarray:
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, condition in (filter or {}).items():
+            if key == "$and":
+                for sub_filter in condition:
+                    mask &= self.filter_mask(sub_filter)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub_filter in condition:
+                    any_mask |= self.filter_mask(sub_filter)
+                mask &= any_mask
+            elif isinstance(condition, dict):
+                for op, value in condition.items():
+                    mask &= self._compare(key, op, value)
+            else:
+                mask &= self._compare(key, "$eq", condition)
+        return mask
+
+    def query_many(self, vectors, top_k=1, filter=None, include_metadata=True) -> List[dict]:
+        """
+        Answer several queries with one matrix product; returns one Pinecone-shaped response per vector.
+        """
+        queries = np.asarray(vectors, dtype=np.float32).reshape(-1, VECTOR_DIMENSION)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms != 0)
+
+        candidates = np.flatnonzero(self.filter_mask(filter)) if filter else np.arange(len(self.ids))
+        top_k = min(top_k, len(candidates))
+        if top_k == 0:
+            return [{"matches": []} for _ in range(len(queries))]
+
+        scores = queries @ self.matrix[candidates].T
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+
+        responses = []
+        for row_scores, row_top in zip(scores, top):
+            row_top = row_top[np.argsort(-row_scores[row_top], kind="stable")]
+            matches = []
+            for position in row_top:
+                row = candidates[position]
+                match = {"id": self.ids[row], "score": float(row_scores[position])}
+                if include_metadata:
+                    match["metadata"] = dict(self.metadata[row])
+                matches.append(match)
+            responses.append({"matches": matches})
+        return responses
+
+    def query(self, vector, top_k=1, filter=None, include_metadata=True):
+        return self.query_many([vector], top_k=top_k, filter=filter, include_metadata=include_metadata)[0]
+
+
+_local_vector_store = None
+_local_vector_store_lock = threading.Lock()
+
+
+def local_vector_store_is_stale() -> bool:
+    return _local_vector_store is None or _local_vector_store.metadata is not catalog_index.records
+
+
+def get_local_vector_store() -> LocalVectorStore:
+    """
+    Local store built from the in-memory catalog, rebuilt whenever the catalog index is refreshed.
+    Building embeds the whole catalog, so call it from a thread when the store may be stale; the lock makes
+    concurrent callers wait for one build instead of each building their own.
+    """
+    global _local_vector_store
+    if not local_vector_store_is_stale():
+        return _local_vector_store
+    with _local_vector_store_lock:
+        records = catalog_index.records
+        if _local_vector_store is None or _local_vector_store.metadata is not records:
+            if not records:
+                logger.warning("Building the local vector store from an empty catalog")
+            _local_vector_store = LocalVectorStore.from_catalog(records)
+            logger.info(f"Built local vector store with {len(_local_vector_store)} vectors")
+        return _local_vector_store
+
+
+def get_vector_store() -> VectorStore:
+    if config.VECTOR_STORE_BACKEND == "local":
+        return get_local_vector_store()
+    return PineconeVectorStore(get_pinecone_index(), catalog_namespace.current())
@@ -0,0 +1,7 @@
+import os
+
+# Building the AI client (on first use in the tests) needs an API key to be set
+os.environ.setdefault("AI71_API_KEY", "test-key")
+# Keep tests from reading or writing the persistent reason store and result cache in the working tree
+os.environ.setdefault("REASON_STORE_PATH", "")
+os.environ.setdefault("RESULT_CACHE_DIR", "")
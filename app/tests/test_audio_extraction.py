@@ -0,0 +1,67 @@
+import os
+import subprocess
+
+import pytest
+
+from app.services import audio_extraction
+from app.services.audio_extraction import SAMPLE_RATE, AudioExtractionError, extract_audio, extract_audio_data, get_ffmpeg_exe
+
+
+def make_video(tmp_path, name, with_audio=True):
+    path = tmp_path / name
+    command = [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi", "-i", "color=size=32x32:duration=1"]
+    if with_audio:
+        command += ["-f", "lavfi", "-i", "sine=frequency=440:duration=1", "-shortest", "-c:a", "aac"]
+    subprocess.run(command + ["-c:v", "mpeg4", str(path)], check=True)
+    return path.read_bytes()
+
+
+def test_extracts_16khz_mono_pcm_in_memory(tmp_path):
+    audio_data = extract_audio_data(make_video(tmp_path, "clip.mkv"))
+
+    assert (audio_data.sample_rate, audio_data.sample_width) == (SAMPLE_RATE, 2)
+    # About one second of audio; AAC priming adds a few milliseconds
+    assert abs(len(audio_data.frame_data) - SAMPLE_RATE * 2) < SAMPLE_RATE * 2 * 0.1
+
+
+def test_extracts_from_a_file_path_without_reading_it(tmp_path, monkeypatch):
+    make_video(tmp_path, "clip.mp4")
+    commands = []
+    run_ffmpeg = audio_extraction._run_ffmpeg
+
+    def recording_run(command, stdin, timeout):
+        commands.append((command[command.index("-i") + 1], stdin))
+        return run_ffmpeg(command, stdin, timeout)
+
+    monkeypatch.setattr(audio_extraction, "_run_ffmpeg", recording_run)
+
+    audio_data = extract_audio_data(str(tmp_path / "clip.mp4"))
+
+    assert len(audio_data.frame_data) > 0
+    # ffmpeg opened the file itself, nothing was piped in
+    assert commands == [(str(tmp_path / "clip.mp4"), b"")]
+
+
+def test_falls_back_to_a_temporary_file_when_the_pipe_fails(tmp_path, monkeypatch):
+    video = make_video(tmp_path, "clip.mp4")
+    sources = []
+    run_ffmpeg = audio_extraction._run_ffmpeg
+
+    def fake_run(command, stdin, timeout):
+        source = command[command.index("-i") + 1]
+        sources.append(source)
+        if source == "pipe:0":
+            return subprocess.CompletedProcess(command, 1, b"", b"moov atom not found")
+        return run_ffmpeg(command, stdin, timeout)
+
+    monkeypatch.setattr(audio_extraction, "_run_ffmpeg", fake_run)
+
+    assert len(extract_audio(video)) > 0
+    assert sources[0] == "pipe:0"
+    # The fallback file lived in a per-request directory that is already gone
+    assert not os.path.exists(os.path.dirname(sources[1]))
+
+
+def test_video_without_audio_track_raises(tmp_path):
+    with pytest.raises(AudioExtractionError):
+        extract_audio(make_video(tmp_path, "silent.mkv", with_audio=False))
@@ -0,0 +1,104 @@
+import asyncio
+
+from app.utils.cache import AsyncTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_and_least_recently_used_is_evicted():
+    clock = FakeClock()
+    cache = AsyncTTLCache(maxsize=2, ttl=10, timer=clock)
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        return key.upper()
+
+    async def get(key):
+        return await cache.get_or_compute(key, lambda: compute(key))
+
+    async def run():
+        assert await get("a") == "A"
+        await get("b")
+        await get("a")  # "a" becomes most recently used
+        await get("c")  # evicts "b"
+        await get("a")
+        await get("b")
+        clock.now = 11
+        await get("a")
+
+    asyncio.run(run())
+    assert calls == ["a", "b", "c", "b", "a"]
+    assert cache.hits == 2
+
+
+def test_concurrent_misses_coalesce_and_errors_are_not_cached():
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    calls = 0
+
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        if calls == 1:
+            raise ValueError("boom")
+        return calls
+
+    async def run():
+        results = await asyncio.gather(*[cache.get_or_compute("k", slow) for _ in range(5)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        return await asyncio.gather(*[cache.get_or_compute("k", slow) for _ in range(5)])
+
+    assert asyncio.run(run()) == [2] * 5
+    assert calls == 2
+    assert cache.stats()["coalesced"] == 8
+
+
+def test_invalidate_drops_entries_and_in_flight_results():
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+
+    async def run():
+        await cache.get_or_compute("done", lambda: asyncio.sleep(0, "old"))
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return "stale"
+
+        task = asyncio.create_task(cache.get_or_compute("pending", compute))
+        await asyncio.sleep(0)
+        assert cache.invalidate() == 1
+        assert await task == "stale"
+
+    asyncio.run(run())
+    assert len(cache) == 0
+
+
+def test_cancelled_caller_does_not_cancel_coalesced_waiters():
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await waiter == "value"
+        assert leader.cancelled()
+        found, value = cache.get("k")
+        assert found and value == "value"
+
+    asyncio.run(run())
+    assert calls == 1
@@ -0,0 +1,87 @@
+import asyncio
+import csv
+
+from app.api.v1.endpoints import document_service
+from app.services.catalog_index import CATALOG_FIELDS, CatalogIndex, load_catalog_records
+from app.services.vector_store import PineconeVectorStore
+
+
+def write_catalog(path, rows):
+    with open(path, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=CATALOG_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_lookup_by_normalized_name_and_cpt_code(tmp_path):
+    path = tmp_path / "catalog.csv"
+    write_catalog(path, [
+        {"Test ID": "1", "CPT Code": "80061", "Test Name": "Lipid  Panel", "Price (AED)": "150", "Tags": "cholesterol"},
+        {"Test ID": "2", "CPT Code": "83036", "Test Name": "HbA1c", "Price (AED)": ""},
+    ])
+
+    index = CatalogIndex(str(path))
+    assert index.refresh() == 2
+
+    lipid = index.lookup(" lipid panel ")
+    assert lipid["Test ID"] == 1
+    assert lipid["CPT Code"] == 80061
+    assert lipid["Price (AED)"] == 150
+    assert set(lipid) == set(CATALOG_FIELDS)
+    assert index.lookup("83036")["Test Name"] == "HbA1c"
+    assert index.lookup("83036")["Price (AED)"] == 0
+    assert index.lookup("83036")["Description"] == ""
+    assert index.lookup("Vitamin D") is None
+
+
+def test_refresh_picks_up_catalog_changes_and_lookups_return_copies(tmp_path):
+    path = tmp_path / "catalog.csv"
+    write_catalog(path, [{"Test ID": "1", "CPT Code": "84443", "Test Name": "TSH"}])
+    index = CatalogIndex(str(path))
+    index.refresh()
+
+    index.lookup("TSH")["reason"] = "mutated"
+    assert "reason" not in index.lookup("TSH")
+
+    write_catalog(path, [{"Test ID": "3", "CPT Code": "82306", "Test Name": "Vitamin D"}])
+    index.refresh()
+    assert index.lookup("TSH") is None
+    assert index.lookup("vitamin d")["Test ID"] == 3
+
+
+class PineconeLikeIndex:
+    """
+    Returns catalog metadata the way Pinecone does, with every number as a float.
+    """
+
+    def __init__(self, records):
+        self.records = records
+
+    def query(self, vector, top_k, include_metadata, filter=None):
+        record = next(record for record in self.records if record["Test Name"] == filter["Test Name"]["$eq"])
+        metadata = {field: float(value) if isinstance(value, int) else value for field, value in record.items()}
+        return {"matches": [{"id": str(record["Test ID"]), "metadata": metadata}]}
+
+
+def test_exact_match_and_vector_store_paths_return_identical_metadata(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.csv"
+    write_catalog(path, [
+        {"Test ID": "1", "CPT Code": "80061.0", "Test Name": "Lipid Panel", "Price (AED)": "150.0", "Tags": "cholesterol"},
+        {"Test ID": "2", "CPT Code": "0001U", "Test Name": "Red Cell Antigen", "Price (AED)": "99.5"},
+    ])
+    catalog = CatalogIndex(str(path))
+    catalog.refresh()
+    store = PineconeVectorStore(PineconeLikeIndex(load_catalog_records(str(path))))
+
+    def find(name):
+        return asyncio.run(document_service.find_test_in_index(store, name))
+
+    monkeypatch.setattr(document_service, "catalog_index", catalog)
+    from_catalog = [find("Lipid Panel"), find("Red Cell Antigen")]
+    monkeypatch.setattr(document_service, "catalog_index", CatalogIndex(str(path)))
+    from_vector_store = [find("Lipid Panel"), find("Red Cell Antigen")]
+
+    assert from_catalog == from_vector_store
+    assert [type(value) for value in from_vector_store[0].values()] == [type(value) for value in from_catalog[0].values()]
+    assert from_catalog[0]["CPT Code"] == 80061 and from_catalog[1]["CPT Code"] == "0001U"
+    assert from_catalog[1]["Price (AED)"] == 99.5
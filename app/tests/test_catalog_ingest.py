@@ -0,0 +1,169 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.catalog_ingest import CatalogIngestion, IngestManifest, reindex_catalog
+from app.services.vector_store import NamespacePointer, PineconeVectorStore
+from app.utils.embedding import embed_token_lists
+
+
+def embed(texts):
+    # Stands in for the tiktoken-based embed_texts with the same hashing, over character codes
+    return embed_token_lists([[ord(character) for character in text] for text in texts])
+
+
+def catalog(count: int, price: float = 100.0) -> list:
+    return [{"Test ID": 1000 + number, "CPT Code": 80000 + number, "Test Name": f"Test {number}", "Sample Type": "Serum",
+             "Container": "", "TAT": "1 day", "Price (AED)": price, "Description": "", "Tags": "energy"}
+            for number in range(count)]
+
+
+def chunked(records: list, size: int) -> list:
+    return [records[start:start + size] for start in range(0, len(records), size)]
+
+
+class FlakyIndex:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.vectors = {}
+        self.upserts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def upsert(self, vectors, namespace=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("503 Service Unavailable")
+            self.upserts += 1
+            self.vectors.update((vector["id"], vector) for vector in vectors)
+        finally:
+            self.in_flight -= 1
+
+    def delete(self, ids, namespace=None):
+        for vector_id in ids:
+            self.vectors.pop(vector_id, None)
+
+
+def ingest(index, manifest, records, prune=True, **kwargs):
+    ingestion = CatalogIngestion(index, manifest, batch_size=10, concurrency=3, backoff=0, embed=embed, **kwargs)
+    return asyncio.run(ingestion.run(chunked(records, 25), prune=prune))
+
+
+def test_rerun_upserts_only_changed_rows_and_deletes_removed_ones(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    index = FlakyIndex()
+
+    stats = ingest(index, IngestManifest(path), catalog(60))
+    assert stats["upserted"] == 60 and index.upserts == 7  # batches do not span chunks of 25
+    assert index.max_in_flight <= 3
+    assert index.vectors["1000"]["metadata"]["Test Name"] == "Test 0"
+    assert len(index.vectors["1000"]["values"]) == 1536
+
+    updated = catalog(55)
+    updated[3]["Price (AED)"] = 120.0
+    stats = ingest(index, IngestManifest(path), updated)
+
+    assert stats == {"rows": 55, "unchanged": 54, "upserted": 1, "failed": 0, "deleted": 5}
+    assert index.vectors["1003"]["metadata"]["Price (AED)"] == 120.0
+    assert sorted(index.vectors) == [str(1000 + number) for number in range(55)]
+    assert len(json.loads((tmp_path / "manifest.json").read_text())) == 55
+
+
+def test_failed_batches_are_retried_and_left_out_of_the_manifest(tmp_path):
+    path = str(tmp_path / "manifest.json")
+
+    retried = FlakyIndex(failures=2)
+    assert ingest(retried, IngestManifest(path), catalog(30), retries=2)["upserted"] == 30
+
+    failing = FlakyIndex(failures=100)
+    manifest = IngestManifest(str(tmp_path / "failing.json"))
+    stats = ingest(failing, manifest, catalog(30), retries=1)
+    assert stats["failed"] == 30 and len(manifest) == 0
+
+    # Nothing was recorded, so the next run sends every row again
+    stats = ingest(FlakyIndex(), IngestManifest(str(tmp_path / "failing.json")), catalog(30))
+    assert stats["upserted"] == 30
+
+
+def test_interrupted_run_keeps_progress_of_completed_chunks(tmp_path):
+    path = str(tmp_path / "manifest.json")
+
+    def chunks():
+        yield catalog(20)
+        raise OSError("CSV read failed")
+
+    ingestion = CatalogIngestion(FlakyIndex(), IngestManifest(path), batch_size=10, backoff=0, embed=embed)
+    with pytest.raises(OSError):
+        asyncio.run(ingestion.run(chunks()))
+
+    assert len(IngestManifest(path)) == 20
+    assert ingest(FlakyIndex(), IngestManifest(path), catalog(30), prune=False)["upserted"] == 10
+
+
+class NamespacedIndex:
+    def __init__(self, lag: int = 0):
+        self.namespaces = {}
+        # describe_index_stats calls before a namespace's count catches up with its upserts
+        self.lag = lag
+
+    def upsert(self, vectors, namespace=""):
+        self.namespaces.setdefault(namespace, {}).update((vector["id"], vector) for vector in vectors)
+
+    def delete(self, ids=None, delete_all=False, namespace=""):
+        if delete_all:
+            self.namespaces.pop(namespace, None)
+
+    def describe_index_stats(self):
+        counts = {namespace: len(vectors) for namespace, vectors in self.namespaces.items()}
+        if self.lag:
+            self.lag -= 1
+            counts = {namespace: count - 1 for namespace, count in counts.items()}
+        return {"namespaces": {namespace: {"vector_count": count} for namespace, count in counts.items()}}
+
+    def query(self, vector, top_k=1, filter=None, include_metadata=True, namespace=""):
+        vectors = self.namespaces.get(namespace, {})
+        return {"matches": [{"id": vector_id, "score": 1.0, "metadata": entry["metadata"]} for vector_id, entry in vectors.items()][:top_k]}
+
+
+def reindex(index, pointer, records, namespace, **kwargs):
+    return asyncio.run(reindex_catalog(index, chunked(records, 25), pointer, namespace=namespace, validate_interval=0,
+                                       batch_size=10, backoff=0, embed=embed, **kwargs))
+
+
+def test_reindex_switches_namespace_after_validation_and_retires_old_versions(tmp_path):
+    index = NamespacedIndex(lag=2)
+    index.upsert([{"id": "legacy", "values": [], "metadata": {}}])
+    pointer = NamespacePointer(str(tmp_path / "namespace.json"))
+    serving = NamespacePointer(pointer.path)  # another worker reading the same file
+
+    result = reindex(index, pointer, catalog(30), "catalog-v1")
+    assert result["vectors"] == 30 and result["retired"] == []
+    assert serving.current() == "catalog-v1" and serving.previous() == [""]
+    assert len(PineconeVectorStore(index, serving.current()).query([0.0], top_k=50)["matches"]) == 30
+
+    reindex(index, pointer, catalog(40), "catalog-v2")
+    result = reindex(index, pointer, catalog(50), "catalog-v3")
+
+    assert result["retired"] == ["catalog-v1"]
+    assert sorted(index.namespaces) == ["catalog-v2", "catalog-v3"]
+    assert serving.current() == "catalog-v3" and serving.previous() == ["catalog-v2"]
+
+
+def test_failed_reindex_keeps_serving_the_current_namespace(tmp_path):
+    index = NamespacedIndex()
+    pointer = NamespacePointer(str(tmp_path / "namespace.json"))
+    reindex(index, pointer, catalog(20), "catalog-v1")
+
+    duplicate_ids = catalog(20) + catalog(5)  # 25 rows but only 20 distinct vectors
+    index.describe_index_stats = lambda: {"namespaces": {"catalog-v1": {"vector_count": 20}, "catalog-v2": {"vector_count": 3}}}
+    with pytest.raises(RuntimeError, match="holds 3 vectors, expected 20"):
+        reindex(index, pointer, duplicate_ids, "catalog-v2", validate_timeout=0)
+
+    assert pointer.current() == "catalog-v1"
+    assert sorted(index.namespaces) == ["catalog-v1"]
+    with pytest.raises(ValueError):
+        reindex(index, pointer, catalog(20), "catalog-v1")
@@ -0,0 +1,105 @@
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import ocr_service
+from app.utils.content_cache import ContentCache
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def test_keys_depend_on_content_and_parameters(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=1_000_000, max_age=60)
+
+    key = cache.key("ocr", "abc", dpi=300, maxDimension=3500)
+
+    assert key == cache.key("ocr", "abc", maxDimension=3500, dpi=300)
+    assert key != cache.key("ocr", "abc", dpi=200, maxDimension=3500)
+    assert key != cache.key("ocr", "abd", dpi=300, maxDimension=3500)
+
+
+def test_round_trip_expiry_and_stats(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=1_000_000, max_age=60)
+    key = cache.key("ocr", "abc")
+
+    assert cache.get(key) is None
+    cache.put(key, {"text": "Lipid Panel"})
+    assert cache.get(key) == {"text": "Lipid Panel"}
+
+    path = cache._path(key)
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["namespaces"]["ocr"]["hitRatio"] == 1 / 3
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=1_000_000, max_age=60)
+    keys = [cache.key("video", str(number)) for number in range(3)]
+    for age, key in zip((30, 20, 10), keys):
+        cache.put(key, {"text": "x" * 100})
+        os.utime(cache._path(key), (time.time() - age, time.time() - age))
+    # Reading the oldest entry makes it the most recently used
+    cache.get(keys[0])
+
+    cache.max_bytes = 250
+    assert cache.prune() == 1
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+
+
+def test_repeated_ocr_upload_is_served_from_cache(tmp_path, monkeypatch):
+    calls = []
+
+    async def run(func, *args):
+        calls.append(args)
+        return "Hemoglobin A1c"
+
+    monkeypatch.setattr(ocr_service, "result_cache", ContentCache(str(tmp_path), max_bytes=1_000_000, max_age=60))
+    monkeypatch.setattr(ocr_service.ocr_engine, "run", run)
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+    client = TestClient(app)
+
+    for _ in range(2):
+        response = client.post("/api/v1/ocr", files={"file": ("scan.png", PNG + b"scan", "image/png")})
+        assert response.json() == {"text": "Hemoglobin A1c"}
+
+    assert len(calls) == 1
+    assert client.get("/api/v1/admin/result-cache").json()["namespaces"]["ocr"] == {"hits": 1, "misses": 1, "hitRatio": 0.5}
+
+
+def test_batch_ocr_reuses_cached_files(tmp_path, monkeypatch):
+    ocr_calls = []
+
+    async def run(func, page, timeout):
+        ocr_calls.append(page)
+        return f"text of {page[len(PNG):].decode()}"
+
+    async def run_many(func, arg_lists):
+        return [await run(func, *args) for args in arg_lists]
+
+    monkeypatch.setattr(ocr_service, "result_cache", ContentCache(str(tmp_path), max_bytes=1_000_000, max_age=60))
+    monkeypatch.setattr(ocr_service.ocr_engine, "run", run)
+    monkeypatch.setattr(ocr_service.ocr_engine, "run_many", run_many)
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+    client = TestClient(app)
+
+    # An image OCR'd by /ocr before is not OCR'd again as part of a batch, and neither is a repeated batch
+    client.post("/api/v1/ocr", files={"file": ("first.png", PNG + b"first", "image/png")})
+    for _ in range(2):
+        response = client.post("/api/v1/ocr/batch", files=[
+            ("files", ("first.png", PNG + b"first", "image/png")),
+            ("files", ("second.png", PNG + b"second", "image/png")),
+        ])
+        assert response.status_code == 200
+        assert [page["text"] for page in response.json()["pages"]] == ["text of first", "text of second"]
+
+    assert ocr_calls == [PNG + b"first", PNG + b"second"]
@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.utils.embedding import MAX_TOKENS, VECTOR_DIMENSION, embed_token_lists, embed_tokens
+
+
+def reference_embedding(tokens):
+    # The original per-token loop the service and ingestion script used
+    embedding = np.zeros(VECTOR_DIMENSION)
+    for token in tokens[:MAX_TOKENS]:
+        embedding[token % VECTOR_DIMENSION] += 1
+    norm = np.linalg.norm(embedding)
+    if norm != 0:
+        embedding = embedding / norm
+    return embedding.tolist()
+
+
+def test_embed_tokens_matches_reference_loop():
+    rng = np.random.default_rng(0)
+    for length in (0, 1, 17, 500, MAX_TOKENS + 50):
+        tokens = rng.integers(0, 100_000, size=length).tolist()
+        assert embed_tokens(tokens).tolist() == reference_embedding(tokens)
+
+
+def test_embed_token_lists_matches_single_embeddings_as_float32():
+    rng = np.random.default_rng(1)
+    token_lists = [rng.integers(0, 100_000, size=length).tolist() for length in (3, 0, 40, 1200)]
+
+    matrix = embed_token_lists(token_lists)
+
+    assert matrix.shape == (4, VECTOR_DIMENSION)
+    assert matrix.dtype == np.float32
+    for row, tokens in zip(matrix, token_lists):
+        np.testing.assert_array_equal(row, np.asarray(reference_embedding(tokens), dtype=np.float32))
+    assert embed_token_lists([]).shape == (0, VECTOR_DIMENSION)
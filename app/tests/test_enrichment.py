@@ -0,0 +1,87 @@
+import asyncio
+import json
+import time
+
+from app.services.enrichment import Checkpoint, EnrichmentRunner, TokenBucket
+
+
+def test_token_bucket_bounds_the_request_rate():
+    async def run():
+        bucket = TokenBucket(rate=100, capacity=5)
+        started = time.perf_counter()
+        await asyncio.gather(*[bucket.acquire() for _ in range(25)])
+        return time.perf_counter() - started
+
+    # The first 5 pass at once from the full bucket, the other 20 wait for refills at 100/s
+    assert 0.18 <= asyncio.run(run()) < 0.5
+
+
+def test_runner_is_concurrent_retries_failures_and_keeps_input_order(tmp_path):
+    attempts = {}
+    in_flight = 0
+    max_in_flight = 0
+
+    async def describe(name):
+        nonlocal in_flight, max_in_flight
+        attempts[name] = attempts.get(name, 0) + 1
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            # Later items finish first, so completion order differs from input order
+            await asyncio.sleep(0.2 / (1 + int(name[-1])))
+            if name == "test-3" and attempts[name] < 3:
+                raise ConnectionError("429 Too Many Requests")
+            return f"{name} description"
+        finally:
+            in_flight -= 1
+
+    names = [f"test-{number}" for number in range(8)] + ["test-1"]
+    checkpoint = Checkpoint(str(tmp_path / "descriptions.checkpoint.jsonl"))
+    runner = EnrichmentRunner(describe, checkpoint, concurrency=4, backoff=0)
+
+    started = time.perf_counter()
+    results = asyncio.run(runner.run((name, name) for name in names))
+
+    assert results == [f"{name} description" for name in names]
+    assert attempts["test-3"] == 3 and attempts["test-1"] == 1
+    assert max_in_flight == 4
+    # The calls take over 0.5s back to back
+    assert time.perf_counter() - started < 0.4
+    assert runner.failed == {}
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    path = tmp_path / "tags.checkpoint.jsonl"
+    processed = []
+
+    async def tag(name):
+        processed.append(name)
+        if name == "c":
+            raise ValueError("model returned nothing")
+        return name.upper()
+
+    checkpoint = Checkpoint(str(path))
+    runner = EnrichmentRunner(tag, checkpoint, concurrency=1, retries=0)
+    assert asyncio.run(runner.run((name, name) for name in "abc")) == ["A", "B", None]
+    assert list(runner.failed) == ["c"]
+    checkpoint.close()
+
+    # A crash while writing leaves a partial last line behind
+    with open(path, "a", encoding="utf-8") as outfile:
+        outfile.write('{"key": "d", "val')
+
+    async def retag(name):
+        processed.append(name)
+        return name.upper()
+
+    processed.clear()
+    checkpoint = Checkpoint(str(path))
+    runner = EnrichmentRunner(retag, checkpoint)
+    assert asyncio.run(runner.run((name, name) for name in "abcd")) == ["A", "B", "C", "D"]
+    checkpoint.close()
+
+    assert sorted(processed) == ["c", "d"]
+    assert sorted(json.loads(line)["key"] for line in path.read_text().splitlines()[-2:]) == ["c", "d"]
+    reloaded = Checkpoint(str(path))
+    assert len(reloaded) == 4
+    reloaded.close()
@@ -0,0 +1,42 @@
+import time
+
+from app.services.fuzzy_index import FuzzyIndex
+
+RECORDS = [
+    {"Test ID": "1", "Test Name": "Lipid Profile", "Tags": "Lipid Panel, Cholesterol Test, Coronary Risk Panel"},
+    {"Test ID": "2", "Test Name": "Glycated Hemoglobin", "Tags": "HbA1c, A1C, Hemoglobin A1c"},
+    {"Test ID": "3", "Test Name": "Thyroid Stimulating Hormone", "Tags": "TSH, Thyrotropin"},
+]
+
+
+def test_matches_names_tags_and_typos():
+    index = FuzzyIndex(RECORDS)
+
+    record, score = index.search("Lipid panel")
+    assert record["Test ID"] == "1" and score == 1.0
+    assert index.search("TSH")[0]["Test ID"] == "3"
+    assert index.search("Glycated Haemoglobin")[0]["Test ID"] == "2"
+    record, score = index.search("Thyroid Stimulating Hormone (TSH) test")
+    assert record["Test ID"] == "3" and 0.5 < score < 1
+
+
+def test_unrelated_queries_score_low_or_miss():
+    index = FuzzyIndex(RECORDS)
+
+    assert index.search("") is None
+    assert index.search("Urinalysis") is None
+    assert index.search("Vitamin D panel")[1] < 0.3
+    assert FuzzyIndex([]).search("TSH") is None
+
+
+def test_lookup_is_well_under_a_millisecond():
+    records = [{"Test ID": str(i), "Test Name": f"Test panel number {i}", "Tags": f"alias {i}, marker {i * 7}"} for i in range(3000)]
+    index = FuzzyIndex(records)
+
+    start = time.perf_counter()
+    for i in range(200):
+        index.search(f"test panel numbr {i}")
+    per_lookup = (time.perf_counter() - start) / 200
+
+    assert index.search("test panel numbr 42")[0]["Test ID"] == "42"
+    assert per_lookup < 0.001
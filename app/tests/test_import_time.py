@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+# Seconds a fresh interpreter may spend on `import app.main`; run benchmarks/profile_imports.py to see what grew
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", 2.0))
+
+# Loaded on first use or by the startup warm-up, never while a worker imports the app
+DEFERRED_MODULES = ["langchain", "langchain_core", "langchain_openai", "openai", "pinecone", "boto3",
+                    "pytesseract", "fitz", "speech_recognition"]
+
+SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({{"seconds": time.perf_counter() - started,
+                  "loaded": [name for name in {DEFERRED_MODULES!r} if name in sys.modules]}}))
+"""
+
+
+def import_app() -> dict:
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    completed = subprocess.run([sys.executable, "-c", SCRIPT], cwd=root, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_app_import_defers_heavy_dependencies():
+    assert import_app()["loaded"] == []
+
+
+def test_app_import_stays_within_budget():
+    # Best of three keeps a busy machine from failing the check
+    seconds = min(import_app()["seconds"] for _ in range(3))
+
+    assert seconds < IMPORT_TIME_BUDGET, f"import app.main took {seconds:.2f}s, budget is {IMPORT_TIME_BUDGET:.2f}s"
@@ -0,0 +1,163 @@
+import asyncio
+import socket
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import job_service
+from app.services.job_queue import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobStore
+
+
+def make_queue(tmp_path, concurrency=2):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "spool"))
+    return JobQueue(store, concurrency=concurrency, retention=3600, poll_interval=0.05)
+
+
+def read_payload(path):
+    with open(path, "rb") as infile:
+        return infile.read()
+
+
+async def wait_for_status(queue, job_id, statuses, timeout=5):
+    async def poll():
+        while True:
+            job = await queue.get(job_id)
+            if job["status"] in statuses:
+                return job
+            await asyncio.sleep(0.01)
+    return await asyncio.wait_for(poll(), timeout)
+
+
+def test_jobs_run_in_background_with_progress_and_bounded_concurrency(tmp_path):
+    queue = make_queue(tmp_path, concurrency=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def handler(payload_path, params, progress):
+        payload = read_payload(payload_path)
+        with lock:
+            active.append(payload)
+            peak.append(len(active))
+        progress(0.5, "halfway")
+        release.wait(5)
+        with lock:
+            active.remove(payload)
+        if params.get("fail"):
+            raise ValueError("bad media")
+        return {"text": payload.decode().upper()}
+
+    queue.register("echo", handler)
+
+    async def run():
+        await queue.start()
+        ids = [await queue.submit("echo", f"clip {number}".encode(), {"fail": number == 2}) for number in range(3)]
+        running = await wait_for_status(queue, ids[0], (RUNNING,))
+        await asyncio.sleep(0.1)
+        assert (await queue.get(ids[2]))["status"] == QUEUED
+        release.set()
+        results = [await wait_for_status(queue, job_id, (SUCCEEDED, FAILED)) for job_id in ids]
+        await queue.stop()
+        return running, results
+
+    running, results = asyncio.run(run())
+
+    assert max(peak) == 2
+    assert [job["status"] for job in results] == [SUCCEEDED, SUCCEEDED, FAILED]
+    assert results[0]["result"] == {"text": "CLIP 0"} and results[0]["progress"] == 1
+    assert results[2]["error"] == "bad media"
+    assert not list((tmp_path / "spool").iterdir())
+
+
+def test_cancel_stops_a_running_job_at_its_next_progress_report(tmp_path):
+    queue = make_queue(tmp_path)
+    started = threading.Event()
+    proceed = threading.Event()
+    reports = []
+
+    def handler(payload_path, params, progress):
+        started.set()
+        proceed.wait(5)
+        progress(0.9, "almost")
+        reports.append("after cancel")
+        return {"text": "late"}
+
+    queue.register("slow", handler)
+
+    async def run():
+        await queue.start()
+        job_id = await queue.submit("slow", b"video")
+        await asyncio.to_thread(started.wait, 5)
+        before = await queue.cancel(job_id)
+        proceed.set()
+        await asyncio.sleep(0.1)
+        job = await queue.get(job_id)
+        await queue.stop()
+        return before, job
+
+    before, job = asyncio.run(run())
+
+    assert before["status"] == RUNNING
+    assert job["status"] == CANCELLED and job["result"] is None
+    assert reports == []
+
+
+def test_jobs_interrupted_by_a_restart_are_requeued(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.store.create("echo", b"clip", {})
+    queue.store.claim_next(f"{socket.gethostname()}:999999999", ["echo"])
+    queue.register("echo", lambda payload_path, params, progress: {"text": read_payload(payload_path).decode()})
+
+    async def run():
+        await queue.start()
+        job = await wait_for_status(queue, job_id, (SUCCEEDED, FAILED))
+        await queue.stop()
+        return job
+
+    assert asyncio.run(run())["result"] == {"text": "clip"}
+
+
+def test_only_jobs_with_a_registered_handler_are_claimed(tmp_path):
+    queue = make_queue(tmp_path)
+    other_id = queue.store.create("video-to-text", b"clip", {})
+    assert queue.store.claim_next("worker", []) is None
+
+    async def start_without_handlers():
+        await queue.start()
+        started = bool(queue._workers)
+        await queue.stop()
+        return started
+
+    assert asyncio.run(start_without_handlers()) is False
+
+    queue.register("echo", lambda payload_path, params, progress: {"text": read_payload(payload_path).decode()})
+    echo_id = queue.store.create("echo", b"note", {})
+
+    async def run():
+        await queue.start()
+        job = await wait_for_status(queue, echo_id, (SUCCEEDED, FAILED))
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        return job
+
+    assert asyncio.run(run())["status"] == SUCCEEDED
+    # Left queued for a process that has the video service enabled instead of failing with an unknown kind
+    assert queue.store.get(other_id)["status"] == QUEUED
+
+
+def test_job_endpoints(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path)
+    queue.register("echo", lambda payload_path, params, progress: {})
+    job_id = queue.store.create("echo", b"clip", {})
+    monkeypatch.setattr(job_service, "job_queue", queue)
+    app = FastAPI()
+    app.include_router(job_service.router, prefix="/api/v1")
+    client = TestClient(app)
+
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == QUEUED
+    assert client.delete(f"/api/v1/jobs/{job_id}").json() == {"jobId": job_id, "status": CANCELLED}
+    assert client.get(f"/api/v1/jobs/{job_id}").json()["status"] == CANCELLED
+    assert client.delete(f"/api/v1/jobs/{job_id}").status_code == 409
+    assert client.get("/api/v1/jobs/unknown").status_code == 404
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import metrics_service
+from app.utils.metrics import MetricsMiddleware, MetricsRegistry, metrics, stage, timed
+
+
+def sample(text: str, line_prefix: str) -> float:
+    values = [float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_prefix)]
+    assert len(values) == 1, line_prefix
+    return values[0]
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("lookup_seconds", "Lookup time.", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.labels('fuzzy "match"').observe(value)
+
+    text = registry.render()
+
+    assert "# TYPE lookup_seconds histogram" in text
+    assert 'lookup_seconds_bucket{stage="fuzzy \\"match\\"",le="0.1"} 1' in text
+    assert 'lookup_seconds_bucket{stage="fuzzy \\"match\\"",le="1"} 3' in text
+    assert 'lookup_seconds_bucket{stage="fuzzy \\"match\\"",le="+Inf"} 4' in text
+    assert 'lookup_seconds_count{stage="fuzzy \\"match\\""} 4' in text
+    assert sample(text, 'lookup_seconds_sum') == pytest.approx(6.05)
+
+
+def test_stages_record_latency_in_flight_and_errors():
+    @timed("test.decorated")
+    async def decorated():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def run():
+        async with stage("test.async"):
+            assert sample(metrics.render(), 'razee_stage_in_flight{stage="test.async"}') == 1
+            await asyncio.sleep(0.01)
+        return await decorated()
+
+    assert asyncio.run(run()) == "done"
+    with pytest.raises(ValueError):
+        with stage("test.failing"):
+            raise ValueError("bad page")
+
+    text = metrics.render()
+    assert sample(text, 'razee_stage_in_flight{stage="test.async"}') == 0
+    assert sample(text, 'razee_stage_duration_seconds_count{stage="test.decorated"}') >= 1
+    assert sample(text, 'razee_stage_duration_seconds_sum{stage="test.async"}') >= 0.01
+    assert sample(text, 'razee_stage_errors_total{stage="test.failing",error="ValueError"}') >= 1
+
+
+def test_metrics_endpoint_reports_routes_by_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_service.router)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        if item_id == "broken":
+            raise RuntimeError("backend down")
+        return {"id": item_id}
+
+    client = TestClient(app, raise_server_exceptions=False)
+    client.get("/items/a")
+    client.get("/items/b")
+    client.get("/items/broken")
+
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert sample(text, 'razee_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"}') >= 2
+    assert sample(text, 'razee_http_errors_total{method="GET",route="/items/{item_id}",status="500"}') >= 1
+    assert "/items/a" not in text
+
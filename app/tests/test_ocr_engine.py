@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+
+import io
+
+import pymupdf
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.api.v1.endpoints import ocr_service
+from app.services.ocr_engine import OCREngine, OCRSaturated, load_page_image, preprocess_image, split_pdf_pages
+
+
+def slow_pid(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def fake_ocr(page_bytes, timeout):
+    # Stands in for Tesseract, which is not installed in the test environment
+    if page_bytes.startswith(b"%PDF"):
+        with pymupdf.open(stream=page_bytes, filetype="pdf") as document:
+            return document.load_page(0).get_text().strip()
+    return f"image {len(page_bytes)}"
+
+
+def make_pdf(texts):
+    with pymupdf.open() as document:
+        for text in texts:
+            document.new_page().insert_text((72, 72), text)
+        return document.tobytes()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = OCREngine(workers=2, max_pending=2, timeout=5)
+    engine.start()
+    yield engine
+    engine.shutdown()
+
+
+def test_jobs_run_in_reused_worker_processes(engine):
+    async def run():
+        return await asyncio.gather(*[engine.run(slow_pid, 0.01) for _ in range(2)])
+
+    first = asyncio.run(run())
+    second = asyncio.run(run())
+
+    assert os.getpid() not in first
+    # The same two pre-warmed processes serve every job
+    assert len(set(first) | set(second)) == 2
+    assert engine.pending == 0
+
+
+def test_full_queue_rejects_with_retry_after(engine):
+    async def run():
+        running = [asyncio.create_task(engine.run(slow_pid, 0.5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(OCRSaturated) as saturated:
+            await engine.run(slow_pid, 0)
+        await asyncio.gather(*running)
+        return saturated.value
+
+    assert asyncio.run(run()).retry_after >= 1
+
+
+def test_slow_jobs_time_out(engine, monkeypatch):
+    monkeypatch.setattr(engine, "timeout", 0.1)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(engine.run(slow_pid, 5))
+    # The worker was interrupted rather than left running the job
+    assert asyncio.run(asyncio.wait_for(engine.run(slow_pid, 0), timeout=2))
+
+
+def test_time_spent_queued_does_not_count_towards_the_timeout(engine, monkeypatch):
+    monkeypatch.setattr(engine, "max_pending", 8)
+    monkeypatch.setattr(engine, "timeout", 0.5)
+
+    # Two workers: the last two jobs wait about 0.3s for a free one, then run for 0.3s themselves
+    pids = asyncio.run(engine.run_many(slow_pid, [(0.3,)] * 4))
+
+    assert len(pids) == 4
+
+
+def test_ocr_endpoint_returns_503_when_saturated(monkeypatch):
+    saturated = OCREngine(workers=1, max_pending=0, timeout=5)
+    monkeypatch.setattr(ocr_service, "ocr_engine", saturated)
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+
+    response = TestClient(app).post("/api/v1/ocr", files={"file": ("scan.png", b"\x89PNG\r\n\x1a\nscan", "image/png")})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert TestClient(app).post("/api/v1/ocr", files={"file": ("a.txt", b"x", "text/plain")}).status_code == 400
+
+
+def test_split_pdf_pages_renders_each_page_in_grayscale():
+    pages = split_pdf_pages(make_pdf(["first", "second", "third"]), max_pages=2)
+
+    # One page past the limit is kept so the endpoint can tell the upload was too long
+    assert len(pages) == 3
+    with load_page_image(pages[1]) as image:
+        assert image.mode == "L"
+        assert image.info["dpi"][0] == 300
+
+
+def test_preprocess_normalizes_dpi_and_caps_size():
+    scan = Image.new("RGB", (4800, 2400), "white")
+    scan.info["dpi"] = (600, 600)
+    page, dpi = preprocess_image(scan)
+    assert (page.mode, page.size, dpi) == ("L", (2400, 1200), 300)
+
+    photo = Image.new("RGB", (7000, 3500), "white")
+    page, dpi = preprocess_image(photo)
+    assert page.size == (3500, 1750) and dpi == 0
+
+    # Low-resolution scans are kept as they are and Tesseract is told their real resolution
+    fax = Image.new("RGB", (1700, 1100), "white")
+    fax.info["dpi"] = (200, 200)
+    page, dpi = preprocess_image(fax)
+    assert page.size == (1700, 1100) and dpi == 200
+
+    # A scan downscaled to fit OCR_MAX_DIMENSION reports the resolution it ends up with
+    poster = Image.new("RGB", (7000, 1000), "white")
+    poster.info["dpi"] = (300, 300)
+    page, dpi = preprocess_image(poster)
+    assert page.size == (3500, 500) and dpi == 150
+
+
+def test_ocr_batch_returns_pages_in_order(engine, monkeypatch):
+    monkeypatch.setattr(engine, "max_pending", 8)
+    monkeypatch.setattr(ocr_service, "ocr_engine", engine)
+    monkeypatch.setattr(ocr_service, "ocr_image_bytes", fake_ocr)
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+    image = io.BytesIO()
+    Image.new("RGB", (20, 20)).save(image, format="PNG")
+
+    response = TestClient(app).post("/api/v1/ocr/batch", files=[
+        ("files", ("report.pdf", make_pdf(["page one", "page two", "page three"]), "application/pdf")),
+        ("files", ("photo.png", image.getvalue(), "image/png")),
+    ])
+
+    assert response.status_code == 200
+    pages = response.json()["pages"]
+    assert [(page["file"], page["page"]) for page in pages] == [
+        ("report.pdf", 1), ("report.pdf", 2), ("report.pdf", 3), ("photo.png", 1)]
+    assert [page["text"] for page in pages[:3]] == ["page one", "page two", "page three"]
+    assert pages[3]["text"] == f"image {len(image.getvalue())}"
+
+
+def test_ocr_batch_rejects_too_many_pages(engine, monkeypatch):
+    monkeypatch.setattr(ocr_service, "ocr_engine", engine)
+    monkeypatch.setattr(ocr_service.config, "OCR_MAX_PAGES", 2)
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+
+    response = TestClient(app).post("/api/v1/ocr/batch", files=[
+        ("files", ("report.pdf", make_pdf(["a", "b", "c", "d"]), "application/pdf"))])
+
+    assert response.status_code == 413
+
+
+def test_ocr_batch_rejects_oversized_files(monkeypatch):
+    monkeypatch.setattr(ocr_service.config, "OCR_MAX_UPLOAD_SIZE", 1024)
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+
+    response = TestClient(app).post("/api/v1/ocr/batch", files=[
+        ("files", ("small.pdf", make_pdf(["a"]), "application/pdf")),
+        ("files", ("large.pdf", b"%PDF-" + b"0" * 2048, "application/pdf"))])
+
+    assert response.status_code == 413
+
+
+def test_ocr_batch_rejects_files_in_other_fields():
+    app = FastAPI()
+    app.include_router(ocr_service.router, prefix="/api/v1")
+
+    response = TestClient(app).post("/api/v1/ocr/batch", files=[
+        ("files", ("report.pdf", make_pdf(["a"]), "application/pdf")),
+        ("file", ("photo.png", b"\x89PNG\r\n\x1a\nphoto", "image/png"))])
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unexpected file field: file"
@@ -0,0 +1,47 @@
+import sqlite3
+
+from app.services.reason_store import ReasonStore
+
+
+def make_store(path, **overrides):
+    options = {"model": "falcon", "max_entries": 100, "memory_entries": 10}
+    options.update(overrides)
+    return ReasonStore(str(path), **options)
+
+
+def test_keys_ignore_input_order_and_case_but_not_model(tmp_path):
+    store = make_store(tmp_path / "reasons.sqlite3")
+    key = store.key("Lipid Panel", ["Weight loss", "sleep"], ["Hypertension"])
+
+    assert key == store.key(" lipid panel", ["sleep", "weight LOSS"], ["hypertension"])
+    assert key != store.key("Lipid Panel", ["sleep"], ["hypertension"])
+    assert key != make_store(tmp_path / "reasons.sqlite3", model="gpt").key("Lipid Panel", ["Weight loss", "sleep"], ["Hypertension"])
+
+
+def test_reasons_persist_across_instances_and_warm_start(tmp_path):
+    path = tmp_path / "reasons.sqlite3"
+    writer = make_store(path)
+    writer.put_many({"k1": ("Lipid Panel", "Checks blood fats."), "k2": ("TSH", "Checks your thyroid.")})
+
+    reader = make_store(path)
+    assert reader.warm() == 2
+    assert reader.get_many(["k1", "k2", "k3"]) == {"k1": "Checks blood fats.", "k2": "Checks your thyroid."}
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    path = tmp_path / "reasons.sqlite3"
+    store = make_store(path, max_entries=2, memory_entries=0)
+    store.put_many({"old": ("A", "a")})
+    store.put_many({"kept": ("B", "b")})
+    store.get_many(["old"])
+    store.put_many({"new": ("C", "c")})
+
+    keys = {row[0] for row in sqlite3.connect(path).execute("SELECT key FROM reasons")}
+    assert keys == {"old", "new"}
+
+
+def test_disabled_store_is_a_no_op(tmp_path):
+    store = ReasonStore("", model="falcon", max_entries=10, memory_entries=10)
+    store.put_many({"k": ("A", "a")})
+    assert store.get_many(["k"]) == {}
+    assert store.warm() == 0
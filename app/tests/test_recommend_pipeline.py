@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.v1.endpoints import document_service
+from app.api.v1.endpoints.document_service import RecommendTestsRequest
+from app.services.vector_store import PineconeVectorStore
+
+
+@pytest.fixture(autouse=True)
+def empty_recommendation_cache():
+    document_service.recommendation_cache.invalidate()
+    yield
+    document_service.recommendation_cache.invalidate()
+
+
+class FakeChat:
+    def __init__(self, content, batch_skip=()):
+        self.content = content
+        self.batch_skip = batch_skip
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1].content
+        self.calls.append(prompt)
+        if "numbered list" in prompt:
+            return SimpleNamespace(content=self.content)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            self.active -= 1
+        if "JSON object" in prompt:
+            names = [line[2:] for line in prompt.splitlines() if line.startswith("- ")]
+            reasons = {name: f"Batch reason for {name}" for name in names if name not in self.batch_skip}
+            return SimpleNamespace(content=f"```json\n{json.dumps(reasons)}\n```")
+        return SimpleNamespace(content=f"Reason for {prompt.split(chr(39))[1]}")
+
+    async def astream(self, messages):
+        self.calls.append(messages[-1].content)
+        for start in range(0, len(self.content), 4):
+            await asyncio.sleep(0.01)
+            yield SimpleNamespace(content=self.content[start:start + 4])
+        self.stream_finished_at = time.perf_counter()
+
+
+class FakeIndex:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        self.first_query_at = None
+
+    def query(self, vector, top_k, include_metadata, filter=None):
+        with self.lock:
+            self.first_query_at = self.first_query_at or time.perf_counter()
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if filter is None:
+            return {"matches": []}
+        return {"matches": [{"metadata": {"Test Name": filter["Test Name"]["$eq"]}}]}
+
+
+def test_recommend_tests_resolves_concurrently_in_order(monkeypatch):
+    index = FakeIndex()
+    chat = FakeChat("1. Lipid Panel\n2. HbA1c\n3. TSH\n4. Vitamin D")
+    monkeypatch.setattr(document_service, "chat", chat)
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(index))
+    monkeypatch.setattr(document_service.config, "RECOMMEND_CONCURRENCY", 4)
+    monkeypatch.setattr(document_service.config, "REASON_MODE", "per_test")
+
+    request = RecommendTestsRequest(healthGoals=["weight loss"], currentDiseases=["hypertension"], userId="u1")
+    response = asyncio.run(document_service.recommend_tests(request))
+
+    names = [test["Test Name"] for test in response["recommendedTests"]]
+    assert names == ["Lipid Panel", "HbA1c", "TSH", "Vitamin D"]
+    assert response["recommendedTests"][0]["reason"] == "Reason for Lipid Panel"
+    # Lookups and per-test reason calls overlap instead of running one after another
+    assert index.max_active > 1
+    assert chat.max_active > 1
+
+
+def test_recommend_tests_respects_concurrency_cap(monkeypatch):
+    index = FakeIndex(delay=0.02)
+    monkeypatch.setattr(document_service, "chat", FakeChat("1. Lipid Panel\n2. HbA1c\n3. TSH"))
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(index))
+    monkeypatch.setattr(document_service.config, "RECOMMEND_CONCURRENCY", 1)
+
+    request = RecommendTestsRequest(healthGoals=["weight loss"], currentDiseases=[], userId="u1")
+    asyncio.run(document_service.recommend_tests(request))
+
+    assert index.max_active == 1
+
+
+def test_batch_mode_makes_one_reason_call_and_falls_back_for_missing(monkeypatch):
+    chat = FakeChat("1. Lipid Panel\n2. HbA1c\n3. TSH", batch_skip={"TSH"})
+    monkeypatch.setattr(document_service, "chat", chat)
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(FakeIndex(delay=0)))
+    monkeypatch.setattr(document_service.config, "REASON_MODE", "batch")
+
+    request = RecommendTestsRequest(healthGoals=["weight loss"], currentDiseases=["hypertension"], userId="u1")
+    response = asyncio.run(document_service.recommend_tests(request))
+
+    reasons = [test["reason"] for test in response["recommendedTests"]]
+    assert reasons == ["Batch reason for Lipid Panel", "Batch reason for HbA1c", "Reason for TSH"]
+    # One list call, one batched reason call and a single fallback for the missing test
+    assert len(chat.calls) == 3
+
+
+def test_parse_batch_reasons_ignores_case_and_unknown_names():
+    content = 'Sure! {"lipid panel": "Checks fats in your blood.", "Other": "x", "TSH": ""}'
+    reasons = document_service.parse_batch_reasons(content, ["Lipid Panel", "TSH"])
+    assert reasons == {"Lipid Panel": "Checks fats in your blood."}
+    assert document_service.parse_batch_reasons("not json", ["TSH"]) == {}
+
+
+def test_identical_requests_share_one_computation(monkeypatch):
+    chat = FakeChat("1. Lipid Panel\n2. TSH")
+    monkeypatch.setattr(document_service, "chat", chat)
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(FakeIndex(delay=0.02)))
+
+    async def run():
+        first = RecommendTestsRequest(healthGoals=["Weight Loss", "sleep"], currentDiseases=["Hypertension"], userId="u1")
+        second = RecommendTestsRequest(healthGoals=["sleep", " weight loss"], currentDiseases=["hypertension"], userId="u2")
+        concurrent = await asyncio.gather(document_service.recommend_tests(first), document_service.recommend_tests(second))
+        cached = await document_service.recommend_tests(first)
+        return concurrent, cached
+
+    before = document_service.recommendation_cache.stats()
+    (first, second), cached = asyncio.run(run())
+
+    assert first["recommendedTests"] == second["recommendedTests"] == cached["recommendedTests"]
+    assert second["userId"] == "u2"
+    assert sum("numbered list" in prompt for prompt in chat.calls) == 1
+    after = document_service.recommendation_cache.stats()
+    assert [after[key] - before[key] for key in ("misses", "coalesced", "hits")] == [1, 1, 1]
+
+
+def test_stored_reasons_are_reused_without_an_llm_call(monkeypatch, tmp_path):
+    from app.services.reason_store import ReasonStore
+
+    store = ReasonStore(str(tmp_path / "reasons.sqlite3"), model="falcon", max_entries=100, memory_entries=0)
+    chat = FakeChat("1. Lipid Panel\n2. TSH")
+    monkeypatch.setattr(document_service, "chat", chat)
+    monkeypatch.setattr(document_service, "reason_store", store)
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(FakeIndex(delay=0)))
+    monkeypatch.setattr(document_service.config, "REASON_MODE", "batch")
+
+    request = RecommendTestsRequest(healthGoals=["weight loss"], currentDiseases=[], userId="u1")
+    first = asyncio.run(document_service.recommend_tests(request))
+    document_service.recommendation_cache.invalidate()
+    second = asyncio.run(document_service.recommend_tests(request))
+
+    assert first == second
+    assert sum("JSON object" in prompt for prompt in chat.calls) == 1
+
+
+def test_streaming_mode_starts_lookups_while_the_model_is_generating(monkeypatch):
+    chat = FakeChat("1. Lipid Panel\n2. HbA1c\n3. TSH\n4. Vitamin D")
+    index = FakeIndex(delay=0.01)
+    monkeypatch.setattr(document_service, "chat", chat)
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(index))
+    monkeypatch.setattr(document_service.config, "LLM_STREAMING", True)
+
+    request = RecommendTestsRequest(healthGoals=["energy"], currentDiseases=[], userId="u1")
+    response = asyncio.run(document_service.recommend_tests(request))
+
+    assert [test["Test Name"] for test in response["recommendedTests"]] == ["Lipid Panel", "HbA1c", "TSH", "Vitamin D"]
+    assert index.first_query_at < chat.stream_finished_at
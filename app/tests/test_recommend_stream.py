@@ -0,0 +1,50 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import document_service
+from app.services.vector_store import PineconeVectorStore
+from app.tests.test_recommend_pipeline import FakeChat, FakeIndex
+
+app = FastAPI()
+app.include_router(document_service.router, prefix="/api/v1")
+client = TestClient(app)
+
+PAYLOAD = {"healthGoals": ["weight loss"], "currentDiseases": ["diabetes"], "userId": "u1"}
+
+
+@pytest.fixture(autouse=True)
+def fake_pipeline(monkeypatch):
+    document_service.recommendation_cache.invalidate()
+    monkeypatch.setattr(document_service, "chat", FakeChat("1. Lipid Panel\n2. HbA1c\n3. TSH"))
+    monkeypatch.setattr(document_service, "get_vector_store", lambda: PineconeVectorStore(FakeIndex(delay=0)))
+    yield
+    document_service.recommendation_cache.invalidate()
+
+
+def test_stream_emits_one_frame_per_test_then_an_ordered_summary():
+    response = client.post("/api/v1/recommend-tests/stream", json=PAYLOAD)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.headers["x-accel-buffering"] == "no"
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert [frame["type"] for frame in frames] == ["test", "test", "test", "summary"]
+    assert sorted(frame["position"] for frame in frames[:3]) == [0, 1, 2]
+    summary = frames[-1]
+    assert [test["Test Name"] for test in summary["recommendedTests"]] == ["Lipid Panel", "HbA1c", "TSH"]
+    assert summary["recommendedTests"][2]["reason"] == "Reason for TSH"
+
+    # The streamed result fills the regular response cache
+    assert client.post("/api/v1/recommend-tests", json=PAYLOAD).json()["recommendedTests"] == summary["recommendedTests"]
+
+
+def test_stream_uses_server_sent_events_when_requested():
+    response = client.post("/api/v1/recommend-tests/stream", json=PAYLOAD, headers={"Accept": "text/event-stream"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: test"] * 3 + ["event: summary"]
+    assert json.loads(events[-1][1][len("data: "):])["count"] == 3
@@ -0,0 +1,76 @@
+import json
+import re
+
+from app.services.recommendation_parser import IncrementalTestParser, parse_recommended_tests
+
+LIST_RESPONSE = """Here are the tests I would recommend:
+
+1. Lipid Panel: Reason: Checks cholesterol.
+It also looks at triglycerides.
+2. Hemoglobin A1c. Shows average blood sugar.
+3. Thyroid Stimulating Hormone (TSH)
+4. Vitamin D"""
+
+
+def original_extract_test_info(ai_response_content):
+    # The two-pass regex implementation the endpoint used before the incremental parser
+    pattern = r'(\d+\.\s)(.*?)(?=:\s*Reason:|\.|\n|$)'
+    tests = []
+    for number, name in re.findall(pattern, ai_response_content):
+        test_name = name.strip()
+        reason_pattern = fr"{re.escape(number)}\s*{re.escape(test_name)}\s*:\s*Reason:(.*?)(?=\n\d|$)"
+        reason_match = re.search(reason_pattern, ai_response_content, re.DOTALL)
+        tests.append({"name": test_name, "reason": reason_match.group(1).strip() if reason_match else "No reason provided."})
+    return tests
+
+
+def feed_in_chunks(parser, text, size):
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.append([item["name"] for item in parser.feed(text[start:start + size])])
+    emitted.append([item["name"] for item in parser.close()])
+    return emitted
+
+
+def test_numbered_list_matches_original_parser():
+    assert parse_recommended_tests(LIST_RESPONSE) == original_extract_test_info(LIST_RESPONSE)
+
+
+def test_items_are_emitted_as_soon_as_their_line_completes():
+    parser = IncrementalTestParser()
+
+    assert parser.feed("1. Lipid Pa") == []
+    assert [item["name"] for item in parser.feed("nel\n2. HbA1c")] == ["Lipid Panel"]
+    assert [item["name"] for item in parser.close()] == ["HbA1c"]
+
+
+def test_chunk_boundaries_do_not_change_the_result():
+    expected = [item["name"] for item in parse_recommended_tests(LIST_RESPONSE)]
+    for size in (1, 3, 7, 64):
+        emitted = feed_in_chunks(IncrementalTestParser(), LIST_RESPONSE, size)
+        assert [name for names in emitted for name in names] == expected
+
+
+def test_json_objects_and_strings_are_emitted_incrementally():
+    payload = json.dumps({"tests": [{"name": "Lipid Panel", "reason": "Checks {fats}."}, {"name": "TSH"}]})
+    parser = IncrementalTestParser("auto")
+
+    emitted = feed_in_chunks(parser, f"```json\n{payload}\n```", 5)
+
+    assert [name for names in emitted for name in names] == ["Lipid Panel", "TSH"]
+    assert emitted[-1] == []  # everything was emitted before the stream ended
+    assert parser.items[0]["reason"] == "Checks {fats}."
+    assert [item["name"] for item in parse_recommended_tests('["Vitamin D", "Ferritin"]', "json")] == ["Vitamin D", "Ferritin"]
+
+
+def test_only_entries_of_the_top_level_list_are_test_names():
+    payload = json.dumps({"tests": [
+        {"name": "Lipid Panel", "reasons": ["High cholesterol", "Family history"], "related": {"name": "ApoB"}},
+        "Ferritin",
+        ["Nested", "Strings"],
+    ]})
+
+    for size in (1, 4, len(payload)):
+        emitted = feed_in_chunks(IncrementalTestParser("json"), payload, size)
+        assert [name for names in emitted for name in names] == ["Lipid Panel", "Ferritin"]
+    assert [item["name"] for item in parse_recommended_tests('{"name": "Vitamin D"}', "json")] == ["Vitamin D"]
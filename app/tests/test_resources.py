@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import health_service
+from app.services.resources import FAILED, READY, ResourceRegistry
+
+
+async def start(registry):
+    await registry.start()
+
+
+def test_resources_start_concurrently_after_their_requirements():
+    events = []
+    registry = ResourceRegistry()
+
+    def slow(name):
+        def build():
+            events.append(f"build {name}")
+            time.sleep(0.2)
+            return name
+        return build
+
+    async def warm(value):
+        events.append(f"warm {value}")
+
+    registry.register("catalog", slow("catalog"))
+    registry.register("encoder", slow("encoder"), warm=warm)
+    registry.register("vector_store", lambda: "vectors", requires=("catalog", "encoder"))
+
+    started = time.perf_counter()
+    asyncio.run(start(registry))
+
+    assert time.perf_counter() - started < 0.4
+    assert registry.ready
+    assert registry.get("vector_store") == "vectors"
+    assert events.index("warm encoder") > events.index("build encoder")
+    assert set(events[:2]) == {"build catalog", "build encoder"}
+
+
+def test_failed_build_makes_the_worker_unready_but_failed_warm_up_does_not():
+    closed = []
+    registry = ResourceRegistry()
+
+    def broken():
+        raise ConnectionError("pinecone unreachable")
+
+    def unreachable(client):
+        raise TimeoutError("no route to host")
+
+    registry.register("s3", lambda: "client", warm=unreachable, close=closed.append)
+    registry.register("pinecone", broken)
+    registry.register("vector_store", lambda: "vectors", requires=("pinecone",))
+
+    async def run():
+        await registry.start()
+        await registry.close()
+
+    asyncio.run(run())
+
+    assert closed == ["client"]
+    assert not registry.ready
+
+
+def test_readyz_reports_ready_only_after_warm_up(monkeypatch):
+    registry = ResourceRegistry()
+    registry.register("encoder", lambda: "encoder")
+    monkeypatch.setattr(health_service, "resources", registry)
+    app = FastAPI()
+    app.include_router(health_service.router)
+    client = TestClient(app)
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+    starting = client.get("/readyz")
+    assert starting.status_code == 503
+    assert starting.json()["resources"]["encoder"]["status"] == "pending"
+
+    asyncio.run(start(registry))
+
+    ready = client.get("/readyz")
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "ready"
+    assert ready.json()["resources"]["encoder"]["status"] == READY
+
+
+def test_readyz_reports_failed_resources(monkeypatch):
+    registry = ResourceRegistry()
+    registry.register("llm", lambda: 1 / 0)
+    monkeypatch.setattr(health_service, "resources", registry)
+    asyncio.run(start(registry))
+    app = FastAPI()
+    app.include_router(health_service.router)
+
+    response = TestClient(app).get("/readyz")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "failed"
+    assert response.json()["resources"]["llm"]["status"] == FAILED
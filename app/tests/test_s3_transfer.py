@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import document_service
+from app.services import s3_transfer
+from app.services.s3_transfer import S3MultipartSink, get_s3_client
+
+MIB = 1024 * 1024
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+class FakeS3Client:
+    def __init__(self, delay=0.0, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.objects = {}
+        self.parts = {}
+        self.calls = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append(("put_object", Key))
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if Key in self.failing:
+                raise ConnectionError("connection reset")
+            with self.lock:
+                self.objects[Key] = Body
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.calls.append(("create_multipart_upload", Key))
+        self.parts[Key] = []
+        return {"UploadId": f"upload-{Key}"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append(("upload_part", len(Body)))
+        self.parts[Key].append(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append(("complete_multipart_upload", [part["PartNumber"] for part in MultipartUpload["Parts"]]))
+        self.objects[Key] = b"".join(self.parts.pop(Key))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append(("abort_multipart_upload", Key))
+        self.parts.pop(Key, None)
+
+
+def make_app():
+    app = FastAPI()
+    app.include_router(document_service.router, prefix="/api/v1")
+    return TestClient(app)
+
+
+def test_client_is_built_once_with_a_connection_pool():
+    assert get_s3_client() is get_s3_client()
+    assert get_s3_client().meta.config.max_pool_connections == s3_transfer.config.S3_MAX_POOL_CONNECTIONS
+
+
+def test_large_files_stream_as_multipart_parts(monkeypatch):
+    client = FakeS3Client()
+    monkeypatch.setattr(s3_transfer, "get_s3_client", lambda: client)
+    sink = S3MultipartSink(lambda: "big.bin", bucket="lab-bucket", part_size=5 * MIB, threshold=5 * MIB)
+    data = bytes(range(256)) * (12 * MIB // 256)
+
+    async def run():
+        for offset in range(0, len(data), MIB):
+            await sink.write(data[offset:offset + MIB])
+            # Never more than one part waiting in memory
+            assert len(sink._buffer) <= 5 * MIB + MIB
+        return await sink.close()
+
+    result = asyncio.run(run())
+
+    assert result == {"key": "big.bin", "url": "https://lab-bucket.s3.amazonaws.com/big.bin"}
+    assert client.objects["big.bin"] == data
+    assert [call for call in client.calls if call[0] == "upload_part"] == [
+        ("upload_part", 5 * MIB), ("upload_part", 5 * MIB), ("upload_part", 2 * MIB)]
+
+
+def test_lab_test_upload_streams_files_concurrently_with_per_file_results(monkeypatch):
+    client = FakeS3Client(delay=0.2, failing={"medical_reports/u1/report.pdf"})
+    monkeypatch.setattr(s3_transfer, "get_s3_client", lambda: client)
+
+    response = make_app().post("/api/v1/lab-test", data={"hasLabTest": "true", "hasMedicalReport": "true", "userId": "u1"},
+                               files=[("labTestFiles", ("cbc.png", PNG + b"cbc", "image/png")),
+                                      ("labTestFiles", ("lipids.pdf", b"%PDF-1.7 lipids", "application/pdf")),
+                                      ("medicalReportFiles", ("report.pdf", b"%PDF-1.7 report", "application/pdf"))])
+
+    assert response.status_code == 207
+    # All three uploads were in progress at once
+    assert client.max_in_flight == 3
+    body = response.json()
+    bucket = s3_transfer.config.S3_BUCKET
+    assert body["labTestUrls"] == [f"https://{bucket}.s3.amazonaws.com/lab_tests/u1/cbc.png",
+                                   f"https://{bucket}.s3.amazonaws.com/lab_tests/u1/lipids.pdf"]
+    assert body["medicalReportUrls"] == []
+    assert [file["filename"] for file in body["files"]] == ["cbc.png", "lipids.pdf", "report.pdf"]
+    assert "error" in body["files"][2]
+    assert client.objects["lab_tests/u1/cbc.png"] == PNG + b"cbc"
+
+
+def test_lab_test_upload_rejects_spoofed_and_oversized_files(monkeypatch):
+    client = FakeS3Client()
+    monkeypatch.setattr(s3_transfer, "get_s3_client", lambda: client)
+    form = {"hasLabTest": "true", "hasMedicalReport": "false", "userId": "u1"}
+
+    spoofed = make_app().post("/api/v1/lab-test", data=form,
+                              files=[("labTestFiles", ("cbc.pdf", b"MZ\x90\x00 not a pdf", "application/pdf"))])
+    assert spoofed.status_code == 400
+
+    monkeypatch.setattr(document_service, "MAX_FILE_SIZE", 1024)
+    oversized = make_app().post("/api/v1/lab-test", data=form,
+                                files=[("labTestFiles", ("notes.txt", b"x" * 2048, "text/plain"))])
+    assert oversized.status_code == 413
+    assert client.objects == {}
+
+
+def test_lab_test_form_fields_are_validated(monkeypatch):
+    client = FakeS3Client()
+    monkeypatch.setattr(s3_transfer, "get_s3_client", lambda: client)
+    files = [("labTestFiles", ("notes.txt", b"cholesterol", "text/plain"))]
+
+    invalid = make_app().post("/api/v1/lab-test", data={"hasLabTest": "maybe", "hasMedicalReport": "false", "userId": "u1"},
+                              files=files)
+    assert invalid.status_code == 422
+    assert [error["loc"] for error in invalid.json()["detail"]] == [["body", "hasLabTest"]]
+
+    missing = make_app().post("/api/v1/lab-test", data={"hasLabTest": "true", "userId": "u1"}, files=files)
+    assert missing.status_code == 422
+    assert client.objects == {}
+
+    # The form is still described in the OpenAPI schema although the endpoint parses the body itself
+    schema = make_app().get("/openapi.json").json()["paths"]["/api/v1/lab-test"]["post"]["requestBody"]
+    form = schema["content"]["multipart/form-data"]["schema"]
+    assert form["properties"]["hasLabTest"]["type"] == "boolean"
+    assert form["properties"]["labTestFiles"]["items"]["format"] == "binary"
+    assert form["required"] == ["hasLabTest", "hasMedicalReport", "userId"]
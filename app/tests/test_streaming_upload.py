@@ -0,0 +1,132 @@
+import hashlib
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import video_service
+from app.services.job_queue import JobQueue, JobStore
+from app.utils.streaming_upload import StreamingUploadParser
+
+
+class RecordingSink:
+    def __init__(self, fields, key_field):
+        self.fields = fields
+        self.key_field = key_field
+        self.chunks = []
+
+    async def write(self, chunk):
+        self.chunks.append(len(chunk))
+
+    async def close(self):
+        return {"bytes": sum(self.chunks), "largestChunk": max(self.chunks), "key": self.fields.get(self.key_field)}
+
+    async def abort(self):
+        self.chunks = []
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        parser = StreamingUploadParser(request, lambda name, filename, content_type, fields: RecordingSink(fields, "userId"),
+                                       max_size=8 * 1024 * 1024, allowed_extensions={".pdf", ".txt"}, chunk_size=64 * 1024)
+        await parser.parse()
+        files = await parser.close()
+        return {"fields": parser.fields,
+                "files": [{"filename": file.filename, "size": file.size, "sha256": file.digest, **file.result} for file in files]}
+
+    return TestClient(app)
+
+
+def test_files_are_hashed_and_forwarded_in_bounded_chunks():
+    content = b"%PDF-1.7\n" + os.urandom(1024 * 1024)
+
+    # Fields sent after the file are still available once the body has been read
+    response = make_app().post("/upload", files=[("report", ("report.pdf", content, "application/pdf")),
+                                                 ("userId", (None, "u1"))])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["fields"] == {"userId": "u1"}
+    assert body["files"][0]["size"] == len(content)
+    assert body["files"][0]["sha256"] == hashlib.sha256(content).hexdigest()
+    assert body["files"][0]["bytes"] == len(content)
+    assert body["files"][0]["largestChunk"] == 64 * 1024
+
+
+def test_disallowed_extension_is_rejected_before_the_body_is_read():
+    response = make_app().post("/upload", files=[("report", ("tool.exe", b"MZ" + b"\x00" * 10, "application/octet-stream"))])
+
+    assert response.status_code == 400
+
+
+def test_form_fields_are_bounded_in_size_and_number():
+    client = make_app()
+
+    oversized = client.post("/upload", files=[("userId", (None, "u" * (64 * 1024 + 1)))])
+    assert oversized.status_code == 413
+
+    too_many = client.post("/upload", files=[(f"field{number}", (None, "x")) for number in range(21)])
+    assert too_many.status_code == 400
+
+
+def test_video_job_upload_streams_into_the_job_spool(tmp_path, monkeypatch):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "spool")), concurrency=1,
+                     retention=3600, poll_interval=1)
+    queue.register("video-to-text", video_service.transcribe_video_job)
+    monkeypatch.setattr(video_service, "job_queue", queue)
+    app = FastAPI()
+    app.include_router(video_service.router, prefix="/api/v1")
+    video = os.urandom(300 * 1024)
+
+    response = TestClient(app).post("/api/v1/video-to-text/jobs", files={"file": ("clip.mp4", video, "video/mp4")})
+
+    assert response.status_code == 202
+    job_id = response.json()["jobId"]
+    job = queue.store.get(job_id)
+    assert job["params"] == {"digest": hashlib.sha256(video).hexdigest(), "filename": "clip.mp4"}
+    with open(queue.store.payload_path(job_id), "rb") as infile:
+        assert infile.read() == video
+    assert os.listdir(tmp_path / "spool") == [f"{job_id}.bin"]
+
+
+def test_video_upload_is_transcribed_from_a_temporary_file(monkeypatch):
+    transcribed = []
+
+    def transcribe_video(video_path, progress=None):
+        with open(video_path, "rb") as infile:
+            transcribed.append((video_path, infile.read()))
+        return {"text": "hello"}
+
+    monkeypatch.setattr(video_service, "transcribe_video", transcribe_video)
+    app = FastAPI()
+    app.include_router(video_service.router, prefix="/api/v1")
+    video = os.urandom(300 * 1024)
+
+    response = TestClient(app).post("/api/v1/video-to-text", files={"file": ("clip.mp4", video, "video/mp4")})
+
+    assert response.json() == {"text": "hello"}
+    [(path, content)] = transcribed
+    assert content == video
+    assert not os.path.exists(path)
+
+
+def test_video_job_upload_is_removed_when_submission_fails(tmp_path, monkeypatch):
+    queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "spool")), concurrency=1,
+                     retention=3600, poll_interval=1)
+    queue.register("video-to-text", video_service.transcribe_video_job)
+
+    async def failing_submit(kind, path, params=None):
+        raise OSError("database is locked")
+
+    monkeypatch.setattr(queue, "submit_file", failing_submit)
+    monkeypatch.setattr(video_service, "job_queue", queue)
+    app = FastAPI()
+    app.include_router(video_service.router, prefix="/api/v1")
+
+    response = TestClient(app).post("/api/v1/video-to-text/jobs", files={"file": ("clip.mp4", b"video", "video/mp4")})
+
+    assert response.status_code == 500
+    assert os.listdir(tmp_path / "spool") == []
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from app.services import transcription
+from app.services.transcription import ChunkTranscriber, segment_audio
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds, frequency=440):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * frequency * t) * 8000).astype("<i2")
+
+
+def silence(seconds):
+    return np.zeros(int(SAMPLE_RATE * seconds), dtype="<i2")
+
+
+def pcm(*parts):
+    return np.concatenate(parts).tobytes()
+
+
+def test_segments_cut_at_pauses_and_drop_silence():
+    audio = pcm(silence(1), tone(1), silence(0.5), tone(1), silence(0.5), tone(1), silence(1))
+
+    chunks = segment_audio(audio, SAMPLE_RATE, min_chunk_seconds=0.5, max_chunk_seconds=1.8, min_silence_ms=300)
+
+    assert len(chunks) == 3
+    assert all(end - start <= 1.8 * SAMPLE_RATE for start, end in chunks)
+    # Each chunk contains one whole tone, padded by part of the surrounding pauses
+    tone_starts = [1.0, 2.5, 4.0]
+    for (start, end), tone_start in zip(chunks, tone_starts):
+        assert start / SAMPLE_RATE <= tone_start and end / SAMPLE_RATE >= tone_start + 1
+
+
+def test_uninterrupted_speech_is_split_at_the_length_limit():
+    chunks = segment_audio(pcm(tone(5)), SAMPLE_RATE, min_chunk_seconds=0.5, max_chunk_seconds=2, min_silence_ms=300)
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0 and chunks[-1][1] == 5 * SAMPLE_RATE
+    assert all(end - start <= 2 * SAMPLE_RATE for start, end in chunks)
+    assert segment_audio(pcm(silence(2)), SAMPLE_RATE, min_chunk_seconds=0.5, max_chunk_seconds=2,
+                         min_silence_ms=300) == []
+
+
+def test_chunks_are_transcribed_concurrently_in_order_with_retries(monkeypatch):
+    attempts = {}
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_recognizer(recognizer, audio_data, language):
+        seconds = round(len(audio_data.frame_data) / 2 / SAMPLE_RATE)
+        with lock:
+            attempts[seconds] = attempts.get(seconds, 0) + 1
+            active.append(seconds)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(seconds)
+        if seconds == 2 and attempts[seconds] == 1:
+            raise sr.RequestError("connection reset")
+        return f"{seconds}s"
+
+    monkeypatch.setitem(transcription.RECOGNIZERS, "fake", fake_recognizer)
+    monkeypatch.setattr(transcription.config, "TRANSCRIPTION_MIN_CHUNK_SECONDS", 0.5)
+    monkeypatch.setattr(transcription.config, "TRANSCRIPTION_MAX_CHUNK_SECONDS", 10)
+    transcriber = ChunkTranscriber("fake", "en-US", concurrency=3, retries=1, backoff=0)
+    progress = []
+
+    result = transcriber.transcribe(pcm(tone(1), silence(1), tone(2), silence(1), tone(3)), SAMPLE_RATE, 2,
+                                    lambda fraction, stage: progress.append(fraction))
+
+    assert result["text"] == "2s 3s 4s"
+    assert [segment["text"] for segment in result["segments"]] == ["2s", "3s", "4s"]
+    assert result["segments"][0]["start"] == 0
+    assert result["segments"][-1]["end"] == 8
+    assert attempts[2] == 2 and max(peak) > 1
+    assert progress[-1] == pytest.approx(1)
+
+
+def test_every_chunk_failing_raises(monkeypatch):
+    def broken(recognizer, audio_data, language):
+        raise sr.RequestError("offline")
+
+    monkeypatch.setitem(transcription.RECOGNIZERS, "broken", broken)
+    transcriber = ChunkTranscriber("broken", "en-US", concurrency=2, retries=0)
+
+    with pytest.raises(sr.RequestError):
+        transcriber.transcribe(pcm(tone(1)), SAMPLE_RATE, 2)
+
+
+def test_offline_sphinx_engine_runs_without_network():
+    result = ChunkTranscriber("sphinx", "en-US", concurrency=1, retries=0).transcribe(pcm(tone(1)), SAMPLE_RATE, 2)
+
+    assert len(result["segments"]) == 1 and "error" not in result["segments"][0]
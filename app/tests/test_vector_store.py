@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import vector_store
+from app.services.vector_store import LocalVectorStore, VectorStore
+from app.utils.embedding import VECTOR_DIMENSION, embed_token_lists
+
+
+def make_store():
+    token_lists = [[1, 2, 3], [1, 2, 900], [700, 701, 702]]
+    metadata = [
+        {"Test ID": "1", "Test Name": "Lipid Panel", "Price (AED)": 150.0},
+        {"Test ID": "2", "Test Name": "HbA1c", "Price (AED)": 90.0},
+        {"Test ID": "3", "Test Name": "TSH", "Price (AED)": 120.0},
+    ]
+    return LocalVectorStore(["1", "2", "3"], embed_token_lists(token_lists), metadata)
+
+
+def test_query_returns_top_k_by_cosine_in_pinecone_shape():
+    store = make_store()
+    query = embed_token_lists([[1, 2, 3]])[0]
+
+    response = store.query(vector=query.tolist(), top_k=2, include_metadata=True)
+
+    assert [match["id"] for match in response["matches"]] == ["1", "2"]
+    assert response["matches"][0]["score"] > response["matches"][1]["score"]
+    assert response["matches"][0]["metadata"]["Test Name"] == "Lipid Panel"
+
+
+def test_metadata_filters_and_dummy_vector_queries():
+    store = make_store()
+
+    exact = asyncio.run(store.aquery(vector=[0] * VECTOR_DIMENSION, filter={"Test Name": {"$eq": "TSH"}}, top_k=1, include_metadata=True))
+    assert [match["id"] for match in exact["matches"]] == ["3"]
+
+    cheap = store.query(vector=np.ones(VECTOR_DIMENSION), top_k=5, filter={"$or": [{"Price (AED)": {"$lt": 100}}, {"Test Name": {"$in": ["TSH"]}}]})
+    assert sorted(match["id"] for match in cheap["matches"]) == ["2", "3"]
+
+    assert store.query(vector=np.ones(VECTOR_DIMENSION), filter={"Test Name": "Missing"})["matches"] == []
+
+
+def test_backend_without_query_cannot_be_created():
+    class IncompleteStore(VectorStore):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+def test_query_many_matches_individual_queries():
+    store = make_store()
+    queries = embed_token_lists([[700], [900, 1]])
+
+    batched = store.query_many(queries, top_k=1)
+
+    assert [response["matches"][0]["id"] for response in batched] == ["3", "2"]
+    assert batched[1] == store.query(queries[1], top_k=1)
+
+
+def test_stale_local_store_is_rebuilt_once_off_the_event_loop(monkeypatch):
+    from app.api.v1.endpoints import document_service
+
+    builds = []
+
+    def from_catalog(records):
+        builds.append(threading.current_thread())
+        time.sleep(0.05)
+        return LocalVectorStore([], np.zeros((0, VECTOR_DIMENSION)), records)
+
+    catalog = SimpleNamespace(records=[])
+    monkeypatch.setattr(vector_store, "catalog_index", catalog)
+    monkeypatch.setattr(vector_store, "_local_vector_store", None)
+    monkeypatch.setattr(LocalVectorStore, "from_catalog", staticmethod(from_catalog))
+    monkeypatch.setattr(vector_store.config, "VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setattr(document_service.config, "VECTOR_STORE_BACKEND", "local")
+
+    async def requests():
+        return await asyncio.gather(*[document_service.current_vector_store() for _ in range(5)])
+
+    stores = asyncio.run(requests())
+
+    assert len(builds) == 1 and builds[0] is not threading.main_thread()
+    assert all(store is stores[0] for store in stores)
+
+    # A catalog refresh swaps the records list, which makes the store stale again
+    catalog.records = []
+    assert asyncio.run(document_service.current_vector_store()) is not stores[0]
+    assert len(builds) == 2
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class AsyncTTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after ttl seconds.
+    Concurrent misses for the same key share a single in-flight computation (single-flight).
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._in_flight = {}  # key -> (generation, asyncio.Future)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= self.timer():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (self.timer() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable):
+        """
+        Return (found, value) without computing anything; only hits are counted.
+        """
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+        return found, value
+
+    @property
+    def generation(self) -> int:
+        """
+        Incremented by every invalidate(); compare it before and after computing a value to detect staleness.
+        """
+        return self._generation
+
+    def set(self, key: Hashable, value: Any):
+        self._set(key, value)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            # shield() so one waiter giving up does not cancel the computation for everyone else
+            return await asyncio.shield(in_flight[1])
+
+        self.misses += 1
+        generation = self._generation
+        # compute() runs in its own task, so the caller giving up does not cancel it for the coalesced waiters
+        task = asyncio.ensure_future(compute())
+        self._in_flight[key] = (generation, task)
+        task.add_done_callback(lambda done: self._finish(key, generation, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, generation: int, task: asyncio.Future):
+        # Runs before any awaiting caller resumes, so the result is cached by the time they see it
+        if self._in_flight.get(key) == (generation, task):
+            del self._in_flight[key]
+        # exception() also marks a failure as retrieved, so it is not reported when nobody was waiting
+        if task.cancelled() or task.exception() is not None:
+            return
+        # Results computed before an invalidate() may be stale and are only handed to current waiters
+        if generation == self._generation:
+            self._set(key, task.result())
+
+    def invalidate(self) -> int:
+        invalidated = len(self._entries)
+        self._entries.clear()
+        self._in_flight.clear()
+        self._generation += 1
+        return invalidated
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "maxSize": self.maxsize,
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hitRatio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
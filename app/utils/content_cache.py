@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from app.core.config import Config
+from app.utils.metrics import register_cache
+
+config = Config()
+logger = logging.getLogger(__name__)
+
+
+class ContentCache:
+    """
+    Disk cache for results computed from uploaded files, keyed on the SHA-256 of the upload plus the
+    parameters that influence the result. Entries are JSON files written atomically (temp file + rename),
+    so several worker processes can share one directory without locking.
+    Entries older than max_age seconds are misses; once the directory grows past max_bytes the least
+    recently used entries are removed. An empty directory disables the cache.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age: float, prune_interval: float = 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prune_interval = prune_interval
+        self.hits = {}
+        self.misses = {}
+        self._bytes_written = 0
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def key(self, namespace: str, content_digest: str, **params) -> str:
+        canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        return f"{namespace}-" + hashlib.sha256(f"{content_digest}|{canonical}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Fan out over subdirectories so no single directory collects every entry
+        return os.path.join(self.directory, key[-2:], f"{key}.json")
+
+    def _count(self, counter: dict, key: str):
+        namespace = key.split("-", 1)[0]
+        with self._lock:
+            counter[namespace] = counter.get(namespace, 0) + 1
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as infile:
+                value = json.load(infile)
+            # The modification time doubles as last-access time for LRU eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            self._count(self.misses, key)
+            return None
+        self._count(self.hits, key)
+        return value
+
+    def put(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        data = json.dumps(value).encode("utf-8")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as outfile:
+                    outfile.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not write result cache entry {key}: {str(e)}")
+            return
+
+        with self._lock:
+            self._bytes_written += len(data)
+            due = self._bytes_written > self.max_bytes / 10 or time.monotonic() - self._last_prune > self.prune_interval
+        if due:
+            self.prune()
+
+    def _entries(self):
+        entries = []
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self) -> int:
+        """
+        Remove expired entries, then the least recently used ones until the cache fits in max_bytes.
+        """
+        with self._lock:
+            self._bytes_written = 0
+            self._last_prune = time.monotonic()
+        if not self.enabled or not os.path.isdir(self.directory):
+            return 0
+
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        expired_before = time.time() - self.max_age
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime >= expired_before and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        if removed:
+            logger.info(f"Pruned {removed} result cache entries from {self.directory}")
+        return removed
+
+    def counts(self, namespace: str) -> tuple:
+        with self._lock:
+            return self.hits.get(namespace, 0), self.misses.get(namespace, 0)
+
+    def stats(self) -> dict:
+        entries = self._entries() if self.enabled and os.path.isdir(self.directory) else []
+        with self._lock:
+            hits, misses = dict(self.hits), dict(self.misses)
+        namespaces = {}
+        for namespace in sorted(set(hits) | set(misses)):
+            lookups = hits.get(namespace, 0) + misses.get(namespace, 0)
+            namespaces[namespace] = {
+                "hits": hits.get(namespace, 0),
+                "misses": misses.get(namespace, 0),
+                "hitRatio": hits.get(namespace, 0) / lookups if lookups else 0.0,
+            }
+        lookups = sum(hits.values()) + sum(misses.values())
+        return {
+            "enabled": self.enabled,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "maxBytes": self.max_bytes,
+            "maxAgeSeconds": self.max_age,
+            # Hit/miss counters are per worker process; entries and bytes are shared on disk
+            "hits": sum(hits.values()),
+            "misses": sum(misses.values()),
+            "hitRatio": sum(hits.values()) / lookups if lookups else 0.0,
+            "namespaces": namespaces,
+        }
+
+
+result_cache = ContentCache(
+    directory=config.RESULT_CACHE_DIR,
+    max_bytes=config.RESULT_CACHE_MAX_BYTES,
+    max_age=config.RESULT_CACHE_MAX_AGE,
+)
+register_cache("ocr_result", lambda: result_cache.counts("ocr"))
+register_cache("video_result", lambda: result_cache.counts("video"))
@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import tiktoken
+
+from app.utils.metrics import register_cache
+
+VECTOR_DIMENSION = 1536  # Set this to match your Pinecone index dimension
+MAX_TOKENS = 8191  # Define the maximum number of tokens you want to use
+ENCODING_NAME = "cl100k_base"
+QUERY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=None)
+def get_encoder():
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+
+def warm_encoder(encoder):
+    # The first encode() call builds tiktoken's regex and merge tables
+    encoder.encode("warm up the encoder")
+
+
+def embed_tokens(tokens: Sequence[int]) -> np.ndarray:
+    """
+    Hash token ids into a VECTOR_DIMENSION count vector and L2-normalize it.
+    """
+    tokens = np.asarray(tokens[:MAX_TOKENS], dtype=np.int64)
+    embedding = np.bincount(tokens % VECTOR_DIMENSION, minlength=VECTOR_DIMENSION).astype(np.float64)
+
+    norm = np.linalg.norm(embedding)
+    if norm != 0:
+        embedding = embedding / norm
+
+    return embedding
+
+
+def embed_token_lists(token_lists: Sequence[Sequence[int]]) -> np.ndarray:
+    """
+    Vectorized embed_tokens for many texts at once, returning an (n, VECTOR_DIMENSION) float32 matrix.
+    """
+    token_arrays = [np.asarray(tokens[:MAX_TOKENS], dtype=np.int64) for tokens in token_lists]
+    row_count = len(token_arrays)
+    if row_count == 0:
+        return np.zeros((0, VECTOR_DIMENSION), dtype=np.float32)
+
+    lengths = np.fromiter((len(tokens) for tokens in token_arrays), dtype=np.int64, count=row_count)
+    rows = np.repeat(np.arange(row_count, dtype=np.int64), lengths)
+    buckets = np.concatenate(token_arrays) % VECTOR_DIMENSION
+
+    # One bincount over (row, bucket) pairs fills the whole matrix without a Python loop over tokens
+    counts = np.bincount(rows * VECTOR_DIMENSION + buckets, minlength=row_count * VECTOR_DIMENSION)
+    embeddings = counts.reshape(row_count, VECTOR_DIMENSION).astype(np.float64)
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms != 0)
+    return embeddings.astype(np.float32)
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def embed_query(text: str) -> np.ndarray:
+    """
+    Cached embedding of a single query string. The returned array is read-only since it is shared between callers.
+    """
+    embedding = embed_tokens(get_encoder().encode(text))
+    embedding.setflags(write=False)
+    return embedding
+
+
+register_cache("query_embedding", lambda: embed_query.cache_info()[:2])
+
+
+def embed_texts(texts: Iterable[str]) -> np.ndarray:
+    """
+    Embed a batch of texts into a single (n, VECTOR_DIMENSION) float32 matrix.
+    """
+    return embed_token_lists(get_encoder().encode_batch(list(texts)))
+
+
+def create_custom_embedding(text: str) -> List[float]:
+    return embed_query(text).tolist()
@@ -0,0 +1,343 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Upper bounds in seconds, from in-process CPU stages up to long OCR and transcription calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Metric:
+    """
+    A metric family. labels(*values) returns the child for one label combination; children are created on first
+    use and kept, so label values must come from a small fixed set (stage names, routes), never from user input.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[Tuple[str, str]], float]]:
+        for values, child in list(self._children.items()):
+            yield self.name, tuple(zip(self.labelnames, values)), child.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def totals(self) -> Dict[tuple, Tuple[int, float]]:
+        """
+        {label values: (observation count, sum)}, e.g. to diff two snapshots around a benchmark run.
+        """
+        totals = {}
+        for values, child in list(self._children.items()):
+            with child._lock:
+                totals[values] = (sum(child.counts), child.sum)
+        return totals
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format. Values are per worker process; Prometheus
+    scrapes each worker (or sums them) as usual. Collectors are called at scrape time for values that are
+    cheaper to read on demand than to update on every request, such as cache hit counts.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[Metric, Sequence[str], float]]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+            raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+        return existing
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable):
+        """
+        collector() yields (metric, label values, value) tuples; each value is set on the metric's child at scrape time.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            for metric, values, value in collector():
+                metric.labels(*values).value = value
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("razee_stage_duration_seconds", "Time spent in each pipeline stage and external call.", ["stage"])
+STAGE_IN_FLIGHT = metrics.gauge("razee_stage_in_flight", "Stage executions currently running.", ["stage"])
+STAGE_ERRORS = metrics.counter("razee_stage_errors_total", "Stage executions that raised, by exception type.", ["stage", "error"])
+
+CACHE_HITS = metrics.counter("razee_cache_hits_total", "Cache lookups answered from the cache.", ["cache"])
+CACHE_MISSES = metrics.counter("razee_cache_misses_total", "Cache lookups that had to compute the value.", ["cache"])
+CACHE_HIT_RATIO = metrics.gauge("razee_cache_hit_ratio", "Hits over lookups since the worker started.", ["cache"])
+
+
+class StageTimer:
+    """
+    Context manager (sync or async) recording one execution of a stage: its duration, whether it is in flight
+    and the exception type if it raised. Costs a few microseconds, so it can wrap per-item work.
+    """
+
+    __slots__ = ("name", "_in_flight", "_started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._in_flight = STAGE_IN_FLIGHT.labels(self.name)
+        self._in_flight.inc()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        STAGE_SECONDS.labels(self.name).observe(time.perf_counter() - self._started)
+        self._in_flight.dec()
+        if exc_type is not None and not issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            STAGE_ERRORS.labels(self.name, exc_type.__name__).inc()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        return self.__exit__(exc_type, exc, traceback)
+
+
+def stage(name: str) -> StageTimer:
+    """
+    Time a block as a named stage: `with stage("ocr.split_pdf"):` or `async with stage("llm.recommend"):`.
+    """
+    return StageTimer(name)
+
+
+def timed(name: str):
+    """
+    Decorator timing every call of a function, sync or async, as the named stage.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with StageTimer(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with StageTimer(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def register_cache(name: str, counts: Callable[[], Tuple[int, int]]):
+    """
+    Export a cache's hit and miss counts, and their ratio, read from counts() -> (hits, misses) at scrape time.
+    """
+    def collect():
+        hits, misses = counts()
+        yield CACHE_HITS, (name,), hits
+        yield CACHE_MISSES, (name,), misses
+        yield CACHE_HIT_RATIO, (name,), hits / (hits + misses) if hits + misses else 0.0
+
+    metrics.register_collector(collect)
+
+
+HTTP_SECONDS = metrics.histogram("razee_http_request_duration_seconds", "Time to send the complete response, streaming bodies included.",
+                                 ["method", "route", "status"])
+HTTP_IN_FLIGHT = metrics.gauge("razee_http_requests_in_flight", "Requests currently being handled.", ["method", "route"])
+HTTP_ERRORS = metrics.counter("razee_http_errors_total", "Responses with a 5xx status or that failed before responding.",
+                              ["method", "route", "status"])
+
+
+def route_template(scope: dict) -> str:
+    """
+    Path template of the route matching the request ("/api/v1/jobs/{job_id}"), so labels stay bounded.
+    """
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests and server errors.
+    Route templates are memoized per (method, path), up to route_cache_size distinct paths.
+    """
+
+    def __init__(self, app, route_cache_size: int = 4096):
+        self.app = app
+        self.route_cache_size = route_cache_size
+        self._routes = {}
+
+    def _route(self, scope: dict) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            route = route_template(scope)
+            if len(self._routes) < self.route_cache_size:
+                self._routes[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status = 500
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_SECONDS.labels(method, route, str(status)).observe(time.perf_counter() - started)
+            if status >= 500:
+                HTTP_ERRORS.labels(method, route, str(status)).inc()
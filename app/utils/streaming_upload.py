@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from multipart.multipart import MultipartParser, parse_options_header
+from pydantic import BaseModel, ValidationError
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Non-file form fields are kept in memory, so both their size and their number are bounded
+MAX_FIELD_SIZE = 64 * 1024
+MAX_FIELDS = 20
+BINARY_FILE = {"type": "string", "format": "binary"}
+
+# Leading bytes of the binary formats the upload endpoints accept
+MAGIC_NUMBERS = {
+    '.pdf': (b'%PDF-',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.gif': (b'GIF87a', b'GIF89a'),
+    '.bmp': (b'BM',),
+    '.tif': (b'II*\x00', b'MM\x00*'),
+    '.tiff': (b'II*\x00', b'MM\x00*'),
+    '.webp': (b'RIFF',),
+}
+MAGIC_PREFIX_LENGTH = max(len(magic) for magics in MAGIC_NUMBERS.values() for magic in magics)
+
+
+class MemorySink:
+    """
+    Keeps the upload in memory, for processing stages such as OCR that need the whole file anyway.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    async def write(self, chunk: bytes):
+        self.buffer += chunk
+
+    async def close(self) -> bytes:
+        return bytes(self.buffer)
+
+    async def abort(self):
+        self.buffer = bytearray()
+
+
+class FileSink:
+    """
+    Streams the upload into a file next to its final location; close() returns the path.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"upload-{uuid.uuid4().hex}.part")
+        self._file = open(self.path, "wb")
+
+    async def write(self, chunk: bytes):
+        await asyncio.to_thread(self._file.write, chunk)
+
+    async def close(self) -> str:
+        self._file.close()
+        return self.path
+
+    async def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class StreamedFile:
+    """
+    A file part of a multipart request that was validated, hashed and forwarded to its sink while it arrived.
+    result is what the sink's close() returned, e.g. the S3 object or the in-memory bytes.
+    """
+
+    def __init__(self, field_name: str, filename: str, content_type: str, sink):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.sink = sink
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.result = None
+        self._prefix = b""
+        self._pending = bytearray()
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename)[1].lower()
+
+    @property
+    def digest(self) -> str:
+        return self.sha256.hexdigest()
+
+    def check_magic(self, final: bool = False):
+        magics = MAGIC_NUMBERS.get(self.extension)
+        if magics is None or self._prefix is None:
+            return
+        if len(self._prefix) < MAGIC_PREFIX_LENGTH and not final:
+            return
+        if not any(self._prefix.startswith(magic) for magic in magics):
+            raise HTTPException(status_code=400, detail=f"File content does not match its type: {self.filename}")
+        self._prefix = None
+
+
+class StreamingUploadParser:
+    """
+    Parses a multipart/form-data request body as it streams in, instead of letting Starlette spool every file
+    first. Each file part is checked against max_size and the allowed extensions/content types, sniffed for
+    magic bytes, hashed incrementally and forwarded in chunks of at most chunk_size to the sink returned by
+    sink_factory(field_name, filename, content_type, fields_so_far). Besides what the sinks keep, only the
+    non-file fields are held, at most max_fields of at most max_field_size bytes each.
+    Violations raise HTTPException (400/413) after aborting every sink.
+    """
+
+    def __init__(self, request: Request, sink_factory: Callable, max_size: int,
+                 allowed_extensions: Optional[set] = None, content_type_prefix: str = None,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE, max_files: int = 20,
+                 max_field_size: int = MAX_FIELD_SIZE, max_fields: int = MAX_FIELDS):
+        self.request = request
+        self.sink_factory = sink_factory
+        self.max_size = max_size
+        self.allowed_extensions = allowed_extensions
+        self.content_type_prefix = content_type_prefix
+        self.chunk_size = chunk_size
+        self.max_files = max_files
+        self.max_field_size = max_field_size
+        self.max_fields = max_fields
+        self.field_count = 0
+        self.fields: Dict[str, str] = {}
+        self.files: List[StreamedFile] = []
+        self._events = []
+        self._header_name = b""
+        self._header_value = b""
+        self._headers = {}
+        self._field_data = bytearray()
+
+    # python-multipart callbacks only record events; they are applied asynchronously in parse()
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", data[start:end]))
+
+    def _on_part_end(self):
+        self._events.append(("end", None))
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        self._events.append(("headers", dict(self._headers)))
+
+    async def parse(self) -> "StreamingUploadParser":
+        _, params = parse_options_header(self.request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data request")
+        parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+        current = None
+        try:
+            async for body_chunk in self.request.stream():
+                parser.write(body_chunk)
+                events, self._events = self._events, []
+                for event, value in events:
+                    if event == "headers":
+                        current = await self._start_part(value)
+                    elif event == "data":
+                        if isinstance(current, StreamedFile):
+                            await self._write(current, value)
+                        else:
+                            if len(self._field_data) + len(value) > self.max_field_size:
+                                raise HTTPException(status_code=413, detail="Form field size exceeds the limit")
+                            self._field_data += value
+                    elif event == "end":
+                        await self._end_part(current)
+                        current = None
+            parser.finalize()
+        except BaseException:
+            await self.abort()
+            raise
+        return self
+
+    async def _start_part(self, headers: dict):
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" not in options:
+            self.field_count += 1
+            if self.field_count > self.max_fields:
+                raise HTTPException(status_code=400, detail="Too many form fields")
+            self._field_data = bytearray()
+            return name
+
+        filename = os.path.basename(options[b"filename"].decode("utf-8", errors="replace"))
+        content_type = headers.get(b"content-type", b"application/octet-stream").decode("latin-1")
+        if len(self.files) >= self.max_files:
+            raise HTTPException(status_code=400, detail="Too many files")
+        if self.allowed_extensions is not None and os.path.splitext(filename)[1].lower() not in self.allowed_extensions:
+            raise HTTPException(status_code=400, detail="Invalid file type")
+        if self.content_type_prefix and not content_type.startswith(self.content_type_prefix):
+            raise HTTPException(status_code=400, detail="Invalid file type")
+
+        streamed = StreamedFile(name, filename, content_type, None)
+        streamed.sink = self.sink_factory(name, filename, content_type, self.fields)
+        self.files.append(streamed)
+        return streamed
+
+    async def _write(self, streamed: StreamedFile, data: bytes):
+        streamed.size += len(data)
+        if streamed.size > self.max_size:
+            raise HTTPException(status_code=413, detail="File size exceeds the limit")
+        if streamed._prefix is not None:
+            streamed._prefix += data[:MAGIC_PREFIX_LENGTH]
+            streamed.check_magic()
+        streamed.sha256.update(data)
+        # Coalesce the parser's small slices into chunk_size writes
+        streamed._pending += data
+        while len(streamed._pending) >= self.chunk_size:
+            chunk = bytes(streamed._pending[:self.chunk_size])
+            del streamed._pending[:self.chunk_size]
+            await streamed.sink.write(chunk)
+
+    async def _end_part(self, current):
+        if isinstance(current, StreamedFile):
+            current.check_magic(final=True)
+            if current._pending:
+                await current.sink.write(bytes(current._pending))
+                current._pending = bytearray()
+        elif current is not None:
+            self.fields[current] = self._field_data.decode("utf-8", errors="replace")
+            self._field_data = bytearray()
+
+    def validate_fields(self, model: Type[BaseModel]) -> BaseModel:
+        """
+        Validate and coerce the form fields with a pydantic model (e.g. "true" into True), answering 422 with
+        the same error list FastAPI returns for Form(...) parameters.
+        """
+        try:
+            return model.model_validate(self.fields)
+        except ValidationError as e:
+            errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+            raise HTTPException(status_code=422, detail=jsonable_encoder(errors))
+
+    def files_for(self, field_name: str) -> List[StreamedFile]:
+        return [streamed for streamed in self.files if streamed.field_name == field_name]
+
+    async def close(self) -> List[StreamedFile]:
+        """
+        Finish every sink concurrently (e.g. the last part of each S3 upload) and store their results.
+        """
+        results = await asyncio.gather(*[streamed.sink.close() for streamed in self.files], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await self.abort()
+            raise errors[0]
+        for streamed, result in zip(self.files, results):
+            streamed.result = result
+        return self.files
+
+    async def abort(self):
+        await asyncio.gather(*[streamed.sink.abort() for streamed in self.files if streamed.sink is not None],
+                             return_exceptions=True)
+
+
+async def receive_file(request: Request, field_name: str, sink_factory: Callable, max_size: int,
+                       content_type_prefix: str = None) -> StreamedFile:
+    """
+    Stream a request carrying a single file in field_name into the sink from sink_factory() and close it.
+    """
+    upload = await StreamingUploadParser(request, lambda *_: sink_factory(), max_size=max_size,
+                                         content_type_prefix=content_type_prefix, max_files=1).parse()
+    files = upload.files_for(field_name)
+    if not files:
+        await upload.abort()
+        raise HTTPException(status_code=422, detail=f"Missing file field: {field_name}")
+    await upload.close()
+    return files[0]
+
+
+def multipart_openapi(fields: Optional[Type[BaseModel]] = None, files: Optional[Dict[str, dict]] = None,
+                      required_files: Tuple[str, ...] = ()) -> dict:
+    """
+    openapi_extra for an endpoint that parses its multipart/form-data body itself, so the docs still describe
+    the form: the fields of the pydantic model plus the file fields (name -> schema, e.g. BINARY_FILE).
+    """
+    schema = fields.model_json_schema() if fields is not None else {}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {**schema.get("properties", {}), **(files or {})},
+        "required": [*schema.get("required", []), *required_files],
+    }}}}}
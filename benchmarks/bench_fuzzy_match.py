@@ -0,0 +1,111 @@
+"""
+Compare hit rate and per-lookup latency of the catalog lookup paths used by /recommend-tests:
+
+  exact_then_vector        exact name/CPT match, else hashed-token vector search (the previous path)
+  exact_fuzzy_then_vector  exact match, else trigram fuzzy match above the threshold, else vector search
+
+Queries are generated from the catalog itself the way the AI tends to phrase test names (case changes,
+"test"/"panel" suffixes, typos, aliases from the Tags column), so every query has a known correct Test ID.
+Vector search runs against the local NumPy store; pass --vector-latency-ms to add the Pinecone round-trip
+the remote backend would pay for every lookup that falls through to it.
+
+Usage:
+    python benchmarks/bench_fuzzy_match.py --catalog data/datasets/lab_tests_ingested_with_descriptions_final_with_tags.csv
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.config import Config
+from app.services.catalog_index import CatalogIndex
+from app.services.vector_store import LocalVectorStore
+from app.utils.embedding import embed_query
+
+
+def make_typo(text: str, rng: random.Random) -> str:
+    if len(text) < 5:
+        return text
+    position = rng.randrange(1, len(text) - 1)
+    return text[:position] + text[position + 1:]
+
+
+def generate_queries(records, sample_size: int, seed: int):
+    rng = random.Random(seed)
+    sample = rng.sample(records, min(sample_size, len(records)))
+    queries = []
+    for record in sample:
+        name = record["Test Name"]
+        variants = [name.lower(), f"{name} test", make_typo(name, rng)]
+        tags = [tag.strip() for tag in str(record["Tags"]).split(",") if tag.strip()]
+        if tags:
+            variants.append(rng.choice(tags))
+        queries.extend((variant, str(record["Test ID"])) for variant in variants)
+    return queries
+
+
+def run_path(queries, catalog, store, use_fuzzy: bool, threshold: float):
+    latencies = []
+    hits = 0
+    vector_fallbacks = 0
+    for query, expected_id in queries:
+        start = time.perf_counter()
+        match = catalog.lookup(query)
+        if match is None and use_fuzzy:
+            fuzzy_match = catalog.fuzzy_lookup(query, threshold)
+            match = fuzzy_match[0] if fuzzy_match else None
+        if match is None:
+            vector_fallbacks += 1
+            response = store.query(embed_query(query), top_k=1)
+            match = response["matches"][0]["metadata"] if response["matches"] else None
+        latencies.append(time.perf_counter() - start)
+        if match is not None and str(match["Test ID"]) == expected_id:
+            hits += 1
+    return np.asarray(latencies), hits, vector_fallbacks
+
+
+def summarize(name, queries, latencies, hits, vector_fallbacks, vector_latency_ms):
+    return {
+        "path": name,
+        "queries": len(queries),
+        "hit_rate": round(hits / len(queries), 4),
+        "vector_fallback_rate": round(vector_fallbacks / len(queries), 4),
+        "p50_us": round(float(np.percentile(latencies, 50)) * 1e6, 1),
+        "p95_us": round(float(np.percentile(latencies, 95)) * 1e6, 1),
+        "mean_us": round(float(latencies.mean()) * 1e6, 1),
+        # Expected per-lookup cost once remote vector round-trips are included
+        "mean_with_remote_vector_ms": round(float(latencies.mean()) * 1e3 + vector_fallbacks / len(queries) * vector_latency_ms, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", default=Config.CATALOG_CSV_PATH)
+    parser.add_argument("--sample", type=int, default=500, help="number of catalog tests to generate queries from")
+    parser.add_argument("--threshold", type=float, default=Config.FUZZY_MATCH_THRESHOLD)
+    parser.add_argument("--vector-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    catalog = CatalogIndex(args.catalog)
+    catalog.refresh()
+    store = LocalVectorStore.from_catalog(catalog.records)
+    queries = generate_queries(catalog.records, args.sample, args.seed)
+
+    results = []
+    for name, use_fuzzy in (("exact_then_vector", False), ("exact_fuzzy_then_vector", True)):
+        embed_query.cache_clear()
+        latencies, hits, vector_fallbacks = run_path(queries, catalog, store, use_fuzzy, args.threshold)
+        results.append(summarize(name, queries, latencies, hits, vector_fallbacks, args.vector_latency_ms))
+
+    print(json.dumps({"threshold": args.threshold, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure what the metrics instrumentation adds per call: a stage() timer around a no-op block, and
+MetricsMiddleware around a bare ASGI endpoint resolved among 20 routes. Both should stay negligible next to
+requests that take tens of milliseconds to seconds; the run exits non-zero when either exceeds its budget.
+
+Usage:
+    python benchmarks/bench_metrics_overhead.py
+    python benchmarks/bench_metrics_overhead.py --iterations 50000 --max-stage-us 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import FastAPI
+
+from app.utils.metrics import MetricsMiddleware, StageTimer
+
+
+def stage_overhead(iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with StageTimer("bench.overhead"):
+            pass
+    return (time.perf_counter() - started) / iterations
+
+
+def middleware_overhead(iterations: int) -> float:
+    app = FastAPI()
+    for number in range(20):
+        app.add_api_route(f"/route-{number}/{{item_id}}", lambda item_id: item_id)
+
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def noop(message):
+        pass
+
+    async def requests(handler):
+        # The last route, so the middleware has to try every other template first
+        scope = {"type": "http", "method": "GET", "path": "/route-19/x", "root_path": "", "app": app}
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await handler(dict(scope), None, noop)
+        return (time.perf_counter() - started) / iterations
+
+    return asyncio.run(requests(MetricsMiddleware(endpoint))) - asyncio.run(requests(endpoint))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--max-stage-us", type=float, default=50.0)
+    parser.add_argument("--max-middleware-us", type=float, default=500.0)
+    args = parser.parse_args()
+
+    result = {
+        "stage_us": round(stage_overhead(args.iterations) * 1e6, 2),
+        "middleware_us": round(middleware_overhead(args.iterations) * 1e6, 2),
+    }
+    print(json.dumps(result, indent=2))
+
+    over_budget = result["stage_us"] > args.max_stage_us or result["middleware_us"] > args.max_middleware_us
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Local stand-ins for the external services, with configurable latency, so the load test measures this code base
+rather than the network. Responses are derived from the request content (CRC32), never from call order, so
+the same request gets the same answer at any concurrency.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+
+def _crc(value) -> int:
+    if not isinstance(value, bytes):
+        value = str(value).encode("utf-8")
+    return zlib.crc32(value)
+
+
+class Latency:
+    """
+    base_ms plus up to jitter_ms, picked deterministically from the request key.
+    """
+
+    def __init__(self, base_ms: float, jitter_ms: float = 0.0):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+
+    def seconds(self, key="") -> float:
+        jitter = (_crc(key) % 1000) / 1000 * self.jitter_ms if self.jitter_ms else 0.0
+        return (self.base_ms + jitter) / 1000
+
+
+class FakeChatModel:
+    """
+    Answers the three prompts of /recommend-tests the way the AI71 model does: a numbered list of test names,
+    a JSON object of reasons for the batched prompt and a sentence for the per-test prompt.
+    Suggested names mix exact catalog names, AI-style variants (case, "test" suffix) and names that are not in
+    the catalog, so the exact, fuzzy and vector lookup paths all get traffic.
+    """
+
+    def __init__(self, test_names: list, latency: Latency, token_latency: Latency = None, suggestions: int = 6):
+        self.test_names = test_names
+        self.latency = latency
+        self.token_latency = token_latency or Latency(0)
+        self.suggestions = suggestions
+
+    def suggest(self, prompt: str) -> list:
+        seed = _crc(prompt)
+        names = []
+        for number in range(self.suggestions):
+            name = self.test_names[(seed + number * 7919) % len(self.test_names)]
+            variant = (seed >> number) % 4
+            if variant == 1:
+                name = name.lower()
+            elif variant == 2:
+                name = f"{name} test"
+            elif variant == 3 and number == self.suggestions - 1:
+                name = f"Specialty Marker {seed % 97}"
+            names.append(name)
+        return names
+
+    def answer(self, prompt: str) -> str:
+        if "numbered list" in prompt:
+            return "\n".join(f"{number}. {name}" for number, name in enumerate(self.suggest(prompt), start=1))
+        if "JSON array" in prompt:
+            return json.dumps([{"name": name} for name in self.suggest(prompt)])
+        if "JSON object" in prompt:
+            names = [line[2:] for line in prompt.splitlines() if line.startswith("- ")]
+            return json.dumps({name: f"{name} shows how your body is handling your health goals." for name in names})
+        quoted = re.search(r"named '([^']+)'", prompt)
+        return f"{quoted.group(1) if quoted else 'This test'} shows how your body is handling your health goals."
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1].content
+        await asyncio.sleep(self.latency.seconds(prompt))
+        return SimpleNamespace(content=self.answer(prompt))
+
+    async def astream(self, messages):
+        prompt = messages[-1].content
+        # Time to first token, then the answer a few characters at a time
+        await asyncio.sleep(self.latency.seconds(prompt))
+        answer = self.answer(prompt)
+        for start in range(0, len(answer), 4):
+            await asyncio.sleep(self.token_latency.seconds(start))
+            yield SimpleNamespace(content=answer[start:start + 4])
+
+
+class FakeEncoder:
+    """
+    Stands in for tiktoken's cl100k_base, which is downloaded on first use: one token per character code, fed
+    through the same hashing embedding, so catalog and query vectors stay comparable without network access.
+    """
+
+    def encode(self, text: str) -> list:
+        return [ord(character) for character in text]
+
+    def encode_batch(self, texts: list) -> list:
+        return [self.encode(text) for text in texts]
+
+
+class FakePineconeIndex:
+    """
+    Synchronous like the Pinecone client. Metadata-filtered queries match on the filtered field; similarity
+    queries return a catalog record chosen from the query vector.
+    """
+
+    def __init__(self, records: list, latency: Latency):
+        self.records = records
+        self.latency = latency
+        self.by_name = {record["Test Name"]: record for record in records}
+
+    def query(self, vector, top_k=1, filter=None, include_metadata=True):
+        time.sleep(self.latency.seconds(repr(filter) if filter else len(vector)))
+        if filter is not None:
+            name = filter.get("Test Name", {}).get("$eq")
+            record = self.by_name.get(name)
+            matches = [record] if record else []
+        else:
+            import numpy as np
+
+            matches = [self.records[_crc(np.asarray(vector, dtype=np.float32).tobytes()) % len(self.records)]]
+        return {"matches": [{"id": record["Test ID"], "score": 0.9, "metadata": dict(record)} for record in matches[:top_k]]}
+
+    def describe_index_stats(self):
+        return SimpleNamespace(total_vector_count=len(self.records))
+
+
+class FakeS3Client:
+    """
+    The subset of the boto3 S3 client the upload endpoints use. Objects are counted, not kept.
+    """
+
+    def __init__(self, latency: Latency, part_latency: Latency = None):
+        self.latency = latency
+        self.part_latency = part_latency or latency
+        self.objects = {}
+        self.uploads = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body):
+        time.sleep(self.latency.seconds(Key))
+        with self._lock:
+            self.objects[Key] = len(Body)
+
+    def head_bucket(self, Bucket):
+        time.sleep(self.latency.seconds(Bucket))
+
+    def create_multipart_upload(self, Bucket, Key):
+        time.sleep(self.latency.seconds(Key))
+        with self._lock:
+            self.uploads[Key] = 0
+        return {"UploadId": f"upload-{_crc(Key)}"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        time.sleep(self.part_latency.seconds(f"{Key}/{PartNumber}"))
+        with self._lock:
+            self.uploads[Key] += len(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        time.sleep(self.latency.seconds(Key))
+        with self._lock:
+            self.objects[Key] = self.uploads.pop(Key)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self._lock:
+            self.uploads.pop(Key, None)
+
+
+def fake_recognizer(latency: Latency):
+    """
+    Replacement for a transcription.RECOGNIZERS entry: waits like the Google Web Speech API, returns words.
+    """
+    def recognize(recognizer, audio_data, language: str) -> str:
+        frames = audio_data.get_raw_data()
+        time.sleep(latency.seconds(len(frames)))
+        return f"segment of {len(frames) // 32000} seconds"
+
+    return recognize
+
+
+def fake_ocr_image_bytes(image_bytes: bytes, timeout: float = 0) -> str:
+    """
+    Stand-in for ocr_engine.ocr_image_bytes when Tesseract is not installed: decodes and preprocesses the page
+    for real, then waits LOADTEST_OCR_LATENCY_MS instead of running Tesseract. Runs in the OCR worker processes,
+    which is why the latency comes from the environment.
+    """
+    from app.services.ocr_engine import load_page_image, preprocess_image
+
+    with load_page_image(image_bytes) as image:
+        page, _ = preprocess_image(image)
+    time.sleep(float(os.environ.get("LOADTEST_OCR_LATENCY_MS", 500)) / 1000)
+    return f"Recognized {page.width}x{page.height} page"
@@ -0,0 +1,345 @@
+"""
+Offline load test of every router, with AI71, Pinecone, S3, the speech API and the tiktoken download replaced by
+the local fakes in fakes.py (configurable latency per call) and deterministic sample inputs from samples.py.
+
+Requests are sent in-process through httpx's ASGI transport at the given concurrency, so the numbers cover the
+application (parsing, validation, catalog lookups, ffmpeg, OCR preprocessing, the event loop and thread pools)
+plus the configured service latencies, not the network. OCR uses Tesseract when it is installed and a fake
+with real image preprocessing otherwise; the mode is recorded in the output since the two are not comparable.
+
+The JSON report holds throughput and p50/p95/p99 latency of the answered requests, error and rejection (503
+when the OCR queue is full) counts per scenario, and the time spent in each instrumented stage. The run exits
+non-zero when any request fails, and a baseline is only saved from a run without failures. Compare a run
+against a stored baseline to catch regressions:
+
+Usage:
+    python benchmarks/loadtest/run.py --output results.json
+    python benchmarks/loadtest/run.py --scenarios recommend,lab-test --concurrency 32 --requests 500
+    python benchmarks/loadtest/run.py --baseline benchmarks/loadtest/baseline.json --tolerance 0.25
+    python benchmarks/loadtest/run.py --save-baseline benchmarks/loadtest/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SAMPLES_DIR = os.path.join(ROOT, 'data', 'cache', 'loadtest-samples')
+
+# Requests per scenario at --scale 1; video and OCR requests cost far more than the others
+DEFAULT_REQUESTS = {
+    "recommend": 200,
+    "recommend-stream": 100,
+    "lab-test": 200,
+    "save-id": 200,
+    "ocr": 40,
+    "ocr-batch": 10,
+    "video": 10,
+}
+
+# Concurrency per scenario when --concurrency is not given; the OCR queue sheds load beyond OCR_MAX_PENDING
+# (4 per OCR worker), so higher OCR concurrency mostly measures rejections
+DEFAULT_CONCURRENCY = {
+    "recommend": 16,
+    "recommend-stream": 16,
+    "lab-test": 16,
+    "save-id": 16,
+    "ocr": 4,
+    "ocr-batch": 1,
+    "video": 4,
+}
+
+# Load shedding (the OCR queue is full), reported apart from errors
+REJECTED_STATUSES = (429, 503)
+
+HEALTH_GOALS = ["weight loss", "improve energy", "heart health", "better sleep", "build muscle", "manage stress"]
+DISEASES = ["hypertension", "type 2 diabetes", "hypothyroidism", "high cholesterol", "anemia", "none"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_REQUESTS), help="comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, help="concurrent requests, instead of the per-scenario defaults")
+    parser.add_argument("--requests", type=int, help="requests per scenario, instead of the per-scenario defaults")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the per-scenario default request counts")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests per scenario before measuring")
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--llm-token-latency-ms", type=float, default=5)
+    parser.add_argument("--vector-latency-ms", type=float, default=25)
+    parser.add_argument("--s3-latency-ms", type=float, default=60)
+    parser.add_argument("--speech-latency-ms", type=float, default=800)
+    parser.add_argument("--ocr-latency-ms", type=float, default=500, help="Tesseract time per page for the fake OCR")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of each latency")
+    parser.add_argument("--ocr-mode", choices=["auto", "real", "fake"], default="auto")
+    parser.add_argument("--recommend-cache", action="store_true", help="keep the recommendation cache enabled")
+    parser.add_argument("--samples-dir", default=DEFAULT_SAMPLES_DIR)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against; exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative p95/throughput regression")
+    parser.add_argument("--save-baseline", help="write the report as the new baseline")
+    return parser.parse_args()
+
+
+def configure_environment(args, samples: dict, workdir: str):
+    # Read by app.core.config at import time, so this must run before the app is imported
+    os.environ.setdefault("AI71_API_KEY", "loadtest")
+    os.environ.update({
+        "CATALOG_CSV_PATH": samples["catalog"],
+        "VECTOR_STORE_BACKEND": "pinecone",
+        "ENABLED_SERVICES": "documents,ocr,video",
+        "REASON_STORE_PATH": "",
+        "RESULT_CACHE_DIR": "",
+        "JOB_STORE_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "JOB_SPOOL_DIR": os.path.join(workdir, "jobs"),
+        "S3_BUCKET": "loadtest-bucket",
+        "LOADTEST_OCR_LATENCY_MS": str(args.ocr_latency_ms),
+    })
+
+
+def install_fakes(args, ocr_mode: str) -> dict:
+    from benchmarks.loadtest import fakes
+    from app.api.v1.endpoints import document_service, ocr_service
+    from app.services import s3_transfer, transcription
+    from app.services.catalog_index import catalog_index
+    from app.services.ocr_engine import ocr_engine
+    from app.services.vector_store import PineconeVectorStore
+    from app.utils import embedding
+
+    def latency(milliseconds):
+        return fakes.Latency(milliseconds, milliseconds * args.jitter)
+
+    encoder = fakes.FakeEncoder()
+    embedding.get_encoder = lambda: encoder
+    embedding.embed_query.cache_clear()
+    catalog_index.refresh()
+    records = catalog_index.records
+    index = fakes.FakePineconeIndex(records, latency(args.vector_latency_ms))
+    s3_client = fakes.FakeS3Client(latency(args.s3_latency_ms))
+
+    document_service.chat = fakes.FakeChatModel([record["Test Name"] for record in records],
+                                                latency(args.llm_latency_ms), latency(args.llm_token_latency_ms))
+    document_service.get_vector_store = lambda: PineconeVectorStore(index)
+    if not args.recommend_cache:
+        document_service.recommendation_cache.maxsize = 0
+    s3_transfer.get_s3_client = lambda: s3_client
+    transcription.RECOGNIZERS[transcription.chunk_transcriber.engine] = fakes.fake_recognizer(latency(args.speech_latency_ms))
+    if ocr_mode == "fake":
+        ocr_service.ocr_image_bytes = fakes.fake_ocr_image_bytes
+    ocr_engine.start()
+    return {"catalogTests": len(records), "s3": s3_client}
+
+
+def request_builders(samples: dict) -> dict:
+    with open(samples["png"], "rb") as infile:
+        png = infile.read()
+    with open(samples["pdf"], "rb") as infile:
+        pdf = infile.read()
+    with open(samples["video"], "rb") as infile:
+        video = infile.read()
+
+    def recommendation(number: int) -> dict:
+        goals = [HEALTH_GOALS[number % len(HEALTH_GOALS)], HEALTH_GOALS[(number // 6) % len(HEALTH_GOALS)]]
+        # A distinct combination per request, so the prompt (and the fake's answer) varies
+        diseases = [DISEASES[(number // 36) % len(DISEASES)], f"case {number}"]
+        return {"json": {"healthGoals": goals, "currentDiseases": diseases, "userId": f"user-{number}"}}
+
+    def recommendation_stream(number: int) -> dict:
+        return {**recommendation(number), "headers": {"accept": "text/event-stream"}}
+
+    def lab_test(number: int) -> dict:
+        return {"data": {"hasLabTest": "true", "hasMedicalReport": "true", "userId": f"user-{number}"},
+                "files": [("labTestFiles", ("cbc.png", png, "image/png")),
+                          ("labTestFiles", ("lipids.pdf", pdf, "application/pdf")),
+                          ("medicalReportFiles", ("report.pdf", pdf, "application/pdf"))]}
+
+    def save_id(number: int) -> dict:
+        return {"data": {"paymentMethod": "card", "insuranceDetails": "Plan A", "userId": f"user-{number}"},
+                "files": [("emiratesIdFile", ("emirates-id.png", png, "image/png")),
+                          ("insuranceCardFile", ("insurance.pdf", pdf, "application/pdf"))]}
+
+    return {
+        "recommend": ("/api/v1/recommend-tests", recommendation),
+        "recommend-stream": ("/api/v1/recommend-tests/stream", recommendation_stream),
+        "lab-test": ("/api/v1/lab-test", lab_test),
+        "save-id": ("/api/v1/save-id", save_id),
+        "ocr": ("/api/v1/ocr", lambda number: {"files": {"file": ("report.png", png, "image/png")}}),
+        "ocr-batch": ("/api/v1/ocr/batch", lambda number: {"files": [("files", ("report.pdf", pdf, "application/pdf")),
+                                                                     ("files", ("report.png", png, "image/png"))]}),
+        "video": ("/api/v1/video-to-text", lambda number: {"files": {"file": ("consultation.mp4", video, "video/mp4")}}),
+    }
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def stage_deltas(before: dict, after: dict) -> dict:
+    stages = {}
+    for (name,), (count, total) in sorted(after.items()):
+        previous_count, previous_total = before.get((name,), (0, 0.0))
+        if count > previous_count:
+            calls = count - previous_count
+            stages[name] = {"calls": calls, "mean_ms": round((total - previous_total) / calls * 1000, 3)}
+    return stages
+
+
+async def run_scenario(client, path: str, build, requests: int, concurrency: int, warmup: int) -> dict:
+    from app.utils.metrics import STAGE_SECONDS
+
+    async def send(number: int):
+        started = time.perf_counter()
+        response = await client.post(path, **build(number))
+        await response.aread()
+        return time.perf_counter() - started, response.status_code
+
+    for number in range(warmup):
+        await send(-1 - number)
+
+    latencies = []
+    statuses = {}
+    next_request = iter(range(requests))
+
+    async def worker():
+        for number in next_request:
+            seconds, status = await send(number)
+            # Percentiles cover answered requests only; fast rejections would make an overloaded run look quicker
+            if status < 400:
+                latencies.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    stages_before = STAGE_SECONDS.totals()
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, requests))])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    rejected = sum(count for status, count in statuses.items() if status in REJECTED_STATUSES)
+    return {
+        "path": path,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(count for status, count in statuses.items() if status >= 400) - rejected,
+        "rejected": rejected,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "stages": stage_deltas(stages_before, STAGE_SECONDS.totals()),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Scenarios whose p95 latency grew, or whose throughput shrank, by more than tolerance against the baseline.
+    """
+    regressions = []
+    same_ocr_mode = baseline.get("settings", {}).get("ocrMode") == report["settings"]["ocrMode"]
+    for name, result in report["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if reference is None or (name.startswith("ocr") and not same_ocr_mode):
+            continue
+        p95_ratio = result["p95_ms"] / reference["p95_ms"] if reference["p95_ms"] else 1.0
+        throughput_ratio = result["throughput_rps"] / reference["throughput_rps"] if reference["throughput_rps"] else 1.0
+        result["baseline"] = {"p95_ratio": round(p95_ratio, 3), "throughput_ratio": round(throughput_ratio, 3)}
+        if p95_ratio > 1 + tolerance or throughput_ratio < 1 - tolerance or result["errors"] > reference["errors"]:
+            regressions.append(name)
+    return regressions
+
+
+async def run(args, ocr_mode: str, samples: dict) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.services.ocr_engine import ocr_engine
+
+    fakes_info = install_fakes(args, ocr_mode)
+    builders = request_builders(samples)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in builders]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=600) as client:
+            for name in scenarios:
+                path, build = builders[name]
+                requests = args.requests or max(1, round(DEFAULT_REQUESTS[name] * args.scale))
+                concurrency = args.concurrency or DEFAULT_CONCURRENCY[name]
+                print(f"{name}: {requests} requests at concurrency {concurrency}", file=sys.stderr)
+                results[name] = await run_scenario(client, path, build, requests, concurrency, args.warmup)
+    finally:
+        ocr_engine.shutdown()
+
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ("output", "baseline", "save_baseline", "samples_dir")}
+    settings.update({"ocrMode": ocr_mode, "catalogTests": fakes_info["catalogTests"]})
+    return {
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "settings": settings,
+        "scenarios": results,
+    }
+
+
+def main():
+    args = parse_args()
+
+    from benchmarks.loadtest.samples import ensure_samples, sample_paths
+
+    ocr_mode = args.ocr_mode
+    if ocr_mode == "auto":
+        ocr_mode = "real" if shutil.which("tesseract") else "fake"
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        configure_environment(args, sample_paths(args.samples_dir), workdir)
+        # Generating the samples imports the app, so it comes after the environment is set
+        samples = ensure_samples(args.samples_dir)
+        report = asyncio.run(run(args, ocr_mode, samples))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as infile:
+            regressions = compare(report, json.load(infile), args.tolerance)
+        report["regressions"] = regressions
+
+    failed = [name for name, result in report["scenarios"].items() if result["errors"]]
+    output = json.dumps(report, indent=2)
+    print(output)
+    # A baseline with failures would let the same failures pass every later comparison
+    for path in filter(None, (args.output, None if failed else args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as outfile:
+            outfile.write(output + "\n")
+
+    print(f"{'scenario':<18} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rejected':>9}", file=sys.stderr)
+    for name, result in report["scenarios"].items():
+        print(f"{name:<18} {result['throughput_rps']:>8.2f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['errors']:>7} {result['rejected']:>9}", file=sys.stderr)
+    if failed:
+        print(f"Requests failed in: {', '.join(failed)}", file=sys.stderr)
+        if args.save_baseline:
+            print(f"Not saving the baseline to {args.save_baseline}", file=sys.stderr)
+    if regressions:
+        print(f"Regressions against {args.baseline}: {', '.join(regressions)}", file=sys.stderr)
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Deterministic sample inputs for the load test: a lab test catalog CSV, a scanned-report PNG, a multi-page PDF
+and a short video with a speech-like audio track. Files are generated on first use into a samples directory
+and reused afterwards, so every run (and every machine) benchmarks the same bytes.
+"""
+import csv
+import io
+import os
+import random
+import subprocess
+
+ANALYTES = ["Glucose", "Cholesterol", "Triglycerides", "HDL Cholesterol", "LDL Cholesterol", "Hemoglobin A1c",
+            "Vitamin D", "Vitamin B12", "Ferritin", "Iron", "TSH", "Free T4", "Free T3", "Creatinine", "Urea",
+            "Uric Acid", "ALT", "AST", "Alkaline Phosphatase", "Bilirubin", "Albumin", "Calcium", "Magnesium",
+            "Sodium", "Potassium", "Chloride", "CRP", "Insulin", "Cortisol", "Testosterone", "Estradiol",
+            "Folate", "Zinc", "Phosphorus", "Amylase", "Lipase", "CK", "LDH", "PSA", "Homocysteine"]
+QUALIFIERS = ["", "Serum", "Fasting", "Total", "Panel", "Random", "Plasma"]
+SAMPLE_TYPES = ["Serum", "Plasma", "Whole Blood", "Urine"]
+TAGS = ["diabetes", "heart health", "cholesterol", "thyroid", "kidney", "liver", "energy", "weight loss",
+        "bone health", "hormones", "inflammation", "nutrition", "anemia", "fertility"]
+
+REPORT_LINES = ["RAZEE MEDICAL LABORATORY", "Patient: Sample Patient   Age: 42", "Test            Result   Units   Range",
+                "Glucose Fasting   96      mg/dL   70-99", "Hemoglobin A1c    5.4     %       4.0-5.6",
+                "Cholesterol       182     mg/dL   <200", "Vitamin D         31      ng/mL   30-100",
+                "TSH               2.1     mIU/L   0.4-4.0"]
+
+
+def catalog_records(count: int = 400, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    base_names = [" ".join(part for part in (qualifier, analyte) if part) for analyte in ANALYTES for qualifier in QUALIFIERS]
+    rng.shuffle(base_names)
+    records = []
+    for number in range(count):
+        name = base_names[number % len(base_names)]
+        if number >= len(base_names):
+            name = f"{name} {number // len(base_names) + 1}"
+        records.append({
+            "Test ID": str(1000 + number),
+            "CPT Code": str(80000 + number),
+            "Test Name": name,
+            "Sample Type": rng.choice(SAMPLE_TYPES),
+            "Container": "Gold top",
+            "TAT": f"{rng.randint(1, 5)} days",
+            "Price (AED)": str(rng.randint(50, 900)),
+            "Description": f"Measures {name.lower()} levels.",
+            "Tags": ", ".join(rng.sample(TAGS, 3)),
+        })
+    return records
+
+
+def write_catalog(path: str, records: list):
+    from app.services.catalog_index import CATALOG_FIELDS
+
+    with open(path, "w", newline="", encoding="utf-8") as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=CATALOG_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def report_png(width: int = 1700, height: int = 2200) -> bytes:
+    """
+    A letter page at 200 DPI with the text of a lab report, like a phone scan of a printed result.
+    """
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for number, line in enumerate(REPORT_LINES * 3):
+        draw.text((120, 150 + number * 70), line, fill=0)
+    output = io.BytesIO()
+    image.save(output, format="PNG", dpi=(200, 200))
+    return output.getvalue()
+
+
+def report_pdf(pages: int = 3) -> bytes:
+    import pymupdf
+
+    with pymupdf.open() as document:
+        for number in range(pages):
+            page = document.new_page()
+            page.insert_text((72, 72), "\n".join([f"Page {number + 1}"] + REPORT_LINES), fontsize=12)
+        return document.tobytes(garbage=3, deflate=True)
+
+
+def speech_video(path: str, seconds: int = 12):
+    """
+    Small MP4 whose audio alternates one-second tone bursts with pauses, so the transcription path finds
+    pauses to split at the way it would in speech.
+    """
+    from app.services.audio_extraction import get_ffmpeg_exe
+
+    tone = f"sine=frequency=220:sample_rate=44100:duration={seconds}"
+    # Gate the tone on and off every 1.5s to create pauses
+    gate = "volume='if(lt(mod(t,1.5),1),1,0)':eval=frame"
+    subprocess.run([
+        get_ffmpeg_exe(), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"color=c=gray:s=160x120:d={seconds}:r=10",
+        "-f", "lavfi", "-i", tone,
+        "-filter:a", gate, "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest",
+        "-map_metadata", "-1", "-fflags", "+bitexact", path,
+    ], check=True, capture_output=True)
+
+
+def sample_paths(directory: str) -> dict:
+    return {
+        "catalog": os.path.join(directory, "catalog.csv"),
+        "png": os.path.join(directory, "report.png"),
+        "pdf": os.path.join(directory, "report.pdf"),
+        "video": os.path.join(directory, "consultation.mp4"),
+    }
+
+
+def ensure_samples(directory: str) -> dict:
+    """
+    Generate any missing sample file in directory and return {name: path}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = sample_paths(directory)
+    if not os.path.exists(paths["catalog"]):
+        write_catalog(paths["catalog"], catalog_records())
+    for name, build in (("png", report_png), ("pdf", report_pdf)):
+        if not os.path.exists(paths[name]):
+            with open(paths[name], "wb") as outfile:
+                outfile.write(build())
+    if not os.path.exists(paths["video"]):
+        speech_video(paths["video"])
+    return paths
@@ -0,0 +1,76 @@
+"""
+Report what importing the app costs, per module and per top-level package, from `python -X importtime`.
+
+Every run uses a fresh interpreter, since anything already imported costs nothing the second time. The
+"self" column is the time spent in a module's own body, "cumulative" includes the modules it imported first.
+Use it to find the dependency that pushed the import budget checked by app/tests/test_import_time.py over.
+
+Usage:
+    python benchmarks/profile_imports.py
+    python benchmarks/profile_imports.py --module app.api.v1.endpoints.document_service --top 40
+    ENABLED_SERVICES=ocr python benchmarks/profile_imports.py --json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def profile(module: str) -> list:
+    env = dict(os.environ)
+    # Importing the endpoints must not need real credentials
+    env.setdefault("AI71_API_KEY", "profile-key")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append({"module": name, "self": int(self_us) / 1e6, "cumulative": int(cumulative_us) / 1e6,
+                         "depth": (len(indent) - 1) // 2})
+    return rows
+
+
+def summarize(rows: list, top: int) -> dict:
+    packages = defaultdict(float)
+    for row in rows:
+        packages[row["module"].split(".")[0]] += row["self"]
+    return {
+        "total": sum(row["self"] for row in rows),
+        "modules": len(rows),
+        "packages": sorted(({"package": name, "self": seconds} for name, seconds in packages.items()),
+                           key=lambda item: -item["self"])[:top],
+        "slowest": sorted(rows, key=lambda row: -row["cumulative"])[:top],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = summarize(profile(args.module), args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"import {args.module}: {report['total']:.3f}s over {report['modules']} modules\n")
+    print(f"{'package':<40} {'self (s)':>10}")
+    for item in report["packages"]:
+        print(f"{item['package']:<40} {item['self']:>10.3f}")
+    print(f"\n{'module':<60} {'self (s)':>10} {'cumulative (s)':>15}")
+    for row in report["slowest"]:
+        print(f"{row['module']:<60} {row['self']:>10.3f} {row['cumulative']:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
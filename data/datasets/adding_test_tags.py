@@ -1,77 +1,105 @@
+"""
+Add a Tags column of alternative names and related terms to every lab test in the catalog.
+
+Requests run concurrently under a requests-per-minute limit and every tag list is checkpointed as it arrives,
+so rerunning after an interruption only fetches the missing ones. The output keeps the input order and is
+written once every test has tags.
+
+Usage:
+    python data/datasets/adding_test_tags.py
+    python data/datasets/adding_test_tags.py --rpm 100 --concurrency 4 --max-items 20
+"""
 import csv
-import time
+import sys
+import itertools
+import argparse
+import asyncio
+import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 import os
 
+# Make the app package importable when this script is run directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.enrichment import Checkpoint, EnrichmentRunner, TokenBucket
+
 # Load environment variables from .env file
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Configuration variables
 INPUT_FILE = 'data/datasets/lab_tests_ingested_with_descriptions_final.csv'
 OUTPUT_FILE = 'data/datasets/lab_tests_ingested_with_descriptions_final_with_tags.csv'
 AI_MODEL = "gpt-4o-mini"
 MAX_ITEMS = None  # Set to None to process all items, or a number to limit processing
+REQUESTS_PER_MINUTE = 500  # the account's rate limit for AI_MODEL
 
-# Initialize ChatOpenAI client
-chat = ChatOpenAI(
-    model=AI_MODEL,
-    api_key=os.getenv('OPENAI_API_KEY'),
-    base_url="https://api.openai.com/v1/",
-    streaming=True
-)
+def get_chat():
+    return ChatOpenAI(
+        model=AI_MODEL,
+        api_key=os.getenv('OPENAI_API_KEY'),
+        base_url="https://api.openai.com/v1/",
+        max_retries=0,  # retried by the runner, which also paces the retries
+    )
+
+def tag_messages(test_name):
+    return [
+        SystemMessage(content="You are a helpful assistant with expertise in medical terminology."),
+        HumanMessage(content=f"Generate a list of at least 15 alternative names, related terms, or common variations for the following lab test: {test_name}. Include common abbreviations, full names, and related procedures. Provide the response as a comma-separated list.")
+    ]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--checkpoint", help="defaults to the output path with a .checkpoint.jsonl suffix")
+    parser.add_argument("--max-items", type=int, default=MAX_ITEMS)
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="requests per minute")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=4)
+    return parser.parse_args()
+
+async def process_file(args):
+    chat = get_chat()
+
+    async def get_test_tags(test_name):
+        response = await chat.ainvoke(tag_messages(test_name))
+        return response.content.strip()
 
-def get_test_tags(test_name):
-    try:
-        messages = [
-            SystemMessage(content="You are a helpful assistant with expertise in medical terminology."),
-            HumanMessage(content=f"Generate a list of at least 15 alternative names, related terms, or common variations for the following lab test: {test_name}. Include common abbreviations, full names, and related procedures. Provide the response as a comma-separated list.")
-        ]
-        response = chat.stream(messages)
-        tags = ""
-        for chunk in response:
-            if chunk.content:
-                tags += chunk.content
-        return tags.strip()
-    except Exception as e:
-        print(f"Error generating tags for {test_name}: {e}")
-        return "Error retrieving tags"
-
-def process_file():
     try:
-        with open(INPUT_FILE, mode='r', newline='', encoding='utf-8') as infile, \
-             open(OUTPUT_FILE, mode='w', newline='', encoding='utf-8') as outfile:
-            
+        with open(args.input, mode='r', newline='', encoding='utf-8') as infile:
             reader = csv.reader(infile)
-            writer = csv.writer(outfile)
-            
-            # Read and write the header, adding the new 'Tags' column
-            header = next(reader)
-            header.append('Tags')
-            writer.writerow(header)
-            
-            for i, row in enumerate(reader, 1):
-                if MAX_ITEMS is not None and i > MAX_ITEMS:
-                    break
-                
-                test_name = row[2].strip()  # Assuming test name is in the third column
-                print(f"Processing test {i}: {test_name}")
-                
-                tags = get_test_tags(test_name)
-                row.append(tags)
-                writer.writerow(row)
-                
-                print(f"Tags generated: {tags}\n")
-                time.sleep(1)  # Add delay to handle rate limits
-        
-        print(f"\nProcessing complete. Output written to {OUTPUT_FILE}")
-        print(f"Processed {i} items using the {AI_MODEL.upper()} model.")
-    
+            # Read the header, adding the new 'Tags' column
+            header = next(reader) + ['Tags']
+            rows = list(itertools.islice(reader, args.max_items))
     except FileNotFoundError:
-        print(f"Input file not found: {INPUT_FILE}")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        logger.error(f"Input file not found: {args.input}")
+        return False
+
+    checkpoint = Checkpoint(args.checkpoint or f"{os.path.splitext(args.output)[0]}.checkpoint.jsonl")
+    runner = EnrichmentRunner(get_test_tags, checkpoint, TokenBucket.per_minute(args.rpm),
+                              concurrency=args.concurrency, retries=args.retries)
+    try:
+        # Test name is in the third column
+        tags = await runner.run(((row[2].strip(), row[2].strip()) for row in rows),
+                                progress=lambda done, total: logger.info(f"Tagged {done}/{total} lab tests"))
+    finally:
+        checkpoint.close()
+
+    if runner.failed:
+        logger.error(f"{len(runner.failed)} tag lists failed; rerun to retry them, the other {len(checkpoint)} are checkpointed")
+        return False
+
+    with open(args.output, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        writer.writerows(row + [test_tags] for row, test_tags in zip(rows, tags))
+    logger.info(f"Processing complete. Wrote {len(rows)} items tagged by the {AI_MODEL.upper()} model to {args.output}")
+    return True
 
 if __name__ == "__main__":
-    process_file()
\ No newline at end of file
+    sys.exit(0 if asyncio.run(process_file(parse_args())) else 1)
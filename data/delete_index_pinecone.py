@@ -1,112 +1,72 @@
+"""
+Delete every vector of one or all namespaces of the index, one delete_all request per namespace.
+Refuses to empty the namespace serving /recommend-tests unless --force is given; to refresh the catalog, use
+`python data/upload_lab_test_to_pinecone.py --reindex` instead, which never leaves the service without data.
+
+Usage:
+    python data/delete_index_pinecone.py --namespace catalog-20240101T000000Z
+    python data/delete_index_pinecone.py --all --force
+"""
 import os
+import sys
 import logging
+import argparse
 import asyncio
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from tqdm.asyncio import tqdm_asyncio
+
+# Make the app package importable when this script is run directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.catalog_ingest import delete_namespace, wait_for_vector_count
+from app.services.vector_store import catalog_namespace
 
 # Load environment variables
 load_dotenv()
 
 # Setup logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-BATCH_SIZE = 100
-MAX_ATTEMPTS = 5
-
 def get_pinecone_index():
+    from pinecone import Pinecone
+
     api_key = os.getenv('PINECONE_API_KEY')
-    environment = os.getenv('PINECONE_ENVIRONMENT')
     index_name = os.getenv('PINECONE_INDEX_NAME', 'personalized-tests')
-    pc = Pinecone(api_key=api_key, environment=environment)
+    pc = Pinecone(api_key=api_key)
     return pc.Index(index_name)
 
-async def delete_batch(index, ids):
-    try:
-        index.delete(ids=ids)
-        logger.info(f"Successfully deleted batch of {len(ids)} vectors")
-        return len(ids)
-    except Exception as delete_error:
-        logger.error(f"Error deleting batch: {str(delete_error)}")
-        return 0
-
-async def fetch_all_ids(index, total_vector_count):
-    all_ids = []
-    fetch_limit = 10000  # Increased back to 10000
-
-    try:
-        logger.debug(f"Attempting to fetch up to {total_vector_count} IDs")
-        response = index.query(
-            vector=[0] * index.describe_index_stats()['dimension'],
-            top_k=total_vector_count,
-            include_metadata=True,
-            include_values=False
-        )
-        all_ids = [match['id'] for match in response['matches']]
-        logger.info(f"Fetched {len(all_ids)} IDs using query method")
-    except Exception as fetch_error:
-        logger.error(f"Error fetching IDs: {str(fetch_error)}")
-    
-    return all_ids
-
-async def delete_all_vectors_from_pinecone():
-    try:
-        index = get_pinecone_index()
-        attempt = 0
-
-        while attempt < MAX_ATTEMPTS:
-            # Get current vector count
-            stats = index.describe_index_stats()
-            total_vector_count = stats['total_vector_count']
-            logger.info(f"Current total vectors in index: {total_vector_count}")
-            
-            if total_vector_count == 0:
-                logger.info("All vectors have been deleted. Exiting.")
-                return
-
-            # Fetch all vector IDs
-            all_ids = await fetch_all_ids(index, total_vector_count)
-            logger.info(f"Fetched a total of {len(all_ids)} vector IDs")
-
-            if not all_ids:
-                logger.warning("No vector IDs fetched. Trying again...")
-                attempt += 1
-                continue
-
-            # Delete vectors in batches
-            batches = [all_ids[i:i + BATCH_SIZE] for i in range(0, len(all_ids), BATCH_SIZE)]
-            delete_tasks = [delete_batch(index, batch) for batch in batches]
-            deleted_counts = await tqdm_asyncio.gather(*delete_tasks, desc="Deleting vectors")
-            
-            total_deleted = sum(deleted_counts)
-            logger.info(f"Total vectors deleted in this iteration: {total_deleted}")
-
-            # Check if we made progress
-            if total_deleted == 0:
-                logger.warning("No vectors were deleted in this iteration. Trying again...")
-                attempt += 1
-            else:
-                attempt = 0  # Reset attempt counter if we made progress
-
-        logger.warning(f"Reached maximum attempts ({MAX_ATTEMPTS}). Some vectors may remain.")
-
-    except Exception as e:
-        logger.error(f"Failed to delete vectors from Pinecone: {str(e)}")
-
-    finally:
-        # Final count check
-        try:
-            final_stats = index.describe_index_stats()
-            final_count = final_stats['total_vector_count']
-            logger.info(f"Final vector count in index: {final_count}")
-
-            if final_count == 0:
-                logger.info("All vectors successfully deleted.")
-            else:
-                logger.warning(f"Not all vectors were deleted. {final_count} vectors remain.")
-        except Exception as e:
-            logger.error(f"Error checking final vector count: {str(e)}")
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--namespace", help="namespace to empty; \"\" is the default namespace")
+    target.add_argument("--all", action="store_true", help="empty every namespace of the index")
+    parser.add_argument("--force", action="store_true", help="also empty the serving namespace")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the counts to reach 0")
+    return parser.parse_args()
+
+async def delete_all_vectors_from_pinecone(args):
+    index = get_pinecone_index()
+    stats = index.describe_index_stats()
+    namespaces = list(stats['namespaces']) if args.all else [args.namespace]
+
+    serving = catalog_namespace.current()
+    if serving in namespaces and not args.force:
+        logger.error(f"Namespace '{serving}' is serving /recommend-tests; pass --force to empty it anyway")
+        return False
+
+    remaining = 0
+    for namespace in namespaces:
+        await delete_namespace(index, namespace)
+        # Deletes are applied asynchronously; wait until the stats confirm the namespace is empty
+        count = await wait_for_vector_count(index, namespace, 0, timeout=args.timeout)
+        logger.info(f"Namespace '{namespace}' now holds {count} vectors")
+        remaining += count
+
+    if remaining:
+        logger.warning(f"{remaining} vectors were not deleted within {args.timeout}s")
+        return False
+    logger.info("All vectors successfully deleted.")
+    return True
 
 if __name__ == "__main__":
-    asyncio.run(delete_all_vectors_from_pinecone())
\ No newline at end of file
+    sys.exit(0 if asyncio.run(delete_all_vectors_from_pinecone(parse_args())) else 1)
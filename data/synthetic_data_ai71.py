@@ -1,103 +1,130 @@
+"""
+Generate a scientific description for every lab test in data/labTests.csv.
+
+Requests run concurrently under a requests-per-minute limit and every description is checkpointed as it arrives,
+so rerunning after an interruption only fetches the missing ones. The output CSV keeps the input order and is
+written once every test has a description.
+
+Usage:
+    python data/synthetic_data_ai71.py
+    python data/synthetic_data_ai71.py --rpm 60 --concurrency 4 --max-items 20
+"""
 import csv
-import time
+import sys
+import argparse
+import asyncio
+import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 import os
 
+# Make the app package importable when this script is run directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.enrichment import Checkpoint, EnrichmentRunner, TokenBucket
+
 # Load environment variables from .env file
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # Configuration variables
 AI_MODEL = "gpt-4o-mini"  # Set this to "falcon" or "gpt-4o-mini"
 MAX_ITEMS = None  # Set to None to process all items
+INPUT_FILE = 'data/labTests.csv'  # Input CSV file containing lab test names
+OUTPUT_FILE = 'data/datasets/lab_tests_ingested_with_descriptions.csv'  # Output CSV file for the descriptions
 
-# Model-specific configurations
+# Model-specific configurations; requests_per_minute is the account's rate limit for the model
 MODEL_CONFIGS = {
     "falcon": {
         "model": "tiiuae/falcon-180B-chat",
         "api_key": os.getenv('AI71_API_KEY'),
         "base_url": "https://api.ai71.ai/v1/",
+        "requests_per_minute": 60,
     },
     "gpt-4o-mini": {
         "model": "gpt-4o-mini",
         "api_key": os.getenv('OPENAI_API_KEY'),
         "base_url": "https://api.openai.com/v1/",
+        "requests_per_minute": 500,
     }
 }
 
-# Select the appropriate configuration based on AI_MODEL
-selected_config = MODEL_CONFIGS.get(AI_MODEL)
-if not selected_config:
-    raise ValueError(f"Invalid AI_MODEL specified. Choose either 'falcon' or 'gpt4'.")
-
-# Initialize ChatOpenAI client
-chat = ChatOpenAI(
-    model=selected_config["model"],
-    api_key=selected_config["api_key"],
-    base_url=selected_config["base_url"],
-    streaming=True
-)
-
-# Function to get a detailed scientific description from the AI API
-def get_test_description(test_name):
-    try:
-        messages = [
-            SystemMessage(content="You are a helpful assistant."),
-            HumanMessage(content=f"Provide a detailed scientific description of the following lab test: {test_name}, and the purpose of conducting such test and benefits for patience in terms of health outcome")
-        ]
-        response = chat.stream(messages)
-        description = ""
-        for chunk in response:
-            if chunk.content:
-                description += chunk.content
-        return description.strip()
-    except Exception as e:
-        print(f"Error: {e}")
-        return "Error retrieving description"
-
-# Read lab tests from CSV file
-input_file = 'data/labTests.csv'  # Input CSV file containing lab test names
-output_file = 'data/datasets/lab_tests_ingested_with_descriptions.csv'  # Output CSV file for the descriptions
-
-# Prepare data for CSV
-csv_data = [["Test ID", "CPT Code", "Test Name", "Sample Type", "Container", "TAT", "Price (AED)", "Description"]]
-
-try:
+def get_chat(selected_config):
+    return ChatOpenAI(
+        model=selected_config["model"],
+        api_key=selected_config["api_key"],
+        base_url=selected_config["base_url"],
+        max_retries=0,  # retried by the runner, which also paces the retries
+    )
+
+def description_messages(test_name):
+    return [
+        SystemMessage(content="You are a helpful assistant."),
+        HumanMessage(content=f"Provide a detailed scientific description of the following lab test: {test_name}, and the purpose of conducting such test and benefits for patience in terms of health outcome")
+    ]
+
+def read_lab_tests(input_file, max_items=None):
     with open(input_file, mode='r', newline='', encoding='utf-8') as infile:
         reader = csv.reader(infile)
-        header = next(reader)  # Skip header row
-        for i, row in enumerate(reader):
-            if MAX_ITEMS is not None and i >= MAX_ITEMS:
+        next(reader)  # Skip header row
+        rows = []
+        for row in reader:
+            if max_items is not None and len(rows) >= max_items:
                 break
             test_id, cpt_code, test_name, sample_type, container, tat, price = row
             test_name = test_name.strip()
             if test_name:
-                print(f"\nFetching description for: {test_name}")
-                description = get_test_description(test_name)
-                csv_data.append([test_id, cpt_code, test_name, sample_type, container, tat, price, description])
-                print(f"Test ID: {test_id}")
-                print(f"CPT Code: {cpt_code}")
-                print(f"Test Name: {test_name}")
-                print(f"Sample Type: {sample_type}")
-                print(f"Container: {container}")
-                print(f"TAT: {tat}")
-                print(f"Price: {price}")
-                print(f"Description: {description}\n")
-                print("-" * 80)  # Print a separator line
-                time.sleep(1)  # Add delay to handle rate limits
-except FileNotFoundError:
-    print(f"Input file not found: {input_file}")
-except Exception as e:
-    print(f"Error reading the input file: {e}")
-
-# Write data to CSV file
-try:
-    with open(output_file, mode='w', newline='', encoding='utf-8') as outfile:
+                rows.append([test_id, cpt_code, test_name, sample_type, container, tat, price])
+        return rows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=list(MODEL_CONFIGS), default=AI_MODEL)
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--checkpoint", help="defaults to the output path with a .checkpoint.jsonl suffix")
+    parser.add_argument("--max-items", type=int, default=MAX_ITEMS)
+    parser.add_argument("--rpm", type=float, help="requests per minute; defaults to the model's quota")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=4)
+    return parser.parse_args()
+
+async def generate_descriptions(args):
+    selected_config = MODEL_CONFIGS[args.model]
+    chat = get_chat(selected_config)
+
+    async def get_test_description(test_name):
+        response = await chat.ainvoke(description_messages(test_name))
+        return response.content.strip()
+
+    try:
+        rows = read_lab_tests(args.input, args.max_items)
+    except FileNotFoundError:
+        logger.error(f"Input file not found: {args.input}")
+        return False
+
+    checkpoint = Checkpoint(args.checkpoint or f"{os.path.splitext(args.output)[0]}.checkpoint.jsonl")
+    runner = EnrichmentRunner(get_test_description, checkpoint, TokenBucket.per_minute(args.rpm or selected_config["requests_per_minute"]),
+                              concurrency=args.concurrency, retries=args.retries)
+    try:
+        descriptions = await runner.run(((row[2], row[2]) for row in rows),
+                                        progress=lambda done, total: logger.info(f"Described {done}/{total} lab tests"))
+    finally:
+        checkpoint.close()
+
+    if runner.failed:
+        logger.error(f"{len(runner.failed)} descriptions failed; rerun to retry them, the other {len(checkpoint)} are checkpointed")
+        return False
+
+    with open(args.output, mode='w', newline='', encoding='utf-8') as outfile:
         writer = csv.writer(outfile, delimiter=',')
-        writer.writerows(csv_data)
-    print(f"\nCSV file with descriptions has been created successfully: {output_file}")
-except Exception as e:
-    print(f"\nError writing to the output file: {e}")
+        writer.writerow(["Test ID", "CPT Code", "Test Name", "Sample Type", "Container", "TAT", "Price (AED)", "Description"])
+        writer.writerows(row + [description] for row, description in zip(rows, descriptions))
+    logger.info(f"Wrote {len(rows)} lab tests with descriptions from the {args.model.upper()} model to {args.output}")
+    return True
 
-print(f"\nProcessed {len(csv_data) - 1} items using the {AI_MODEL.upper()} model.")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(generate_descriptions(parse_args())) else 1)
@@ -1,13 +1,32 @@
+"""
+Upload the lab test catalog to Pinecone. The CSV is read in chunks; only rows that changed since the last run
+(per the manifest) are embedded and upserted, and vectors of rows removed from the CSV are deleted.
+Updates go to the namespace currently serving /recommend-tests, unless --namespace is given.
+
+--reindex instead builds the whole catalog in a new namespace while the current one keeps serving, checks its
+vector count, switches the serving namespace (PINECONE_NAMESPACE_FILE) to it and deletes older namespaces,
+keeping the previous one for --rollback.
+
+Usage:
+    python data/upload_lab_test_to_pinecone.py
+    python data/upload_lab_test_to_pinecone.py --full  # ignore the manifest and re-upsert every row
+    python data/upload_lab_test_to_pinecone.py --reindex
+    python data/upload_lab_test_to_pinecone.py --rollback  # serve the previous namespace again
+"""
 import pandas as pd
-import numpy as np
-from pinecone import Pinecone
 from dotenv import load_dotenv
 import os
-import json
+import sys
 import logging
+import argparse
 import asyncio
-from tqdm import tqdm
-import tiktoken
+
+# Make the app package importable when this script is run directly
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.catalog_index import CATALOG_FIELDS, clean_catalog_metadata
+from app.services.catalog_ingest import UPSERT_BATCH_SIZE, CatalogIngestion, IngestManifest, manifest_path, new_namespace_name, reindex_catalog
+from app.services.vector_store import catalog_namespace
 
 # Load environment variables
 load_dotenv()
@@ -16,13 +35,15 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-VECTOR_DIMENSION = 1536
-BATCH_SIZE = 100
-MAX_TOKENS = 8191
+CSV_PATH = "data/datasets/lab_tests_ingested_with_descriptions_final_with_tags.csv"
+INDEX_NAME = "personalized-tests"  # Replace with your actual index name
+CHUNK_SIZE = 5000  # CSV rows read, embedded and fingerprinted at a time
 
 def get_pinecone_index():
+    from pinecone import Pinecone
+
     pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
-    return pc.Index("personalized-tests")  # Replace with your actual index name
+    return pc.Index(INDEX_NAME)
 
 def clean_data(data):
     cleaned = {}
@@ -34,75 +55,84 @@ def clean_data(data):
                 cleaned[k] = ""  # Use empty string for null string values
         else:
             cleaned[k] = v
-    return cleaned
-
-def create_custom_embedding(text):
-    encoding = tiktoken.get_encoding("cl100k_base")
-    tokens = encoding.encode(text)[:MAX_TOKENS]
-    
-    embedding = np.zeros(VECTOR_DIMENSION)
-    for token in tokens:
-        embedding[token % VECTOR_DIMENSION] += 1
-    
-    norm = np.linalg.norm(embedding)
-    if norm != 0:
-        embedding = embedding / norm
-    
-    return embedding.tolist()
-
-async def upload_batch(index, batch):
-    try:
-        await asyncio.to_thread(index.upsert, vectors=batch)
-        logger.info(f"Successfully upserted batch of {len(batch)} items")
-    except Exception as upsert_error:
-        logger.error(f"Error upserting batch: {str(upsert_error)}")
-        logger.error(f"Problematic batch: {json.dumps(batch)}")
+    # Integral numbers as ints, like the catalog index returns them
+    return clean_catalog_metadata(cleaned)
+
+def read_catalog_chunks(csv_path, chunk_size=CHUNK_SIZE):
+    for chunk in pd.read_csv(csv_path, usecols=CATALOG_FIELDS, chunksize=chunk_size):
+        # to_dict converts numpy scalars to Python types, which Pinecone metadata requires
+        yield [clean_data(record) for record in chunk[CATALOG_FIELDS].to_dict("records")]
 
-async def upload_lab_tests_to_pinecone():
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--manifest", help="defaults to one manifest per index and namespace in data/cache")
+    parser.add_argument("--namespace", help="defaults to the serving namespace, or a new one with --reindex")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-upsert every row")
+    parser.add_argument("--reindex", action="store_true", help="build a new namespace and switch to it")
+    parser.add_argument("--rollback", action="store_true", help="switch back to the previous namespace")
+    parser.add_argument("--keep", type=int, default=1, help="previous namespaces kept after --reindex")
+    parser.add_argument("--no-prune", action="store_true", help="keep vectors of rows no longer in the CSV")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=UPSERT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4, help="upsert requests in flight")
+    parser.add_argument("--retries", type=int, default=4, help="retries per failed request")
+    return parser.parse_args()
+
+async def reindex_lab_tests(args):
+    namespace = args.namespace or new_namespace_name()
+    # The new namespace's manifest lets later runs update it incrementally
     try:
-        lab_tests_df = pd.read_csv("data/datasets/lab_tests_ingested_with_descriptions_final_with_tags.csv")
-        index = get_pinecone_index()
-
-        batches = []
-        current_batch = []
-
-        for _, row in tqdm(lab_tests_df.iterrows(), total=len(lab_tests_df)):
-            test_id = row['Test ID']
-            test_info = clean_data({
-                "Test ID": row['Test ID'],
-                "CPT Code": row['CPT Code'],
-                "Test Name": row['Test Name'],
-                "Sample Type": row['Sample Type'],
-                "Container": row['Container'],
-                "TAT": row['TAT'],
-                "Price (AED)": row['Price (AED)'],
-                "Description": row['Description'],
-                "Tags": row['Tags']
-            })
-            
-            # Combine Test Name and Tags for embedding, excluding Description
-            text_to_embed = f"{test_info['Test Name']} {test_info['Tags']}"
-            embedding = create_custom_embedding(text_to_embed)
-            
-            current_batch.append({
-                'id': str(test_id),
-                'values': embedding,
-                'metadata': test_info
-            })
-            
-            if len(current_batch) == BATCH_SIZE:
-                batches.append(current_batch)
-                current_batch = []
-
-        if current_batch:
-            batches.append(current_batch)
-
-        await asyncio.gather(*[upload_batch(index, batch) for batch in batches])
-
-        logger.info("Lab tests data upload to Pinecone completed!")
-    
+        result = await reindex_catalog(get_pinecone_index(), read_catalog_chunks(args.csv, args.chunk_size), catalog_namespace,
+                                       namespace=namespace, manifest_path=args.manifest or manifest_path(INDEX_NAME, namespace),
+                                       keep=args.keep, batch_size=args.batch_size, concurrency=args.concurrency, retries=args.retries)
     except Exception as e:
-        logger.error(f"Failed to upload lab tests data to Pinecone: {str(e)}")
+        logger.error(f"Reindex failed: {str(e)}")
+        return False
+    for retired in result["retired"]:
+        retired_manifest = manifest_path(INDEX_NAME, retired)
+        if os.path.exists(retired_manifest):
+            os.remove(retired_manifest)
+    logger.info(f"Now serving {result['vectors']} vectors from namespace '{result['namespace']}'; "
+                f"deleted namespaces: {', '.join(repr(name) for name in result['retired']) or 'none'}")
+    return True
+
+def rollback():
+    previous = catalog_namespace.previous()
+    if not previous:
+        logger.error("No previous namespace to roll back to")
+        return False
+    catalog_namespace.switch(previous[0])
+    return True
+
+async def upload_lab_tests_to_pinecone(args):
+    if args.namespace is None:
+        args.namespace = catalog_namespace.current()
+    args.manifest = args.manifest or manifest_path(INDEX_NAME, args.namespace)
+    manifest = IngestManifest(args.manifest)
+    if args.full:
+        manifest.fingerprints.clear()
+    logger.info(f"Manifest {args.manifest} lists {len(manifest)} vectors from the last run")
+
+    ingestion = CatalogIngestion(get_pinecone_index(), manifest, namespace=args.namespace, batch_size=args.batch_size,
+                                 concurrency=args.concurrency, retries=args.retries)
+    stats = await ingestion.run(read_catalog_chunks(args.csv, args.chunk_size), prune=not args.no_prune)
+
+    logger.info(f"Read {stats['rows']} rows: {stats['unchanged']} unchanged, {stats['upserted']} upserted, "
+                f"{stats['failed']} failed, {stats['deleted']} deleted")
+    if stats["failed"]:
+        logger.error(f"{stats['failed']} vectors failed to upsert; rerun to retry them")
+        return False
+    logger.info("Lab tests data upload to Pinecone completed!")
+    return True
+
+def main():
+    args = parse_args()
+    if args.rollback:
+        return rollback()
+    if args.reindex:
+        return asyncio.run(reindex_lab_tests(args))
+    return asyncio.run(upload_lab_tests_to_pinecone(args))
 
 if __name__ == "__main__":
-    asyncio.run(upload_lab_tests_to_pinecone())
\ No newline at end of file
+    sys.exit(0 if main() else 1)